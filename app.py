@@ -9,17 +9,40 @@ app.py  —  ARIA · Adaptive Role Intelligence Assistant
 
 import streamlit as st
 import requests
+import copy
 import json
 import re
 import os
-from datetime import datetime
+import time
+import uuid
 from pathlib import Path
-from aria_system import PERSONAS, EMPTY_PROFILE, build_system_prompt
+from aria_system import PERSONAS, EMPTY_PROFILE, ARIA_BASE_PROMPT, detect_persona, prompt_fingerprint
+from aria_ollama import get_probe, warm_up
+from aria_context import CONTEXT_TOKEN_BUDGET
+from aria_summary import apply_pending_summary, cancel_summary, maybe_schedule_summary
+from aria_stream import GenerationJob, ThrottledRenderer
+from aria_store import get_store
+from aria_json import StreamingJSONExtractor
+from aria_generate import generate_artifact
+from aria_cache import cache_key, get_cache, history_hash
+from aria_router import EMBED_MODEL, get_router
+from aria_profile_rules import mark_manual, update_profile_from_text
+from aria_facts import apply_pending_facts, cancel_facts, facts_pending, schedule_fact_extraction
+from aria_planner import fill_request, merge_new_tasks, plan_week, task_id, week_stats
+from aria_prefetch import cancel_prefetch, draft_ready, prefetch_pending, schedule_prefetch
+from aria_backends import BACKEND_URLS, get_pool, report_failure
+from aria_scheduler import INTERACTIVE, get_scheduler, request_context
+from aria_chat import (apply_artifact, chat_options, maybe_absorb_generated_data,
+                       profile_writer, save_profile as store_profile, stream_ollama)
+from aria_metrics import extraction_stats, prometheus_text, summary as metrics_summary, trace_labels, traces_jsonl
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Constants
 # ─────────────────────────────────────────────────────────────────────────────
-PROFILE_PATH = Path("aria_profile.json")
+PROFILE_PATH = Path("aria_profile.json")      # legacy single-user file, migrated into aria.db
+USER_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+HISTORY_TAIL = 60        # messages kept in memory per session (context + first page)
+CHAT_PAGE_SIZE = 20      # messages rendered per "page" in the chat tab
 OLLAMA_DEFAULT_URL = "http://localhost:11434"
 OLLAMA_DEFAULT_MODEL = "llama3.2"
 
@@ -279,197 +302,69 @@ html, body,
 # ─────────────────────────────────────────────────────────────────────────────
 # Profile persistence
 # ─────────────────────────────────────────────────────────────────────────────
-def load_profile() -> dict:
-    if PROFILE_PATH.exists():
-        try:
-            with open(PROFILE_PATH) as f:
-                saved = json.load(f)
-            # merge so new keys from EMPTY_PROFILE always present
-            merged = {**EMPTY_PROFILE, **saved}
-            return merged
-        except Exception:
-            pass
-    return dict(EMPTY_PROFILE)
-
-
-def save_profile(profile: dict):
-    profile["last_updated"] = datetime.now().isoformat()
-    with open(PROFILE_PATH, "w") as f:
-        json.dump(profile, f, indent=2)
-
-
-def export_profile_json(profile: dict) -> str:
-    return json.dumps(profile, indent=2)
-
-# ─────────────────────────────────────────────────────────────────────────────
-# Ollama helpers
-# ─────────────────────────────────────────────────────────────────────────────
-def check_ollama(url: str):
-    try:
-        r = requests.get(f"{url}/api/tags", timeout=3)
-        if r.status_code == 200:
-            models = [m["name"] for m in r.json().get("models", [])]
-            return True, models
-    except Exception:
-        pass
-    return False, []
-
-
-def stream_ollama(prompt: str, history: list, profile: dict, url: str, model: str):
-    """Stream tokens from Ollama, yielding each token as a string."""
-    system_prompt = build_system_prompt(profile)
-    messages = [{"role": "system", "content": system_prompt}]
-    for m in history[-16:]:
-        messages.append({"role": m["role"], "content": m["content"]})
-    messages.append({"role": "user", "content": prompt})
-
-    payload = {
-        "model": model,
-        "messages": messages,
-        "stream": True,
-        "options": {"temperature": 0.72, "top_p": 0.9, "num_predict": 2048},
-    }
-    try:
-        with requests.post(f"{url}/api/chat", json=payload, stream=True, timeout=180) as resp:
-            resp.raise_for_status()
-            for raw in resp.iter_lines():
-                if not raw:
-                    continue
-                chunk = json.loads(raw)
-                tok = chunk.get("message", {}).get("content", "")
-                if tok:
-                    yield tok
-                if chunk.get("done"):
-                    break
-    except requests.exceptions.ConnectionError:
-        yield (
-            "\n\n> ⚠️ **Ollama not reachable.**\n"
-            "> Run: `ollama serve`  then  `ollama pull llama3.2`"
-        )
-    except Exception as exc:
-        yield f"\n\n> ⚠️ **Error:** `{exc}`"
-
-# ─────────────────────────────────────────────────────────────────────────────
-# JSON extraction from ARIA responses
-# ─────────────────────────────────────────────────────────────────────────────
-def extract_json_block(text: str):
-    """Pull the first ```json ... ``` block from a response and parse it."""
-    match = re.search(r"```json\s*([\s\S]+?)\s*```", text)
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
-    return None
+def current_user_id() -> str:
+    """Per-browser user id, kept in the URL (?user=…) so a refresh keeps the same profile."""
+    uid = st.query_params.get("user")
+    if not uid or not USER_ID_RE.fullmatch(uid):
+        uid = uuid.uuid4().hex[:12]
+        st.query_params["user"] = uid
+    return uid
+
+
+def load_profile(user_id: str) -> dict:
+    store = get_store()
+    saved = store.load(user_id)
+    if saved is None:
+        # First session after upgrading adopts the old single-user JSON profile
+        saved = store.claim_legacy_json(PROFILE_PATH, user_id)
+        if saved is not None:
+            st.session_state.persist_notice = (
+                f"Imported your existing `{PROFILE_PATH}` into the profile store."
+            )
+    if isinstance(saved, dict):
+        # merge so new keys from EMPTY_PROFILE always present
+        profile = {**copy.deepcopy(EMPTY_PROFILE), **saved}
+        if any("phase" not in t for t in profile.get("weekly_tasks") or []):
+            plan_week(profile)             # tasks saved before the planner existed
+        return profile
+    return copy.deepcopy(EMPTY_PROFILE)
 
 
-def maybe_absorb_generated_data(response_text: str, profile: dict) -> bool:
+def save_profile(profile: dict, user_id: str = None):
     """
-    If the response contains a JSON block that looks like roadmap / projects /
-    weekly tasks, absorb it into the profile. Returns True if profile was changed.
+    Queue a debounced write of only the changed fields (see aria_store).
+    Background threads must pass `user_id`; they have no session state.
     """
-    data = extract_json_block(response_text)
-    if data is None or not isinstance(data, list) or len(data) == 0:
-        return False
-
-    changed = False
-    first = data[0]
-
-    # Roadmap detection: items have 'phase' or 'weeks' + 'title'
-    if isinstance(first, dict) and ("phase" in first or "weeks" in first) and "title" in first:
-        profile["roadmap"] = data
-        profile["current_phase"] = 0
-        profile["completed_phases"] = []
-        changed = True
+    store_profile(profile, user_id or st.session_state.user_id)
 
-    # Project detection: items have 'rank' and 'name' and 'tech'
-    elif isinstance(first, dict) and "rank" in first and "name" in first and "tech" in first:
-        profile["projects"] = data
-        changed = True
-
-    # Weekly tasks detection: items have 'day' and 'task'
-    elif isinstance(first, dict) and "day" in first and "task" in first:
-        profile["weekly_tasks"] = data
-        changed = True
-
-    return changed
 
+def export_profile_json(profile: dict) -> str:
+    return json.dumps(profile, indent=2)
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Profile field extractor (heuristic, runs silently after every message)
+# Generated artifacts
 # ─────────────────────────────────────────────────────────────────────────────
-_LEVEL_KEYWORDS = {
-    "beginner":     "beginner",
-    "just started": "beginner",
-    "new to":       "beginner",
-    "intermediate": "intermediate",
-    "some experience": "intermediate",
-    "advanced":     "advanced",
-    "experienced":  "advanced",
-}
-_EXPOSURE_KEYWORDS = {
-    "never":        "none",
-    "no experience":"none",
-    "read about":   "theory_only",
-    "watched":      "theory_only",
-    "some projects":"some_projects",
-    "built":        "some_projects",
-    "deployed":     "some_projects",
+ARTIFACT_LABELS = {
+    "roadmap":      "🗺️ Roadmap phases",
+    "projects":     "🚀 Projects",
+    "weekly_tasks": "📅 Weekly tasks",
 }
 
-def heuristic_profile_update(user_text: str, profile: dict) -> bool:
-    """Lightweight keyword scan to auto-fill obvious profile fields."""
-    changed = False
-    lower = user_text.lower()
-
-    # Python level
-    if not profile["python_level"]:
-        for kw, val in _LEVEL_KEYWORDS.items():
-            if kw in lower and "python" in lower:
-                profile["python_level"] = val
-                changed = True
-                break
-
-    # AI exposure
-    if not profile["ai_exposure"]:
-        for kw, val in _EXPOSURE_KEYWORDS.items():
-            if kw in lower and any(w in lower for w in ["ai", "ml", "machine learning", "deep learning"]):
-                profile["ai_exposure"] = val
-                changed = True
-                break
-
-    # Hours per week
-    if not profile["time_per_week"]:
-        m = re.search(r"(\d{1,2})\s*(hours?|hrs?)\s*(a|per)?\s*week", lower)
-        if m:
-            profile["time_per_week"] = int(m.group(1))
-            changed = True
-
-    # Mark diagnosis done when key fields are present
-    if (not profile["diagnosis_done"]
-            and profile["python_level"]
-            and profile["ai_exposure"]):
-        profile["diagnosis_done"] = True
-        changed = True
-
-    return changed
-
-
-def detect_persona(text: str, current: str) -> str:
-    lower = text.lower()
-    for name, data in PERSONAS.items():
-        if any(t in lower for t in data["triggers"]):
-            return name
-    return current
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Session state init
 # ─────────────────────────────────────────────────────────────────────────────
 def init_state():
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = current_user_id()
     if "profile" not in st.session_state:
-        st.session_state.profile = load_profile()
+        st.session_state.profile = load_profile(st.session_state.user_id)
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        # Only the recent tail; older pages are fetched on demand
+        st.session_state.messages = get_store().load_messages(
+            st.session_state.user_id, HISTORY_TAIL)
+    if "chat_visible" not in st.session_state:
+        st.session_state.chat_visible = CHAT_PAGE_SIZE
     if "active_persona" not in st.session_state:
         st.session_state.active_persona = "🧑‍🏫 Instructor"
     if "ollama_url" not in st.session_state:
@@ -477,56 +372,250 @@ def init_state():
     if "ollama_model" not in st.session_state:
         st.session_state.ollama_model = OLLAMA_DEFAULT_MODEL
     if "msg_count" not in st.session_state:
-        st.session_state.msg_count = 0
+        st.session_state.msg_count = get_store().count_messages(st.session_state.user_id)
     if "pending_prompt" not in st.session_state:
         st.session_state.pending_prompt = None
     if "aria_greeted" not in st.session_state:
         st.session_state.aria_greeted = False
+    if "ctx_budget" not in st.session_state:
+        st.session_state.ctx_budget = CONTEXT_TOKEN_BUDGET
+    if "last_ctx" not in st.session_state:
+        st.session_state.last_ctx = {}
+    if "last_render" not in st.session_state:
+        st.session_state.last_render = {}
+    if "last_generation" not in st.session_state:
+        st.session_state.last_generation = {}
+    if "cache_bypass" not in st.session_state:
+        st.session_state.cache_bypass = False
+    if "semantic_routing" not in st.session_state:
+        st.session_state.semantic_routing = False
+    if "embed_model" not in st.session_state:
+        st.session_state.embed_model = EMBED_MODEL
+    if "persona_source" not in st.session_state:
+        st.session_state.persona_source = None
+    if "gen_job" not in st.session_state:
+        st.session_state.gen_job = None
+    if "prefetch" not in st.session_state:
+        st.session_state.prefetch = False
 
 init_state()
 profile = st.session_state.profile
+# Background summary / fact results are merged here, on the script thread, never by the workers
+known_hours = profile.get("time_per_week")
+if (apply_pending_summary(st.session_state.user_id, profile)
+        | apply_pending_facts(st.session_state.user_id, profile)):
+    if profile.get("time_per_week") != known_hours:
+        plan_week(profile)                 # refit this week's tasks to the hours ARIA just learned
+    save_profile(profile)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Core send-message logic
 # ─────────────────────────────────────────────────────────────────────────────
-def send_message(user_text: str):
-    p = st.session_state.profile
+def chat_cache_key(prompt: str, profile: dict) -> str:
+    """
+    Cache key for a fixed button prompt: this user, the prompt-relevant
+    profile and the rolling summary. The recent turns are left out on
+    purpose: they always include the previous button exchange, so keying on
+    them would make every click a miss.
+    """
+    return cache_key(
+        st.session_state.ollama_model, prompt_fingerprint(profile), prompt,
+        history_hash([st.session_state.user_id, profile.get("conversation_summary") or ""]),
+        chat_options(st.session_state.ctx_budget),
+    )
+
+
+def remember_message(msg: dict):
+    """Add a stored message to the in-memory tail, dropping what falls out of HISTORY_TAIL."""
+    msgs = st.session_state.messages
+    msgs.append(msg)
+    del msgs[:-HISTORY_TAIL]
+    st.session_state.msg_count += 1
 
-    # Detect persona
-    st.session_state.active_persona = detect_persona(user_text, st.session_state.active_persona)
 
-    # Heuristic profile update from user text
-    if heuristic_profile_update(user_text, p):
+def chat_page(visible: int) -> list:
+    """
+    The newest `visible` messages. Pages older than the in-memory tail are
+    read from the store for this render only, never kept in session state.
+    """
+    msgs = st.session_state.messages
+    if len(msgs) >= visible or not msgs or msgs[0]["seq"] == 0:
+        return msgs[-visible:]
+    return get_store().load_messages(
+        st.session_state.user_id, visible - len(msgs), before_seq=msgs[0]["seq"]) + msgs
+
+
+def send_message(user_text: str, hidden: bool = False, cacheable: bool = False):
+    """
+    Send one user turn and stream ARIA's reply. `cacheable` is for the fixed
+    button prompts: their replies are served from / stored in the response
+    cache unless the sidebar bypass is on.
+    """
+    p = st.session_state.profile
+    store = get_store()
+    uid = st.session_state.user_id
+
+    # Detect persona (embedding router if enabled; it falls back to keywords itself)
+    if st.session_state.semantic_routing:
+        router = get_router(st.session_state.ollama_url, st.session_state.embed_model)
+        with request_context(uid, INTERACTIVE):
+            st.session_state.active_persona, st.session_state.persona_source = router.route(
+                user_text, st.session_state.active_persona)
+    else:
+        st.session_state.active_persona = detect_persona(user_text, st.session_state.active_persona)
+        st.session_state.persona_source = "keywords"
+
+    # Rule-based profile update from user text
+    hours = p.get("time_per_week")
+    if update_profile_from_text(user_text, p):
+        if p.get("time_per_week") != hours:
+            plan_week(p)
         save_profile(p)
 
     # Append user message
-    st.session_state.messages.append({"role": "user", "content": user_text})
-    st.session_state.msg_count += 1
+    remember_message(store.append_message(uid, "user", user_text, hidden=hidden))
+
+    if not hidden:
+        with st.chat_message("user"):
+            st.markdown(user_text)
+
+    # Keyed on the profile as updated by this turn
+    history = list(st.session_state.messages[:-1])
+    key = chat_cache_key(user_text, p) if cacheable else None
+    cached = None
+    if key and not st.session_state.cache_bypass:
+        cached = get_cache().get(key)
+
+    if cached is not None:
+        with st.chat_message("assistant"):
+            st.markdown(cached)
+            st.caption("⚡ From cache — turn on *Always regenerate* in the sidebar for a fresh answer")
+        extractor = StreamingJSONExtractor()
+        extractor.feed(cached)
+        finish_reply(cached, extractor)
+        return
+
+    # Generate on a worker thread; this (and any later rerun) only drains it
+    ctx_stats = {}
+    url, model, budget = (st.session_state.ollama_url, st.session_state.ollama_model,
+                          st.session_state.ctx_budget)
+
+    persona = st.session_state.active_persona
+
+    def make_stream(cancel):
+        # Runs on the worker thread, so the scheduler sees this user's chat request
+        with request_context(uid, INTERACTIVE), trace_labels(op="chat", persona=persona):
+            yield from stream_ollama(user_text, history, p, url, model,
+                                     budget=budget, stats=ctx_stats, cancel=cancel)
+
+    st.session_state.gen_job = GenerationJob(
+        make_stream,
+        meta={"cache_key": key, "ctx_stats": ctx_stats, "extractor": StreamingJSONExtractor()},
+    )
+    drain_generation()
 
-    with st.chat_message("user"):
-        st.markdown(user_text)
 
-    # Stream ARIA response
+def drain_generation():
+    """
+    Render the running reply until it finishes or is stopped, then store it.
+    Called again after every rerun while a job is active, so clicking around
+    (or ⏹ Stop) never loses the reply; a stopped reply is kept as far as it got.
+    """
+    job = st.session_state.gen_job
+    p = st.session_state.profile
+    extractor = job.meta["extractor"]
+    queue = get_scheduler(st.session_state.ollama_url)
     with st.chat_message("assistant"):
-        box = st.empty()
-        full = ""
-        for tok in stream_ollama(
-            user_text,
-            st.session_state.messages[:-1],
-            p,
-            st.session_state.ollama_url,
-            st.session_state.ollama_model,
-        ):
-            full += tok
-            box.markdown(full + "▌")
-        box.markdown(full)
+        if st.button("⏹ Stop", key="stop_generation"):
+            job.cancel()
+        renderer = ThrottledRenderer(st.empty())
+        status = st.empty()
+        if job.shown:
+            renderer.resume(job.shown)
+        while not job.finished:
+            toks = job.drain(timeout=0.25)
+            for tok in toks:
+                renderer.feed(tok)
+                # Populate Roadmap / Projects / This Week as items complete
+                for kind, _ in extractor.feed(tok):
+                    apply_artifact(p, kind, list(extractor.items))
+                    status.caption(f"{ARTIFACT_LABELS[kind]}: {len(extractor.items)} parsed…")
+            if not toks:
+                # Also gives Streamlit a point to act on a Stop click / rerun
+                waited = f"{time.time() - job.started:.0f} s"
+                pos = queue.position(st.session_state.user_id) if not job.shown else 0
+                status.caption(f"⏳ In queue #{pos} · {waited}" if pos else f"⏳ {waited}")
+        full = job.shown
+        if job.cancelled:
+            full = (full.rstrip() + "\n\n" if full.strip() else "") + "*⏹ Stopped.*"
+        elif job.error is not None:
+            # stream_ollama reports Ollama errors inline; this is anything that escaped it
+            full += f"\n\n> ⚠️ **Error:** `{job.error}`"
+        full = renderer.finish(full)
+        status.empty()
+
+    ctx_stats = job.meta["ctx_stats"]
+    st.session_state.last_ctx = ctx_stats
+    st.session_state.last_render = renderer.stats(tokens=job.tokens, seconds=job.seconds)
+    st.session_state.gen_job = None
+    key = job.meta["cache_key"]
+    if key and full and not job.cancelled and job.error is None and not ctx_stats.get("error"):
+        get_cache().put(key, "chat", full)
+    finish_reply(full, extractor)
+
+
+def finish_reply(full: str, extractor: StreamingJSONExtractor):
+    """Store ARIA's reply and kick off the background follow-ups."""
+    p = st.session_state.profile
+    store = get_store()
+    uid = st.session_state.user_id
 
     # Absorb any generated JSON (roadmap / projects / tasks)
-    if maybe_absorb_generated_data(full, p):
+    if maybe_absorb_generated_data(full, p, extractor):
         save_profile(p)
 
-    st.session_state.messages.append({"role": "assistant", "content": full})
-    st.session_state.msg_count += 1
+    remember_message(store.append_message(uid, "assistant", full))
+
+    # Fold older turns into the running summary in the background
+    maybe_schedule_summary(
+        uid, st.session_state.messages, p,
+        st.session_state.ollama_url, st.session_state.ollama_model,
+        st.session_state.ctx_budget,
+    )
+    # Learn profile facts (strengths, gaps, tools…) from this exchange in the background
+    schedule_fact_extraction(
+        uid, p, st.session_state.messages[-2:],
+        st.session_state.ollama_url, st.session_state.ollama_model,
+    )
+
+
+def run_generation(kind: str, extra: str = "", regenerate: bool = False, merge: bool = False):
+    """
+    Generate an artifact via the structured-output API (not the chat) and store
+    it. `regenerate` (or the sidebar bypass) skips the response cache; `merge`
+    adds weekly tasks to the existing plan instead of replacing it.
+    """
+    p = st.session_state.profile
+    bypass = regenerate or st.session_state.cache_bypass
+    with st.spinner(f"ARIA is generating your {ARTIFACT_LABELS[kind].split(' ', 1)[1].lower()}…"):
+        try:
+            with request_context(st.session_state.user_id, INTERACTIVE), \
+                    trace_labels(op=f"generate:{kind}"):
+                items, stats = generate_artifact(
+                    st.session_state.ollama_url, st.session_state.ollama_model, kind, p, extra,
+                    bypass_cache=bypass)
+        except Exception as exc:
+            if isinstance(exc, requests.exceptions.ConnectionError):
+                report_failure(st.session_state.ollama_url)
+            st.error(f"⚠️ Generation failed: `{exc}`")
+            return
+    if merge:
+        merge_new_tasks(p, items)
+    else:
+        apply_artifact(p, kind, items)
+    save_profile(p)
+    st.session_state.last_generation = stats
+    st.rerun()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -544,11 +633,31 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
-    # Ollama
-    ok, avail = check_ollama(st.session_state.ollama_url)
-    cls = "oll-ok" if ok else "oll-err"
-    lbl = f"Ollama · {len(avail)} model(s)" if ok else "Ollama offline — ollama serve"
+    # Ollama servers (cached background probes — never block the render)
+    # Servers come from ARIA_OLLAMA_URLS only; ollama_url is this session's pick from the pool
+    pool = get_pool(BACKEND_URLS or [OLLAMA_DEFAULT_URL])
+    servers = pool.status()
+    up = [s for s in servers if s["ok"] and not s["ejected"]]
+    ok, avail = bool(up), pool.models()
+    if all(s["ok"] is None for s in servers):
+        cls, lbl = "oll-ok", "Ollama · checking…"
+    elif ok:
+        hosts = f" · {len(up)}/{len(servers)} servers" if len(servers) > 1 else ""
+        cls, lbl = "oll-ok", f"Ollama · {len(avail)} model(s){hosts}"
+    else:
+        cls, lbl = "oll-err", "Ollama offline — ollama serve"
     st.markdown(f'<div class="oll-badge {cls}">⬤ {lbl}</div>', unsafe_allow_html=True)
+    if st.button("🔄 Refresh models", key="refresh_models", use_container_width=True):
+        for s in servers:
+            get_probe(s["url"]).refresh()
+    with st.expander("🖧 Servers"):
+        st.caption("Set with `ARIA_OLLAMA_URLS`. Each session sticks to one server (its KV cache "
+                   "stays warm) and new sessions go to the least busy one that has the model.")
+        for s in servers:
+            state = ("❌ offline" if s["ok"] is False else "⛔ ejected" if s["ejected"]
+                     else "✅ up" if s["ok"] else "… checking")
+            mine = " · ← you" if s["url"] == st.session_state.ollama_url else ""
+            st.caption(f"`{s['url']}` {state} · {len(s['models'])} model(s) · load {s['load']}{mine}")
 
     st.markdown('<div class="sl">Model</div>', unsafe_allow_html=True)
     if avail:
@@ -560,6 +669,18 @@ with st.sidebar:
             placeholder="e.g. llama3.2", label_visibility="collapsed"
         )
         st.caption("`ollama pull llama3.2`")
+    st.session_state.ollama_url = pool.pick(st.session_state.ollama_model, st.session_state.user_id)
+    if ok:
+        # Load the model and the static prompt prefix before the first message
+        warm_up(st.session_state.ollama_url, st.session_state.ollama_model, ARIA_BASE_PROMPT)
+
+    st.markdown('<div class="sl">Context Budget</div>', unsafe_allow_html=True)
+    st.session_state.ctx_budget = st.select_slider(
+        "ctx_budget", options=[1024, 2048, 3072, 4096, 6144, 8192],
+        value=st.session_state.ctx_budget, label_visibility="collapsed",
+        help="Max tokens sent per request (system prompt + recent turns + your message). "
+             "Smaller = faster first token on CPU.",
+    )
 
     st.divider()
 
@@ -578,12 +699,37 @@ with st.sidebar:
       </div>
     </div>""", unsafe_allow_html=True)
 
+    if st.session_state.persona_source:
+        st.caption(f"Picked by {st.session_state.persona_source}")
+    st.session_state.semantic_routing = st.toggle(
+        "🧭 Semantic routing", value=st.session_state.semantic_routing,
+        help="Route messages by embedding similarity to each persona instead of keywords. "
+             "Falls back to keywords while the embedding model is unavailable or slow.",
+    )
+    if st.session_state.semantic_routing:
+        st.session_state.embed_model = st.text_input(
+            "embed_model", value=st.session_state.embed_model,
+            placeholder="e.g. nomic-embed-text", label_visibility="collapsed",
+        )
+        router = get_router(st.session_state.ollama_url, st.session_state.embed_model)
+        router.start()
+        rs = router.status
+        if rs == "ready":
+            st.caption("Embeddings ready")
+        elif rs == "disabled":
+            st.caption("NumPy not installed — using keywords")
+        elif rs == "unavailable":
+            st.caption(f"Embeddings unavailable — using keywords · `ollama pull {router.model}`")
+        else:
+            st.caption("Building persona vectors… (keywords meanwhile)")
+
     st.markdown('<div style="font-size:.58rem;color:#4E5870;font-family:Space Mono,monospace;'
                 'margin-bottom:5px;text-transform:uppercase;letter-spacing:1px;">Override</div>',
                 unsafe_allow_html=True)
     for pn in PERSONAS:
         if st.button(pn, key=f"pb_{pn}", use_container_width=True):
             st.session_state.active_persona = pn
+            st.session_state.persona_source = "manual override"
             st.rerun()
 
     st.divider()
@@ -600,6 +746,63 @@ with st.sidebar:
         disp = f"{ph_done}/{ph_total}" if ph_total else "—"
         st.markdown(f'<div class="mbox"><div class="mval">{disp}</div>'
                     f'<div class="mlbl">Phases</div></div>', unsafe_allow_html=True)
+    if facts_pending(st.session_state.user_id):
+        st.caption("🧠 Updating your profile from the chat…")
+    lc = st.session_state.last_ctx
+    if lc:
+        st.caption(f"Last request: ~{lc['tokens_sent']} / {lc['budget']} tokens · "
+                   f"{lc['turns_sent']} turns sent, {lc['turns_dropped']} trimmed")
+        if "prefill_ms" in lc:
+            st.caption(f"Prefill: {lc['prefill_ms']:.0f} ms for {lc['prompt_eval_count']} "
+                       f"prompt tokens evaluated by Ollama (the rest came from its KV cache)")
+    lr = st.session_state.last_render
+    if lr:
+        st.caption(f"Last reply: {lr['tokens_per_sec']} tok/s · {lr['frames_per_sec']} fps "
+                   f"({lr['frames']} frames for {lr['tokens']} tokens)")
+    lg = st.session_state.last_generation
+    if lg:
+        if lg.get("cached"):
+            st.caption(f"Last generation: {lg['kind']} · {lg['items']} items · ⚡ from cache")
+        else:
+            st.caption(f"Last generation: {lg['kind']} · {lg['items']} items · {lg['seconds']} s · "
+                       f"{lg['eval_count'] or '?'} tokens")
+    cs = get_cache().stats()
+    st.caption(f"Response cache: {cs['entries']} entries · {cs['hit_rate']:.0%} hit rate "
+               f"({cs['hits']} hits / {cs['misses']} misses)")
+    st.session_state.cache_bypass = st.toggle(
+        "♻️ Always regenerate (skip cache)", value=st.session_state.cache_bypass,
+        help="Button prompts and generated roadmaps/projects/tasks are cached per profile. "
+             "Turn this on to always ask the model again.",
+    )
+    st.session_state.prefetch = st.toggle(
+        "🔮 Prefetch roadmap, projects & tasks", value=st.session_state.prefetch,
+        help="Once ARIA knows your level, draft them in the background (chat always goes "
+             "first) so the Generate buttons answer instantly.",
+    )
+    if st.session_state.prefetch and ok:
+        schedule_prefetch(st.session_state.user_id, profile,
+                          st.session_state.ollama_url, st.session_state.ollama_model)
+    if prefetch_pending(st.session_state.user_id):
+        st.caption("🔮 Drafting your roadmap, projects and tasks…")
+    qm = get_scheduler(st.session_state.ollama_url).metrics()
+    st.caption(f"Ollama queue: {qm['inflight']}/{qm['max_inflight']} busy · "
+               f"{qm['interactive_queued']} chat + {qm['background_queued']} background waiting · "
+               f"p95 wait {qm['interactive_wait_p95_ms'] / 1000:.1f} s")
+    with st.expander("🩺 Diagnostics"):
+        rows = metrics_summary()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("No model calls yet.")
+        for kind, ex in extraction_stats().items():
+            st.caption(f"JSON extraction · {kind}: {ex['rate']:.0%} ok ({ex['ok']} / {ex['ok'] + ex['failed']})")
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button("📈 Prometheus", prometheus_text(), file_name="aria_metrics.prom",
+                               mime="text/plain", use_container_width=True)
+        with d2:
+            st.download_button("🧾 Traces", traces_jsonl(), file_name="aria_traces.jsonl",
+                               mime="application/x-ndjson", use_container_width=True)
 
     st.divider()
 
@@ -607,14 +810,11 @@ with st.sidebar:
     st.markdown('<div class="sl">Quick Prompts</div>', unsafe_allow_html=True)
     QUICK = {
         "📋 Generate My Roadmap":
-            "Based on everything you know about me so far, generate my personalized roadmap now. "
-            "Output it as a JSON block following the schema you've been given.",
+            "__gen__:roadmap",
         "🚀 Suggest My Projects":
-            "Based on my current level, suggest 3 portfolio projects for me. "
-            "Output them as a JSON block following the schema you've been given.",
+            "__gen__:projects",
         "📅 This Week's Tasks":
-            "Generate my weekly tasks for my current phase. "
-            "Output them as a JSON block following the schema you've been given.",
+            "__gen__:weekly_tasks",
         "⚡ Challenge Me":
             "Give me a coding challenge appropriate for my exact current level right now.",
         "🗺️ Career Advice":
@@ -635,10 +835,18 @@ with st.sidebar:
                     mime="application/json",
                     key="dl_profile",
                 )
+            elif action.startswith("__gen__:"):
+                run_generation(action.split(":", 1)[1])
             elif action == "__reset__":
-                if PROFILE_PATH.exists():
-                    PROFILE_PATH.unlink()
-                for k in ["profile","messages","msg_count","aria_greeted","active_persona","pending_prompt"]:
+                cancel_summary(st.session_state.user_id)
+                cancel_facts(st.session_state.user_id)
+                cancel_prefetch(st.session_state.user_id)
+                if st.session_state.gen_job:
+                    st.session_state.gen_job.cancel()
+                profile_writer(st.session_state.user_id).discard()
+                get_store().delete(st.session_state.user_id)
+                for k in ["profile","messages","msg_count","aria_greeted","active_persona","pending_prompt",
+                          "chat_visible", "persona_source", "gen_job"]:
                     if k in st.session_state:
                         del st.session_state[k]
                 st.rerun()
@@ -650,6 +858,9 @@ with st.sidebar:
 # ─────────────────────────────────────────────────────────────────────────────
 # Header
 # ─────────────────────────────────────────────────────────────────────────────
+if st.session_state.get("persist_notice"):
+    st.warning(st.session_state.pop("persist_notice"), icon="🛟")
+
 st.markdown("""
 <div class="aria-hdr">
   <div class="aria-wm">ARIA</div>
@@ -681,28 +892,40 @@ with tab_chat:
         greeting_prompt = (
             "Please introduce yourself and begin getting to know me naturally through conversation."
         )
-        send_message(greeting_prompt)
+        send_message(greeting_prompt, hidden=True)
         st.rerun()
 
-    # Render history (skip the hidden greeting trigger)
-    display_messages = st.session_state.messages
-    # Hide first user message (it was the internal greeting trigger)
-    if display_messages and display_messages[0]["role"] == "user":
-        display_messages = display_messages[1:]
-
-    for msg in display_messages:
+    # Render only the newest page(s); older messages stay in the store until asked for
+    visible = st.session_state.chat_visible
+    shown = chat_page(visible)
+    has_older = bool(shown) and shown[0]["seq"] > 0
+    if has_older and st.button("⬆️ Load older messages", key="load_older"):
+        st.session_state.chat_visible = visible = visible + CHAT_PAGE_SIZE
+        shown = chat_page(visible)
+
+    for msg in shown:
+        if msg.get("hidden"):      # e.g. the internal greeting trigger
+            continue
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
+    busy = st.session_state.gen_job is not None
+    user_in = st.chat_input("Talk to ARIA — anything on your mind…", disabled=busy)
+
+    # A reply still generating from before this rerun: pick it back up
+    if busy:
+        drain_generation()
+        st.rerun()
+
     # Pending prompt from sidebar
     if st.session_state.pending_prompt:
         prompt = st.session_state.pending_prompt
         st.session_state.pending_prompt = None
-        send_message(prompt)
+        send_message(prompt, cacheable=True)
         st.rerun()
 
     # Chat input
-    if user_in := st.chat_input("Talk to ARIA — anything on your mind…"):
+    if user_in:
         send_message(user_in)
         st.rerun()
 
@@ -761,6 +984,10 @@ with tab_profile:
         )
     st.markdown('</div>', unsafe_allow_html=True)
 
+    if profile.get("conversation_summary"):
+        with st.expander("🧾 What ARIA remembers from earlier chats"):
+            st.markdown(profile["conversation_summary"])
+
     # Manual overrides
     with st.expander("✏️ Edit profile manually"):
         c1, c2 = st.columns(2)
@@ -785,8 +1012,12 @@ with tab_profile:
             if new_ai:    profile["ai_exposure"]    = new_ai
             if new_hrs:   profile["time_per_week"]  = new_hrs
             if new_goal:  profile["career_goal"]    = new_goal
+            mark_manual(profile, [f for f, v in [("name", new_name), ("python_level", new_py),
+                                                 ("ai_exposure", new_ai), ("time_per_week", new_hrs),
+                                                 ("career_goal", new_goal)] if v])
             if new_py and new_ai:
                 profile["diagnosis_done"] = True
+            plan_week(profile)                 # refit this week's tasks to the new hours
             save_profile(profile)
             st.success("Profile saved!")
             st.rerun()
@@ -826,12 +1057,10 @@ with tab_road:
         """, unsafe_allow_html=True)
 
         if profile.get("diagnosis_done"):
+            if draft_ready(profile, st.session_state.ollama_model, "roadmap"):
+                st.caption("✨ A draft is ready — it opens instantly")
             if st.button("📋 Generate My Roadmap Now", use_container_width=True):
-                st.session_state.pending_prompt = (
-                    "Based on everything you know about me so far, generate my personalized roadmap now. "
-                    "Output it as a JSON block following the schema you've been given."
-                )
-                st.rerun()
+                run_generation("roadmap")
         else:
             st.markdown("""
             <div class="banner-info">
@@ -892,11 +1121,7 @@ with tab_road:
                     a1, a2 = st.columns(2)
                     with a1:
                         if st.button("📅 Generate Week Tasks", key=f"wtask_{i}"):
-                            st.session_state.pending_prompt = (
-                                f"Generate my weekly tasks for Phase {i+1}: {title}. "
-                                "Output them as a JSON block following the schema you've been given."
-                            )
-                            st.rerun()
+                            run_generation("weekly_tasks", f"My current phase is Phase {i+1}: {title}.")
                     with a2:
                         if st.button("📚 Teach This Phase", key=f"teach_{i}"):
                             st.session_state.pending_prompt = (
@@ -911,15 +1136,12 @@ with tab_road:
                         if i not in profile["completed_phases"]:
                             profile["completed_phases"].append(i)
                         profile["current_phase"] = min(i + 1, total - 1)
+                        plan_week(profile)     # drops the finished phase's tasks, no model call
                         save_profile(profile)
                         st.rerun()
 
         if st.button("🔄 Regenerate Roadmap", use_container_width=True):
-            st.session_state.pending_prompt = (
-                "Please regenerate my roadmap from scratch based on my current profile. "
-                "Output it as a JSON block following the schema you've been given."
-            )
-            st.rerun()
+            run_generation("roadmap", regenerate=True)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -946,12 +1168,10 @@ with tab_proj:
         </div>
         """, unsafe_allow_html=True)
         if profile.get("diagnosis_done"):
+            if draft_ready(profile, st.session_state.ollama_model, "projects"):
+                st.caption("✨ A draft is ready — it opens instantly")
             if st.button("🚀 Suggest Projects for My Level", use_container_width=True):
-                st.session_state.pending_prompt = (
-                    "Based on my current level, suggest 3 portfolio projects for me. "
-                    "Output them as a JSON block following the schema you've been given."
-                )
-                st.rerun()
+                run_generation("projects")
     else:
         cx_colors = {"Beginner": "#10F5A0", "Intermediate": "#4F8EF7", "Advanced": "#F472B6"}
         accent_colors = ["#4FF79E", "#4F8EF7", "#F74FA8"]
@@ -998,18 +1218,17 @@ with tab_proj:
             st.markdown("<div style='height:4px'></div>", unsafe_allow_html=True)
 
         if st.button("🔄 Regenerate Project Suggestions", use_container_width=True):
-            st.session_state.pending_prompt = (
-                "Suggest 3 fresh portfolio projects based on my current level. "
-                "Output them as a JSON block following the schema you've been given."
-            )
-            st.rerun()
+            run_generation("projects", "Suggest fresh ideas, different from any you suggested before.",
+                           regenerate=True)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # THIS WEEK TAB
 # ══════════════════════════════════════════════════════════════════════════════
 with tab_tasks:
-    tasks = profile.get("weekly_tasks", [])
+    # The plan is only redone where hours, phase or ticks change; rendering just reads it
+    week = week_stats(profile)
+    tasks = profile.get("weekly_tasks") or []
     roadmap = profile.get("roadmap", [])
     current_idx = profile.get("current_phase", 0)
 
@@ -1048,12 +1267,10 @@ with tab_tasks:
 
         can_gen = bool(roadmap) or profile.get("diagnosis_done")
         if can_gen:
+            if draft_ready(profile, st.session_state.ollama_model, "weekly_tasks"):
+                st.caption("✨ A draft is ready — it opens instantly")
             if st.button("📅 Generate This Week's Tasks", use_container_width=True):
-                st.session_state.pending_prompt = (
-                    "Generate my weekly tasks for my current learning phase. "
-                    "Output them as a JSON block following the schema you've been given."
-                )
-                st.rerun()
+                run_generation("weekly_tasks")
         else:
             st.markdown("""
             <div class="banner-info">
@@ -1062,16 +1279,16 @@ with tab_tasks:
             </div>
             """, unsafe_allow_html=True)
     else:
-        # Total hours
-        total_hrs = sum(float(t.get("estimated_hours", 1)) for t in tasks)
         avail_hrs = profile.get("time_per_week") or "?"
+        scheduled = [t for t in tasks if not t.get("deferred")]
+        n_done = sum(1 for t in scheduled if t.get("done"))
 
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.markdown(f'<div class="mbox"><div class="mval">{len(tasks)}</div>'
-                        f'<div class="mlbl">Tasks</div></div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="mbox"><div class="mval">{n_done}/{len(scheduled)}</div>'
+                        f'<div class="mlbl">Tasks Done</div></div>', unsafe_allow_html=True)
         with col2:
-            st.markdown(f'<div class="mbox"><div class="mval">{total_hrs:.0f}h</div>'
+            st.markdown(f'<div class="mbox"><div class="mval">{week["scheduled_hours"]:.0f}h</div>'
                         f'<div class="mlbl">Est. Time</div></div>', unsafe_allow_html=True)
         with col3:
             st.markdown(f'<div class="mbox"><div class="mval">{avail_hrs}h</div>'
@@ -1079,36 +1296,58 @@ with tab_tasks:
 
         st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
 
+        key_seen = {}
         for t in tasks:
             day      = t.get("day", "")
             task_txt = t.get("task", "")
             resource = t.get("resource", "")
             est_hrs  = t.get("estimated_hours", "")
+            if t.get("deferred"):
+                continue
+            tid = task_id(t)
+            key_seen[tid] = key_seen.get(tid, -1) + 1     # the model may repeat a task verbatim
 
             meta_parts = []
             if est_hrs:   meta_parts.append(f"⏱ {est_hrs}h")
             if resource:  meta_parts.append(f"📖 {resource}")
             meta_html = " &nbsp;·&nbsp; ".join(meta_parts)
+            if t.get("done"):
+                task_txt = f"<s>{task_txt}</s>"
+
+            c_chk, c_card = st.columns([1, 14])
+            with c_chk:
+                done = st.checkbox("done", value=bool(t.get("done")), key=f"task_done_{tid}_{key_seen[tid]}",
+                                   label_visibility="collapsed")
+            with c_card:
+                st.markdown(f"""
+                <div class="task-card">
+                  <div class="task-day">{day}</div>
+                  <div>
+                    <div class="task-text">{task_txt}</div>
+                    {f'<div class="task-meta">{meta_html}</div>' if meta_html else ''}
+                  </div>
+                </div>
+                """, unsafe_allow_html=True)
+            if done != bool(t.get("done")):
+                t["done"] = done
+                plan_week(profile)
+                save_profile(profile)
+                st.rerun()
 
-            st.markdown(f"""
-            <div class="task-card">
-              <div class="task-day">{day}</div>
-              <div>
-                <div class="task-text">{task_txt}</div>
-                {f'<div class="task-meta">{meta_html}</div>' if meta_html else ''}
-              </div>
-            </div>
-            """, unsafe_allow_html=True)
+        later = [t for t in tasks if t.get("deferred")]
+        if later:
+            st.caption("⏭ Doesn't fit this week's hours: "
+                       + " · ".join(f"{t.get('task', '')} ({t.get('estimated_hours', '?')}h)" for t in later))
+        fill = fill_request(profile, week)
+        if fill and st.button(f"➕ Fill my free {week['free_hours']:g}h", use_container_width=True,
+                              help="Asks ARIA only for the missing tasks; your current ones stay."):
+            run_generation("weekly_tasks", fill, merge=True)
 
         st.divider()
         b1, b2 = st.columns(2)
         with b1:
             if st.button("🔄 Regenerate Tasks", use_container_width=True):
-                st.session_state.pending_prompt = (
-                    "Generate a fresh set of weekly tasks for my current phase. "
-                    "Output them as a JSON block following the schema you've been given."
-                )
-                st.rerun()
+                run_generation("weekly_tasks", regenerate=True)
         with b2:
             if st.button("⚡ Challenge Me on These Topics", use_container_width=True):
                 topics_str = ", ".join(t.get("task","")[:40] for t in tasks[:3])
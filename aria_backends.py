@@ -0,0 +1,143 @@
+"""
+aria_backends.py
+────────────────
+Pool of Ollama servers.
+Each server's health and model list come from its cached background probe
+(aria_ollama.get_probe). A session is routed to the least-loaded healthy
+server that has its model, counting in-flight plus queued requests from the
+server's scheduler, and then sticks to it so follow-up turns reuse that
+server's KV cache. A server that refuses a connection is ejected for
+EJECT_SECONDS and re-admitted once a fresh probe finds it up again.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from aria_ollama import get_probe, stop_probe
+from aria_scheduler import MAX_INFLIGHT, get_scheduler
+
+EJECT_SECONDS = 30.0           # minimum time out of rotation after a failed request
+STICKY_MAX_EXTRA = MAX_INFLIGHT    # leave the sticky server once it is this much busier than the best
+STICKY_SESSIONS = 10_000       # session → server assignments remembered per pool
+MAX_POOLS = 8                  # distinct server lists kept; the least recently used is dropped
+
+_ejected = {}                  # url → (ejected_at, readmit_not_before)
+_ejected_lock = threading.Lock()
+
+
+def parse_urls(text: str) -> list:
+    """Comma / whitespace separated URLs → de-duplicated list, order kept."""
+    urls = [u.strip().rstrip("/") for u in text.replace(",", " ").split()]
+    return list(dict.fromkeys(u for u in urls if u))
+
+
+# Deployment config only: letting a browser session choose hosts would let it
+# make the server connect anywhere
+BACKEND_URLS = parse_urls(os.environ.get("ARIA_OLLAMA_URLS", ""))
+
+
+def report_failure(url: str):
+    """Take `url` out of rotation (every pool) after a connection failure."""
+    url = url.rstrip("/")
+    now = time.time()
+    with _ejected_lock:
+        _ejected[url] = (now, now + EJECT_SECONDS)
+    get_probe(url).refresh()
+
+
+def has_model(models: list, model: str) -> bool:
+    return model in models or f"{model}:latest" in models
+
+
+class BackendPool:
+    """Routing over a fixed list of Ollama URLs."""
+
+    def __init__(self, urls: list):
+        self.urls = list(urls)
+        self._lock = threading.Lock()
+        self._sticky = OrderedDict()       # session → url
+        self._assigned = Counter()         # url → sessions stuck to it (tie-break when idle)
+
+    def _state(self, url: str) -> dict:
+        snap = get_probe(url).snapshot()
+        with _ejected_lock:
+            ejected = _ejected.get(url)
+            if ejected and snap["ok"] and time.time() >= ejected[1] \
+                    and (snap["checked_at"] or 0) > ejected[0]:
+                del _ejected[url]          # re-admitted by a probe taken after the failure
+                ejected = None
+        return {
+            "url": url,
+            "ok": snap["ok"],
+            "ejected": ejected is not None,
+            "models": snap["models"],
+            "load": get_scheduler(url).load(),
+        }
+
+    def status(self) -> list:
+        """Per-server view for the UI: url, ok, ejected, models, load."""
+        return [self._state(u) for u in self.urls]
+
+    def models(self) -> list:
+        """Union of the model lists of the healthy servers (first-seen order)."""
+        seen = {}
+        for s in self.status():
+            if s["ok"] and not s["ejected"]:
+                seen.update(dict.fromkeys(s["models"]))
+        return list(seen)
+
+    def pick(self, model: str, session: str) -> str:
+        """
+        Server for `session`'s next request. Keeps the previous choice while it
+        is healthy, has `model` and is not STICKY_MAX_EXTRA busier than the
+        least-loaded alternative.
+        """
+        states = self.status()
+        healthy = [s for s in states if s["ok"] and not s["ejected"]]
+        # Before the first probes finish nothing is known yet; don't rule anything out
+        candidates = (
+            [s for s in healthy if has_model(s["models"], model)] or healthy
+            or [s for s in states if s["ok"] is None and not s["ejected"]]
+            or states
+        )
+        with self._lock:
+            best = min(candidates, key=lambda s: (s["load"], self._assigned[s["url"]]))
+            current = self._sticky.get(session)
+            keep = next((s for s in candidates if s["url"] == current), None)
+            if keep is not None and keep["load"] - best["load"] < STICKY_MAX_EXTRA:
+                choice = current
+            else:
+                choice = best["url"]
+                if current is not None:
+                    self._assigned[current] -= 1
+                self._assigned[choice] += 1
+            self._sticky[session] = choice
+            self._sticky.move_to_end(session)
+            while len(self._sticky) > STICKY_SESSIONS:
+                self._assigned[self._sticky.popitem(last=False)[1]] -= 1
+        return choice
+
+
+_pools = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(urls: list) -> BackendPool:
+    """
+    Process-wide pool for this list of URLs (shared stickiness across
+    sessions). At most MAX_POOLS are kept, least recently used first out.
+    """
+    key = tuple(u.rstrip("/") for u in urls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = BackendPool(key)
+            while len(_pools) > MAX_POOLS:
+                dropped, _ = _pools.popitem(last=False)
+                in_use = {u for k in _pools for u in k}
+                for url in set(dropped) - in_use:
+                    stop_probe(url)
+        _pools.move_to_end(key)
+        return pool
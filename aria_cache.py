@@ -0,0 +1,136 @@
+"""
+aria_cache.py
+─────────────
+Content-addressed cache for deterministic LLM requests (button prompts and
+artifact generation). Keys hash everything that can change the answer: model,
+system-prompt fingerprint, prompt, relevant history and sampling options.
+Entries live in SQLite next to the profile store, with a TTL and LRU eviction.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from aria_store import DB_PATH
+
+CACHE_TTL = 7 * 24 * 3600      # seconds an entry stays valid
+CACHE_MAX_ENTRIES = 2000       # LRU-evict beyond this many rows
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    key        TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL,          -- 'chat' | artifact kind
+    value      TEXT NOT NULL,          -- JSON-encoded response
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS response_cache_lru ON response_cache (last_used);
+"""
+
+
+def history_hash(texts) -> str:
+    """Order-sensitive digest of the history pieces a response depends on."""
+    h = hashlib.blake2b(digest_size=12)
+    for t in texts:
+        h.update(t.encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def cache_key(model: str, system_fp: str, prompt: str, history_fp: str, options: dict) -> str:
+    raw = json.dumps([model, system_fp, prompt, history_fp, options], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=DB_PATH, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn.executescript(_SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        """Cached value for `key`, or None (expired entries count as misses)."""
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT value, created_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            if row is not None:
+                self.conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            with self._lock:
+                self.misses += 1
+            return None
+        self.conn.execute(
+            "UPDATE response_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+        )
+        with self._lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def contains(self, key: str) -> bool:
+        """True if `key` has a live entry; unlike get() it leaves the hit stats alone."""
+        row = self.conn.execute(
+            "SELECT created_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def put(self, key: str, kind: str, value):
+        now = time.time()
+        conn = self.conn
+        conn.execute(
+            "INSERT INTO response_cache (key, kind, value, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+            "value = excluded.value, created_at = excluded.created_at, last_used = excluded.last_used",
+            (key, kind, json.dumps(value), now, now),
+        )
+        (count,) = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM response_cache WHERE key IN "
+                "(SELECT key FROM response_cache ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        self.conn.execute("DELETE FROM response_cache")
+
+    def stats(self) -> dict:
+        (entries,) = self.conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"entries": entries, "hits": hits, "misses": misses,
+                "hit_rate": round(hits / total, 3) if total else 0.0}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path=DB_PATH) -> ResponseCache:
+    """Process-wide response cache for `path`."""
+    key = str(Path(path).resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResponseCache(path)
+        return cache
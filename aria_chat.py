@@ -0,0 +1,139 @@
+"""
+aria_chat.py
+────────────
+The chat turn without the UI: streaming a reply from Ollama, pulling any
+roadmap / projects / weekly-tasks JSON out of it, and queuing the profile
+write. app.py wraps these with session state and rendering; the offline
+benchmark (bench/harness.py) drives them directly.
+"""
+
+from datetime import datetime
+
+import requests
+
+from aria_backends import report_failure
+from aria_context import CONTEXT_TOKEN_BUDGET, build_context
+from aria_json import StreamingJSONExtractor, coerce_items, extract_json_block
+from aria_metrics import record_extraction
+from aria_ollama import KEEP_ALIVE, NUM_CTX, get_client, prefill_stats
+from aria_persist import get_writer
+from aria_planner import plan_week, tag_tasks
+from aria_store import get_store
+from aria_summary import unsummarized_start
+from aria_system import build_system_prompt
+
+CHAT_OPTIONS = {"temperature": 0.72, "top_p": 0.9, "num_predict": 2048, "num_ctx": NUM_CTX}
+NUM_CTX_HEADROOM = 256         # tokens for the chat template and the estimate's error
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────────
+def chat_messages(prompt: str, history: list, profile: dict, budget: int = CONTEXT_TOKEN_BUDGET):
+    """
+    The /api/chat `messages` for this turn, with build_context's stats. History
+    is trimmed to `budget` tokens and turns already folded into the profile's
+    running summary are replaced by that summary.
+    """
+    upto = unsummarized_start(history, profile.get("summary_upto", 0))
+    return build_context(
+        build_system_prompt(profile), history[upto:], prompt, budget,
+        summary=profile.get("conversation_summary", ""),
+    )
+
+
+def chat_options(budget: int = CONTEXT_TOKEN_BUDGET) -> dict:
+    """
+    CHAT_OPTIONS with a `num_ctx` that fits the whole budgeted request plus
+    the reply. Without it Ollama uses the model's default window and
+    silently drops the front of the prompt — the system prompt first. Stays
+    at the shared NUM_CTX unless the budget needs more.
+    """
+    need = budget + CHAT_OPTIONS["num_predict"] + NUM_CTX_HEADROOM
+    return {**CHAT_OPTIONS, "num_ctx": max(NUM_CTX, need)}
+
+
+def stream_ollama(prompt: str, history: list, profile: dict, url: str, model: str,
+                  budget: int = CONTEXT_TOKEN_BUDGET, stats: dict = None, cancel=None):
+    """
+    Stream tokens from Ollama, yielding each token as a string. The request
+    is built by chat_messages(); pass a dict as `stats` to receive what was
+    actually sent (see aria_context.build_context).
+    Cancelling `cancel` (an aria_ollama.CancelToken) ends the stream quietly.
+    """
+    messages, ctx_stats = chat_messages(prompt, history, profile, budget)
+    if stats is not None:
+        stats.update(ctx_stats)
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "stream": True,
+        "keep_alive": KEEP_ALIVE,
+        "options": chat_options(budget),
+    }
+    try:
+        for chunk in get_client(url).chat_stream(payload, cancel=cancel):
+            tok = chunk.get("message", {}).get("content", "")
+            if tok:
+                yield tok
+            if chunk.get("done") and stats is not None:
+                stats.update(prefill_stats(chunk))
+    except requests.exceptions.ConnectionError:
+        report_failure(url)
+        if stats is not None:
+            stats["error"] = True
+        yield (
+            "\n\n> ⚠️ **Ollama not reachable.**\n"
+            "> Run: `ollama serve`  then  `ollama pull llama3.2`"
+        )
+    except Exception as exc:
+        if stats is not None:
+            stats["error"] = True
+        yield f"\n\n> ⚠️ **Error:** `{exc}`"
+
+
+# ── Generated data ────────────────────────────────────────────────────────────
+def apply_artifact(profile: dict, kind: str, items: list):
+    """Store a generated roadmap / projects / weekly-tasks list on the profile."""
+    profile[kind] = items
+    if kind == "roadmap":
+        profile["current_phase"] = 0
+        profile["completed_phases"] = []
+        plan_week(profile)                 # tasks from the old roadmap's later phases no longer apply
+    elif kind == "weekly_tasks":
+        profile[kind] = tag_tasks(items, profile.get("current_phase", 0))
+        plan_week(profile)
+
+
+def maybe_absorb_generated_data(response_text: str, profile: dict,
+                                extractor: StreamingJSONExtractor = None) -> bool:
+    """
+    If the response contains a JSON block that looks like roadmap / projects /
+    weekly tasks, absorb it into the profile. Items already validated by the
+    streaming `extractor` win; otherwise the whole block is parsed with repair.
+    Returns True if profile was changed.
+    """
+    if extractor is not None and extractor.items:
+        kind, items = extractor.kind, extractor.items
+    else:
+        block = extract_json_block(response_text)
+        if block is None:
+            return False
+        kind, items = coerce_items(block)
+    record_extraction(f"chat:{kind or 'unknown'}", kind is not None)
+    if kind is None:
+        return False
+    apply_artifact(profile, kind, list(items))
+    return True
+
+
+# ── Persistence ───────────────────────────────────────────────────────────────
+def profile_writer(user_id: str):
+    """The debounced profile writer for `user_id` (one per user, process-wide)."""
+    store = get_store()
+    return get_writer(f"profile:{user_id}", lambda data: store.save(user_id, data))
+
+
+def save_profile(profile: dict, user_id: str):
+    """Stamp `profile` and queue a debounced write of only the changed fields."""
+    profile["last_updated"] = datetime.now().isoformat()
+    profile_writer(user_id).schedule(profile)
@@ -0,0 +1,95 @@
+"""
+aria_context.py
+───────────────
+Token-budgeted context window for chat requests.
+The system prompt and the new user prompt are always sent; history fills the
+remaining budget newest-first, so prefill cost stays bounded no matter how
+long (or how pasted-code-heavy) the conversation gets.
+"""
+
+import re
+from functools import lru_cache
+
+CONTEXT_TOKEN_BUDGET = 3072    # default budget: system + history + prompt
+MESSAGE_OVERHEAD = 4           # role/template tokens the chat format adds per message
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_tokenizer = None
+
+
+def approx_tokens(text: str) -> int:
+    """
+    Fast tokenizer-free estimate: one token per word or punctuation mark,
+    but never fewer than ~4 characters per token (long identifiers, URLs).
+    """
+    if not text:
+        return 0
+    return max(len(_PIECE_RE.findall(text)), len(text) // 4)
+
+
+def set_tokenizer(fn=None):
+    """
+    Plug in an exact tokenizer, e.g. `lambda s: len(enc.encode(s))`.
+    Pass None to go back to the approximate counter.
+    """
+    global _tokenizer
+    _tokenizer = fn
+    _count_cached.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def _count_cached(text: str) -> int:
+    if _tokenizer is not None:
+        try:
+            return int(_tokenizer(text))
+        except Exception:
+            pass
+    return approx_tokens(text)
+
+
+def count_tokens(text: str) -> int:
+    return _count_cached(text or "")
+
+
+def build_context(system_prompt: str, history: list, prompt: str,
+                  budget: int = CONTEXT_TOKEN_BUDGET, summary: str = ""):
+    """
+    Assemble the /api/chat `messages` list within `budget` tokens.
+    A running `summary` of older turns, if any, goes right after the system
+    prompt and is always kept. Returns (messages, stats) where stats records
+    what was actually sent.
+    """
+    summary_msg = f"Summary of the earlier conversation:\n{summary}" if summary else ""
+    system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD
+    summary_tokens = count_tokens(summary_msg) + MESSAGE_OVERHEAD if summary_msg else 0
+    prompt_tokens = count_tokens(prompt) + MESSAGE_OVERHEAD
+    remaining = budget - system_tokens - summary_tokens - prompt_tokens
+
+    kept = []
+    history_tokens = 0
+    for m in reversed(history):
+        cost = count_tokens(m["content"]) + MESSAGE_OVERHEAD
+        if cost > remaining:
+            break
+        kept.append({"role": m["role"], "content": m["content"]})
+        remaining -= cost
+        history_tokens += cost
+    kept.reverse()
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary_msg:
+        messages.append({"role": "system", "content": summary_msg})
+    messages.extend(kept)
+    messages.append({"role": "user", "content": prompt})
+
+    stats = {
+        "budget": budget,
+        "system_tokens": system_tokens,
+        "summary_tokens": summary_tokens,
+        "history_tokens": history_tokens,
+        "prompt_tokens": prompt_tokens,
+        "tokens_sent": system_tokens + summary_tokens + history_tokens + prompt_tokens,
+        "turns_sent": len(kept),
+        "turns_dropped": len(history) - len(kept),
+    }
+    return messages, stats
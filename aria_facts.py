@@ -0,0 +1,213 @@
+"""
+aria_facts.py
+─────────────
+Background LLM extraction of profile facts.
+After each assistant reply the exchange is queued for a small structured-output
+request that reports what it reveals about the learner (level, tools, goal,
+strengths, gaps…). Results merge through aria_profile_rules.apply_profile_facts,
+so they respect field confidence. Work runs on a background thread and never
+touches the chat stream or the live profile: results wait in a queue until
+the script thread merges them with apply_pending_facts(). Exchanges that
+arrive while a job is running for the same user are coalesced into its
+next request. State is keyed by user id and dropped on reset or once no
+rerun has touched it for FACTS_IDLE_TTL.
+"""
+
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aria_metrics import record_extraction, trace_labels
+from aria_ollama import KEEP_ALIVE, NUM_CTX, get_client
+from aria_profile_rules import LIST_FIELDS, apply_profile_facts
+from aria_scheduler import BACKGROUND, request_context
+
+FACTS_CONFIDENCE = 0.7         # above a bare keyword hit, below an explicit statement
+FACTS_MAX_TOKENS = 256         # num_predict for the extraction
+FACTS_MAX_MESSAGES = 8         # newest pending messages sent per request
+FACTS_MAX_CHARS = 1500         # per message; long code pastes add little
+FACTS_MAX_USERS = 256          # users with queued work or results kept (least recently seen idle go first)
+FACTS_IDLE_TTL = 3600          # seconds; no rerun touching a user for this long means no live session
+
+FACTS_PROMPT = (
+    "You extract facts about a learner from a conversation with their AI mentor, ARIA. "
+    "Report only what the new messages state or clearly show about the LEARNER; use \"\" / 0 / [] "
+    "for anything not covered. Do not repeat facts already in the known profile unless they changed. "
+    "strengths and gaps are short skill phrases (e.g. \"pandas data wrangling\", \"async Python\"). "
+    "Output JSON only."
+)
+
+FACTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "python_level": {"type": "string", "enum": ["", "beginner", "intermediate", "advanced"]},
+        "ai_exposure": {"type": "string", "enum": ["", "none", "theory_only", "some_projects"]},
+        "time_per_week": {"type": "integer"},
+        "career_goal": {"type": "string"},
+        "current_tools": {"type": "array", "items": {"type": "string"}},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "gaps": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["name", "python_level", "ai_exposure", "time_per_week", "career_goal",
+                 "current_tools", "strengths", "gaps"],
+}
+_KNOWN_FIELDS = list(FACTS_SCHEMA["properties"])
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="aria-facts")
+
+
+class _UserFacts:
+    """One user's extraction queue. Only touched under _lock."""
+
+    def __init__(self):
+        self.pending = []      # messages waiting for the next request
+        self.last_seq = -1     # newest seq already queued (dedupe)
+        self.results = []      # facts waiting to be merged on the script thread
+        self.running = False
+        self.cancelled = False
+        self.seen = time.monotonic()
+
+
+_users = OrderedDict()         # user_id → _UserFacts, least recently seen first
+_lock = threading.Lock()
+
+
+def _user(user_id: str, create: bool = False):
+    """This user's queue (marked as seen), expiring idle ones. Call with _lock held."""
+    now = time.monotonic()
+    while _users:
+        uid, oldest = next(iter(_users.items()))
+        stale = now - oldest.seen >= FACTS_IDLE_TTL or len(_users) >= FACTS_MAX_USERS
+        if not stale or oldest.running or uid == user_id:
+            break
+        _drop(uid)
+    state = _users.get(user_id)
+    if state is None and create:
+        state = _users[user_id] = _UserFacts()
+    if state is not None:
+        state.seen = now
+        _users.move_to_end(user_id)
+    return state
+
+
+def _drop(user_id: str):
+    state = _users.pop(user_id, None)
+    if state is not None:
+        state.cancelled = True             # a running job sees this and stops
+
+
+def extract_facts(url: str, model: str, profile: dict, messages: list) -> dict:
+    """Blocking call: {field: (value, confidence)} for what `messages` reveal."""
+    known = {f: profile.get(f) for f in _KNOWN_FIELDS if profile.get(f)}
+    transcript = "\n\n".join(
+        f"{'Learner' if m['role'] == 'user' else 'ARIA'}: {m['content'][:FACTS_MAX_CHARS]}"
+        for m in messages
+    )
+    resp = get_client(url).chat({
+        "model": model,
+        "messages": [
+            {"role": "system", "content": FACTS_PROMPT},
+            {"role": "user", "content": f"KNOWN PROFILE:\n{json.dumps(known)}\n\nNEW MESSAGES:\n{transcript}"},
+        ],
+        "format": FACTS_SCHEMA,
+        "keep_alive": KEEP_ALIVE,
+        "options": {"temperature": 0, "num_predict": FACTS_MAX_TOKENS, "num_ctx": NUM_CTX},
+    })
+    try:
+        data = json.loads(resp.get("message", {}).get("content", "") or "{}")
+    except json.JSONDecodeError:
+        record_extraction("facts", False)
+        raise
+    record_extraction("facts", True)
+    facts = {}
+    for field in _KNOWN_FIELDS:
+        value = data.get(field)
+        if field in LIST_FIELDS:
+            value = [str(v).strip() for v in value or [] if str(v).strip()]
+        elif field == "time_per_week":
+            value = value if isinstance(value, int) and 0 < value <= 80 else None
+        elif isinstance(value, str):
+            value = value.strip()
+        if value:
+            facts[field] = (value, FACTS_CONFIDENCE)
+    return facts
+
+
+def schedule_fact_extraction(user_id: str, profile: dict, messages: list, url: str, model: str) -> bool:
+    """
+    Queue `messages` (the latest exchange, each with a `seq`) for extraction.
+    If a job is already running for this user they join its next request;
+    messages at or below the newest seq queued before are skipped. The job
+    works on a snapshot of the known fields; its results are merged by
+    apply_pending_facts(). Returns True if anything was queued.
+    """
+    with _lock:
+        state = _user(user_id, create=True)
+        fresh = [dict(m) for m in messages if m.get("seq", 0) > state.last_seq and not m.get("hidden")]
+        if not fresh:
+            return False
+        state.last_seq = max(m.get("seq", 0) for m in fresh)
+        state.pending.extend(fresh)
+        if state.running:
+            return True            # picked up by the running job's next round
+        state.running = True
+    # What the worker may read: a copy, taken here on the script thread
+    known = copy.deepcopy({f: profile.get(f) for f in (*_KNOWN_FIELDS, "field_confidence")})
+
+    def job():
+        try:
+            while True:
+                with _lock:
+                    batch, state.pending = state.pending[-FACTS_MAX_MESSAGES:], []
+                    if not batch or state.cancelled:
+                        return
+                try:
+                    with request_context(user_id, BACKGROUND), trace_labels(op="facts"):
+                        facts = extract_facts(url, model, known, batch)
+                except Exception:
+                    continue       # this batch is dropped; newer messages still get a try
+                apply_profile_facts(known, facts)      # the next batch sees what this one found
+                with _lock:
+                    if state.cancelled:
+                        return
+                    state.results.append(facts)
+        finally:
+            with _lock:
+                state.running = False
+                # A message queued between the last pop and this point would be stranded
+                if state.pending and not state.cancelled:
+                    state.running = True
+                    _executor.submit(job)
+
+    _executor.submit(job)
+    return True
+
+
+def apply_pending_facts(user_id: str, profile: dict) -> bool:
+    """Merge `user_id`'s finished extractions into `profile`. Call on the script thread; True if it changed."""
+    with _lock:
+        state = _user(user_id)
+        results = []
+        if state is not None:
+            results, state.results = state.results, []
+    changed = False
+    for facts in results:
+        changed = apply_profile_facts(profile, facts) or changed
+    return changed
+
+
+def facts_pending(user_id: str) -> bool:
+    """True while an extraction is queued or running for `user_id`."""
+    with _lock:
+        state = _users.get(user_id)
+        return bool(state and state.running)
+
+
+def cancel_facts(user_id: str):
+    """Drop queued work, results and the seq watermark for `user_id` (used on reset)."""
+    with _lock:
+        _drop(user_id)
@@ -0,0 +1,127 @@
+"""
+aria_generate.py
+────────────────
+Structured generation of roadmap / projects / weekly tasks, separate from chat.
+Each request sends the artifact's JSON Schema through Ollama's `format` field,
+so the model can only emit schema-shaped JSON; low temperature and a tight
+num_predict keep it short. Results are repaired and validated before use, and
+cached by (model, profile fingerprint, request, options).
+"""
+
+import time
+
+from aria_cache import cache_key, get_cache
+from aria_json import coerce_items, repair_json
+from aria_metrics import record_extraction
+from aria_ollama import KEEP_ALIVE, NUM_CTX, get_client
+from aria_system import ARTIFACT_SCHEMAS, build_system_prompt, prompt_fingerprint
+
+GENERATION_OPTIONS = {"temperature": 0.3, "top_p": 0.9, "num_ctx": NUM_CTX}
+NUM_PREDICT = {"roadmap": 1100, "projects": 700, "weekly_tasks": 600}
+ITEM_COUNTS = {"roadmap": (6, 6), "projects": (3, 3), "weekly_tasks": (5, 7)}
+
+# Ollama's structured outputs are most reliable with an object at the root,
+# so each list is wrapped under one key.
+WRAPPER_KEYS = {"roadmap": "phases", "projects": "projects", "weekly_tasks": "tasks"}
+
+INSTRUCTIONS = {
+    "roadmap": (
+        "Generate my personalized learning roadmap: exactly 6 phases taking me from my "
+        "current level to deploying agentic systems, tailored to my level, gaps and "
+        "available hours per week."
+    ),
+    "projects": (
+        "Suggest exactly 3 portfolio projects for my current level, ranked "
+        "Beginner → Intermediate → Advanced, with the tech stack and why each one matters."
+    ),
+    "weekly_tasks": (
+        "Plan 5-7 concrete tasks for this week of my current phase, one per day, each with a "
+        "resource and estimated_hours, keeping the total within my available hours per week."
+    ),
+}
+
+
+class GenerationError(RuntimeError):
+    """The model's output could not be turned into a valid artifact."""
+
+
+def artifact_format(kind: str) -> dict:
+    """JSON Schema passed as Ollama's `format` for one artifact kind."""
+    lo, hi = ITEM_COUNTS[kind]
+    key = WRAPPER_KEYS[kind]
+    return {
+        "type": "object",
+        "properties": {
+            key: {"type": "array", "items": ARTIFACT_SCHEMAS[kind], "minItems": lo, "maxItems": hi},
+        },
+        "required": [key],
+    }
+
+
+def generation_messages(kind: str, profile: dict, extra: str = "") -> list:
+    """Same system prompt as chat (shared KV-cache prefix) + one generation request."""
+    instruction = INSTRUCTIONS[kind]
+    if kind == "weekly_tasks" and not extra:
+        roadmap = profile.get("roadmap") or []
+        idx = profile.get("current_phase", 0)
+        if idx < len(roadmap):
+            cp = roadmap[idx]
+            extra = f"My current phase is Phase {cp.get('phase', idx + 1)}: {cp.get('title', '')}."
+    return [
+        {"role": "system", "content": build_system_prompt(profile)},
+        {"role": "user", "content": f"{instruction} {extra}".strip() + " Respond with JSON only."},
+    ]
+
+
+def artifact_cache_key(model: str, kind: str, profile: dict, extra: str = "") -> str:
+    """Response-cache key generate_artifact() uses for this request."""
+    messages = generation_messages(kind, profile, extra)
+    options = {**GENERATION_OPTIONS, "num_predict": NUM_PREDICT[kind]}
+    return cache_key(model, prompt_fingerprint(profile), messages[-1]["content"], "",
+                     {**options, "format": kind})
+
+
+def generate_artifact(url: str, model: str, kind: str, profile: dict, extra: str = "",
+                      bypass_cache: bool = False):
+    """
+    Blocking structured generation. Returns (items, stats); raises
+    GenerationError if the output does not validate. A cached result is
+    returned unless `bypass_cache` (a fresh result still refreshes the cache).
+    """
+    messages = generation_messages(kind, profile, extra)
+    options = {**GENERATION_OPTIONS, "num_predict": NUM_PREDICT[kind]}
+    key = artifact_cache_key(model, kind, profile, extra)
+    cache = get_cache()
+    if not bypass_cache:
+        items = cache.get(key)
+        if items is not None:
+            return items, {"kind": kind, "seconds": 0.0, "prompt_eval_count": 0,
+                           "eval_count": 0, "items": len(items), "ok": True, "cached": True}
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "format": artifact_format(kind),
+        "keep_alive": KEEP_ALIVE,
+        "options": options,
+    }
+    t0 = time.perf_counter()
+    resp = get_client(url).chat(payload)
+    elapsed = time.perf_counter() - t0
+
+    content = resp.get("message", {}).get("content", "")
+    got_kind, items = coerce_items(repair_json(content))
+    record_extraction(kind, got_kind == kind)
+    stats = {
+        "kind": kind,
+        "seconds": round(elapsed, 2),
+        "prompt_eval_count": resp.get("prompt_eval_count"),
+        "eval_count": resp.get("eval_count"),
+        "items": len(items),
+        "ok": got_kind == kind,
+        "cached": False,
+    }
+    if got_kind != kind:
+        raise GenerationError(f"model returned no valid {kind} items ({len(content)} chars)")
+    cache.put(key, kind, items)
+    return items, stats
@@ -0,0 +1,335 @@
+"""
+aria_json.py
+────────────
+Tolerant JSON extraction for ARIA's generated artifacts.
+• StreamingJSONExtractor consumes tokens as they stream in, finds the ```json
+  fence and emits each list item the moment its closing brace arrives.
+• repair_json fixes the usual LLM defects (trailing commas, comments, single
+  or smart quotes, Python literals, raw newlines, truncated output).
+• coerce_item validates an item against aria_system.ARTIFACT_SCHEMAS.
+"""
+
+import json
+import re
+
+from aria_system import ARTIFACT_SCHEMAS
+
+_FENCE_RE = re.compile(r"```json", re.IGNORECASE)
+_OPEN_QUOTES = {'"': '"', "“": "”", "”": "”", "'": "'"}
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_NUM_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+# ── Repair ────────────────────────────────────────────────────────────────────
+def _scan_repair(text: str):
+    """
+    One pass over `text`, emitting normalized JSON. Returns (out, stack,
+    commas) where `stack` holds the still-open brackets and `commas` records
+    (output length, stack) at every structural comma, for truncation recovery.
+    """
+    out = []
+    stack = []
+    commas = []
+    i, n = 0, len(text)
+    quote = None                    # closing quote char while inside a string
+    while i < n:
+        c = text[i]
+        if quote:
+            if c == "\\" and i + 1 < n:
+                nxt = text[i + 1]
+                out.append("'" if nxt == "'" else c + nxt)
+                i += 2
+                continue
+            if c == quote or (quote == "”" and c == "“"):
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')    # only reachable inside '…' or “…” strings
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\t":
+                out.append("\\t")
+            else:
+                out.append(c)
+            i += 1
+            continue
+
+        if c in _OPEN_QUOTES:
+            quote = _OPEN_QUOTES[c]
+            out.append('"')
+        elif c == "/" and text.startswith("//", i):
+            j = text.find("\n", i)
+            i = n if j == -1 else j
+            continue
+        elif c == "/" and text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            i = n if j == -1 else j + 2
+            continue
+        elif c in "[{":
+            stack.append(c)
+            out.append(c)
+        elif c in "]}":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(c)
+        elif c == ",":
+            commas.append((len(out), tuple(stack)))
+            out.append(c)
+        elif c.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            k = j
+            while k < n and text[k] in " \t":
+                k += 1
+            if k < n and text[k] == ":":
+                out.append(f'"{word}"')          # unquoted key
+            else:
+                out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    if quote:
+        out.append('"')
+    return out, stack, commas
+
+
+def _strip_trailing_comma(out: list):
+    k = len(out) - 1
+    while k >= 0 and out[k].isspace():
+        k -= 1
+    if k >= 0 and out[k] == ",":
+        del out[k:]
+
+
+def _close(out: list, stack) -> str:
+    body = "".join(out).rstrip()
+    if body.endswith(","):
+        body = body[:-1]
+    elif body.endswith(":"):
+        body += " null"
+    return body + "".join("]" if b == "[" else "}" for b in reversed(stack))
+
+
+def repair_json(text: str):
+    """
+    Parse `text` as JSON, repairing common LLM defects if needed.
+    Returns the parsed value or None if it cannot be salvaged.
+    """
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    out, stack, commas = _scan_repair(text)
+    candidates = [_close(out, stack)]
+    if stack:
+        # Truncated: prefer cutting back to the last complete element of an
+        # enclosing container over keeping a half-written one.
+        shallower = [(pos, st) for pos, st in commas if len(st) < len(stack)]
+        candidates = [_close(out[:pos], st) for pos, st in reversed(shallower[-4:])] + candidates
+    for cand in candidates:
+        try:
+            return json.loads(cand)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+# ── Schema validation ─────────────────────────────────────────────────────────
+def classify_item(item) -> str:
+    """Which artifact an item belongs to ('roadmap' | 'projects' | 'weekly_tasks'), or None."""
+    if not isinstance(item, dict):
+        return None
+    if ("phase" in item or "weeks" in item) and "title" in item:
+        return "roadmap"
+    if "rank" in item and "name" in item and "tech" in item:
+        return "projects"
+    if "day" in item and "task" in item:
+        return "weekly_tasks"
+    return None
+
+
+def _coerce(value, spec: dict):
+    kind = spec.get("type")
+    if kind in ("integer", "number"):
+        if isinstance(value, bool):
+            raise ValueError("bool is not a number")
+        if isinstance(value, (int, float)):
+            num = value
+        else:
+            m = _NUM_RE.search(str(value))
+            if not m:
+                raise ValueError(f"not a number: {value!r}")
+            num = float(m.group())
+        return int(num) if kind == "integer" else float(num)
+    if kind == "array":
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(",") if v.strip()]
+        if not isinstance(value, list):
+            raise ValueError(f"not a list: {value!r}")
+        item_spec = spec.get("items", {})
+        return [_coerce(v, item_spec) for v in value if v is not None]
+    if kind == "string":
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"not a string: {value!r}")
+        value = str(value).strip()
+        for option in spec.get("enum", []):
+            if value.lower() == option.lower():
+                return option
+        return value
+    return value
+
+
+_DEFAULTS = {"string": "", "integer": 0, "number": 0.0, "array": []}
+
+
+def coerce_item(kind: str, item):
+    """
+    Validate and normalize one item against ARTIFACT_SCHEMAS[kind]. Wrong
+    types are coerced where the intent is clear ("2h" → 2.0, "a, b" → list);
+    missing optional fields get empty defaults. Returns None if the item is
+    unusable (not an object, or an identifying field is missing/invalid).
+    """
+    if not isinstance(item, dict) or classify_item(item) != kind:
+        return None
+    schema = ARTIFACT_SCHEMAS[kind]
+    clean = dict(item)
+    for key, spec in schema["properties"].items():
+        if key not in item or item[key] is None:
+            clean[key] = list(_DEFAULTS[spec["type"]]) if spec["type"] == "array" \
+                else _DEFAULTS[spec["type"]]
+            continue
+        try:
+            clean[key] = _coerce(item[key], spec)
+        except (ValueError, TypeError):
+            return None
+    return clean
+
+
+def coerce_items(data):
+    """(kind, [valid items]) for a parsed JSON list, or (None, []) if it is not an artifact."""
+    if isinstance(data, dict):
+        # Tolerate a wrapper object such as {"phases": [...]}
+        lists = [v for v in data.values() if isinstance(v, list)]
+        data = lists[0] if len(lists) == 1 else None
+    if not isinstance(data, list) or not data:
+        return None, []
+    kind = classify_item(data[0])
+    if kind is None:
+        return None, []
+    items = [c for c in (coerce_item(kind, it) for it in data) if c is not None]
+    return (kind, items) if items else (None, [])
+
+
+# ── Extraction ────────────────────────────────────────────────────────────────
+def extract_json_block(text: str):
+    """
+    Pull the first ```json block from a response and parse it, repairing it
+    if necessary. A missing closing fence (reply cut off at num_predict) is
+    treated as running to the end of the text.
+    """
+    m = _FENCE_RE.search(text)
+    if not m:
+        return None
+    body = text[m.end():]
+    end = body.find("```")
+    if end != -1:
+        body = body[:end]
+    return repair_json(body.strip())
+
+
+class StreamingJSONExtractor:
+    """
+    Incremental parser for the first ```json block of a streamed reply.
+    feed(tok) returns the list items ((kind, item) pairs) completed by that
+    token; each item is repaired and schema-validated before it is emitted.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0               # next char of _text to scan
+        self._in_block = False
+        self._done = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._items_depth = None    # stack depth at which list items live
+        self._item_start = None
+        self.kind = None
+        self.items = []
+        self.rejected = 0
+
+    @property
+    def started(self) -> bool:
+        return self._in_block
+
+    def feed(self, tok: str) -> list:
+        if self._done:
+            return []
+        self._text += tok
+        if not self._in_block:
+            m = _FENCE_RE.search(self._text, max(self._pos - 6, 0))
+            if not m:
+                self._pos = len(self._text)
+                return []
+            self._in_block = True
+            self._pos = m.end()
+        return self._scan()
+
+    def _scan(self) -> list:
+        found = []
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "`" and not self._stack:
+                self._done = True
+                break
+            elif c in "[{":
+                self._stack.append(c)
+                depth = len(self._stack)
+                if c == "[" and self._items_depth is None:
+                    self._items_depth = depth + 1
+                elif c == "{" and depth == self._items_depth and self._stack[-2] == "[":
+                    self._item_start = i
+            elif c in "]}":
+                depth = len(self._stack)
+                if self._stack:
+                    self._stack.pop()
+                if c == "}" and depth == self._items_depth and self._item_start is not None:
+                    item = self._emit(text[self._item_start:i + 1])
+                    if item is not None:
+                        found.append(item)
+                    self._item_start = None
+                if not self._stack:
+                    self._done = True
+                    i += 1
+                    break
+            i += 1
+        self._pos = i
+        return found
+
+    def _emit(self, raw: str):
+        data = repair_json(raw)
+        kind = self.kind or classify_item(data)
+        item = coerce_item(kind, data) if kind else None
+        if item is None:
+            self.rejected += 1
+            return None
+        self.kind = kind
+        self.items.append(item)
+        return kind, item
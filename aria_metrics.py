@@ -0,0 +1,224 @@
+"""
+aria_metrics.py
+───────────────
+Per-call instrumentation for every Ollama request.
+The pooled clients wrap each call in trace_call(), which records time to
+first token, total duration, tokens/sec, prompt/eval token counts (from
+Ollama's final `done` object), request payload bytes and the outcome,
+labelled with what the caller set via trace_labels() (operation, persona).
+Recent traces are kept in memory for the diagnostics panel; everything is
+exportable as Prometheus text or JSONL, and ARIA_TRACE_FILE appends each
+trace to a JSONL file as it completes.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from aria_scheduler import current_context
+from aria_scheduler import prometheus_text as scheduler_prometheus_text
+
+TRACE_BUFFER = 2000            # recent traces kept in memory (percentiles, export)
+TRACE_FILE = os.environ.get("ARIA_TRACE_FILE", "")   # optional JSONL sink
+
+_labels = contextvars.ContextVar("aria_trace_labels", default={})
+_lock = threading.Lock()
+_traces = deque(maxlen=TRACE_BUFFER)
+_totals = {}                   # (op, model, status) → [calls, prompt_tokens, eval_tokens, payload_bytes]
+_extractions = {}              # (kind, ok) → count
+
+
+@contextmanager
+def trace_labels(**labels):
+    """Label Ollama calls made by this thread inside the block (op=…, persona=…)."""
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+class Trace:
+    """One Ollama call; filled in by the client as the response arrives."""
+
+    def __init__(self, call: str, url: str, payload: dict):
+        user, priority = current_context()
+        self.t0 = time.perf_counter()
+        self.data = {
+            "ts": round(time.time(), 3),
+            "call": call,
+            "op": call,
+            **_labels.get(),
+            "model": payload.get("model", ""),
+            "backend": url,
+            "user": user,
+            "priority": priority,
+            "payload_bytes": len(json.dumps(payload, ensure_ascii=False).encode()),
+            "status": "ok",
+        }
+
+    def slot_acquired(self):
+        """The scheduler granted a slot; time until now was spent queued."""
+        self.data["queue_ms"] = round((time.perf_counter() - self.t0) * 1000, 1)
+
+    def first_token(self):
+        if "ttft_ms" not in self.data:
+            self.data["ttft_ms"] = round((time.perf_counter() - self.t0) * 1000, 1)
+
+    def done(self, final: dict):
+        """Record the counters from Ollama's final (`done`) response object."""
+        self.first_token()
+        d = self.data
+        d["prompt_eval_count"] = final.get("prompt_eval_count") or 0
+        d["eval_count"] = final.get("eval_count") or 0
+        eval_ns = final.get("eval_duration") or 0
+        if eval_ns and d["eval_count"]:
+            d["tokens_per_sec"] = round(d["eval_count"] / (eval_ns / 1e9), 1)
+        if final.get("load_duration"):
+            d["load_ms"] = round(final["load_duration"] / 1e6, 1)
+
+    def finish(self, status: str = None):
+        d = self.data
+        if status:
+            d["status"] = status
+        d["duration_ms"] = round((time.perf_counter() - self.t0) * 1000, 1)
+        if "tokens_per_sec" not in d and d.get("eval_count") and d["duration_ms"] > d.get("ttft_ms", 0):
+            d["tokens_per_sec"] = round(d["eval_count"] / ((d["duration_ms"] - d["ttft_ms"]) / 1000), 1)
+        _record(d)
+
+
+@contextmanager
+def trace_call(call: str, url: str, payload: dict, cancel=None):
+    """
+    Trace one client call. Exceptions are recorded as status "error" and
+    re-raised; a call ended by `cancel` (a CancelToken) is "cancelled".
+    """
+    tr = Trace(call, url, payload)
+    try:
+        yield tr
+    except (GeneratorExit, asyncio.CancelledError):
+        tr.finish("cancelled")     # the consumer stopped reading a stream early
+        raise
+    except BaseException as exc:
+        cancelled = cancel is not None and cancel.is_set()
+        tr.data["error"] = type(exc).__name__
+        tr.finish("cancelled" if cancelled else "error")
+        raise
+    tr.finish("cancelled" if cancel is not None and cancel.is_set() else None)
+
+
+def _record(d: dict):
+    key = (d["op"], d["model"], d["status"])
+    line = json.dumps(d, ensure_ascii=False) if TRACE_FILE else None
+    with _lock:
+        _traces.append(d)
+        tot = _totals.setdefault(key, [0, 0, 0, 0])
+        tot[0] += 1
+        tot[1] += d.get("prompt_eval_count", 0)
+        tot[2] += d.get("eval_count", 0)
+        tot[3] += d["payload_bytes"]
+        if line:
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def record_extraction(kind: str, ok: bool):
+    """Count one attempt to pull structured data (JSON) out of a model reply."""
+    with _lock:
+        _extractions[(kind, bool(ok))] = _extractions.get((kind, bool(ok)), 0) + 1
+
+
+# ── Views ─────────────────────────────────────────────────────────────────────
+def _pct(vals, q):
+    return vals[min(int(q * len(vals)), len(vals) - 1)] if vals else None
+
+
+def recent_traces(n: int = None) -> list:
+    with _lock:
+        traces = list(_traces)
+    return traces[-n:] if n else traces
+
+
+def summary() -> list:
+    """Per-operation rows over the recent traces, busiest first."""
+    by_op = {}
+    for t in recent_traces():
+        by_op.setdefault(t["op"], []).append(t)
+    rows = []
+    for op, ts in by_op.items():
+        ok = [t for t in ts if t["status"] == "ok"]
+        ttft = sorted(t["ttft_ms"] for t in ok if "ttft_ms" in t)
+        dur = sorted(t["duration_ms"] for t in ok)
+        tps = sorted(t["tokens_per_sec"] for t in ok if "tokens_per_sec" in t)
+        rows.append({
+            "op": op,
+            "calls": len(ts),
+            "errors": sum(t["status"] == "error" for t in ts),
+            "cancelled": sum(t["status"] == "cancelled" for t in ts),
+            "ttft_p50_ms": _pct(ttft, 0.5),
+            "ttft_p95_ms": _pct(ttft, 0.95),
+            "duration_p50_ms": _pct(dur, 0.5),
+            "duration_p95_ms": _pct(dur, 0.95),
+            "tokens_per_sec_p50": _pct(tps, 0.5),
+            "avg_prompt_tokens": round(sum(t.get("prompt_eval_count", 0) for t in ok) / len(ok)) if ok else None,
+            "avg_payload_kb": round(sum(t["payload_bytes"] for t in ts) / len(ts) / 1024, 1),
+        })
+    rows.sort(key=lambda r: -r["calls"])
+    return rows
+
+
+def extraction_stats() -> dict:
+    """kind → {"ok": n, "failed": n, "rate": ok share}."""
+    with _lock:
+        items = list(_extractions.items())
+    out = {}
+    for (kind, ok), n in items:
+        out.setdefault(kind, {"ok": 0, "failed": 0})["ok" if ok else "failed"] += n
+    for s in out.values():
+        s["rate"] = round(s["ok"] / (s["ok"] + s["failed"]), 3)
+    return out
+
+
+def traces_jsonl() -> str:
+    return "".join(json.dumps(t, ensure_ascii=False) + "\n" for t in recent_traces())
+
+
+def _family(lines: list, name: str, kind: str, samples):
+    """One metric family: its TYPE line, then all of its (suffix, labels, value) samples."""
+    lines.append(f"# TYPE {name} {kind}")
+    lines.extend(f"{name}{suffix}{{{labels}}} {value}" for suffix, labels, value in samples)
+
+
+def prometheus_text() -> str:
+    """LLM call counters and latency summaries, followed by the scheduler's queue metrics."""
+    with _lock:
+        totals = sorted(_totals.items())
+        extractions = sorted(_extractions.items())
+    lines = []
+    for n, name in enumerate(("calls", "prompt_tokens", "eval_tokens", "payload_bytes")):
+        _family(lines, f"aria_llm_{name}_total", "counter", (
+            ("", f'op="{op}",model="{model}",status="{status}"', tot[n])
+            for (op, model, status), tot in totals))
+
+    by_op = {}
+    for t in recent_traces():
+        if t["status"] == "ok":
+            by_op.setdefault(t["op"], []).append(t)
+    for field in ("ttft_ms", "duration_ms", "tokens_per_sec"):
+        samples = []
+        for op, ts in sorted(by_op.items()):
+            vals = sorted(t[field] for t in ts if field in t)
+            if not vals:
+                continue
+            samples += [("", f'op="{op}",quantile="{q}"', _pct(vals, q)) for q in (0.5, 0.95)]
+            samples += [("_sum", f'op="{op}"', round(sum(vals), 1)), ("_count", f'op="{op}"', len(vals))]
+        _family(lines, f"aria_llm_{field}", "summary", samples)
+
+    _family(lines, "aria_extractions_total", "counter", (
+        ("", f'kind="{kind}",result="{"ok" if ok else "failed"}"', n) for (kind, ok), n in extractions))
+    return "\n".join(lines) + "\n" + scheduler_prometheus_text()
@@ -0,0 +1,367 @@
+"""
+aria_ollama.py
+──────────────
+Ollama connectivity for ARIA.
+All traffic goes through one pooled, keep-alive OllamaClient per server URL.
+Server health and the model list are probed on a background thread and
+cached process-wide, so rendering a page never waits on the network.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from aria_metrics import trace_call, trace_labels
+from aria_scheduler import BACKGROUND, QueueCancelled, get_scheduler, request_context
+
+# ── Client tuning (override via environment) ──────────────────────────────────
+POOL_SIZE = int(os.environ.get("ARIA_OLLAMA_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.environ.get("ARIA_OLLAMA_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("ARIA_OLLAMA_READ_TIMEOUT", "180"))
+RETRIES = int(os.environ.get("ARIA_OLLAMA_RETRIES", "2"))
+RETRY_BACKOFF = 0.3           # urllib3 backoff_factor between retries
+KEEP_ALIVE = os.environ.get("ARIA_OLLAMA_KEEP_ALIVE", "30m")   # keep model resident
+NUM_CTX = int(os.environ.get("ARIA_OLLAMA_NUM_CTX", "8192"))   # one window for all requests: a new num_ctx reloads the model
+USE_ASYNC = os.environ.get("ARIA_OLLAMA_ASYNC", "0") == "1"     # aria_ollama_async (needs httpx)
+
+# ── Probe tuning ──────────────────────────────────────────────────────────────
+PROBE_TTL = 30.0              # seconds between probes while Ollama is up
+PROBE_TIMEOUT = 3.0           # per-request timeout for GET /api/tags
+PROBE_BACKOFF_START = 2.0     # first retry delay once Ollama goes offline
+PROBE_BACKOFF_MAX = 60.0      # ceiling for the exponential backoff
+PROBE_MAX = 32                # servers probed at once; the least recently used probe stops first
+
+
+# ── Cancellation ──────────────────────────────────────────────────────────────
+class CancelToken:
+    """
+    Set-once flag shared between a UI and a worker. Callbacks registered with
+    on_cancel() run on cancel() — used to close an open HTTP stream at once
+    instead of waiting for its next chunk.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def on_cancel(self, fn):
+        """Run `fn` on cancel (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn()
+
+
+# ── Pooled HTTP client ────────────────────────────────────────────────────────
+class OllamaClient:
+    """
+    Keep-alive client for one Ollama server.
+    A single HTTPAdapter owns the connection pool; each thread gets its own
+    requests.Session mounted on that adapter, so sessions never share mutable
+    state while sockets are still reused across threads.
+    """
+
+    def __init__(self, url: str, pool_size: int = POOL_SIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, retries: int = RETRIES):
+        self.url = url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        # Connection failures are retried for every method (nothing reached the
+        # server); read/status failures only for idempotent GETs.
+        retry = Retry(
+            total=retries, connect=retries, read=retries, status=retries,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size,
+            max_retries=retry, pool_block=False,
+        )
+        self._local = threading.local()
+        self.scheduler = get_scheduler(self.url)
+
+    @property
+    def session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = requests.Session()
+            s.mount("http://", self._adapter)
+            s.mount("https://", self._adapter)
+            self._local.session = s
+        return s
+
+    def tags(self, timeout=None) -> list:
+        """Model names from GET /api/tags. Raises on any failure."""
+        r = self.session.get(f"{self.url}/api/tags", timeout=timeout or self.timeout)
+        r.raise_for_status()
+        return [m["name"] for m in r.json().get("models", [])]
+
+    def chat(self, payload: dict, timeout=None) -> dict:
+        """Non-streaming POST /api/chat; returns the single response object."""
+        with trace_call("chat", self.url, payload) as tr:
+            with self.scheduler.slot():
+                tr.slot_acquired()
+                r = self.session.post(
+                    f"{self.url}/api/chat", json={**payload, "stream": False},
+                    timeout=timeout or self.timeout,
+                )
+            r.raise_for_status()
+            data = r.json()
+            tr.done(data)
+        return data
+
+    def embed(self, model: str, inputs: list, timeout=None, queue_timeout: float = None) -> list:
+        """
+        POST /api/embed for a batch of texts; returns one vector per input.
+        `queue_timeout` bounds the wait for a scheduler slot (QueueTimeout).
+        """
+        payload = {"model": model, "input": list(inputs), "keep_alive": KEEP_ALIVE}
+        with trace_call("embed", self.url, payload) as tr:
+            with self.scheduler.slot(timeout=queue_timeout):
+                tr.slot_acquired()
+                r = self.session.post(f"{self.url}/api/embed", json=payload,
+                                      timeout=timeout or self.timeout)
+            r.raise_for_status()
+            data = r.json()
+            tr.done(data)
+        return data.get("embeddings", [])
+
+    def chat_stream(self, payload: dict, timeout=None, cancel: CancelToken = None):
+        """
+        Streaming POST /api/chat; yields each decoded NDJSON chunk. Cancelling
+        `cancel` closes the response (Ollama stops generating when the client
+        goes away) and ends the iteration quietly. The scheduler slot is held
+        until the stream ends.
+        """
+        with trace_call("chat_stream", self.url, payload, cancel) as tr:
+            try:
+                with self.scheduler.slot(cancel=cancel):
+                    tr.slot_acquired()
+                    with self.session.post(
+                        f"{self.url}/api/chat", json={**payload, "stream": True},
+                        stream=True, timeout=timeout or self.timeout,
+                    ) as resp:
+                        resp.raise_for_status()
+                        if cancel is not None:
+                            cancel.on_cancel(resp.close)
+                        try:
+                            for raw in resp.iter_lines():
+                                if cancel is not None and cancel.is_set():
+                                    return
+                                if not raw:
+                                    continue
+                                chunk = json.loads(raw)
+                                tr.first_token()
+                                if chunk.get("done"):
+                                    tr.done(chunk)
+                                yield chunk
+                                if chunk.get("done"):
+                                    break
+                        except Exception:
+                            if cancel is not None and cancel.is_set():
+                                return     # the read was cut short by resp.close()
+                            raise
+            except QueueCancelled:
+                return                     # stopped before a slot was granted
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url: str) -> OllamaClient:
+    """
+    Process-wide pooled client for `url`. With ARIA_OLLAMA_ASYNC=1 (and httpx
+    installed) this is the event-loop backed SyncOllamaClient instead.
+    """
+    url = url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = _make_client(url)
+        return client
+
+
+def _make_client(url: str):
+    if USE_ASYNC:
+        from aria_ollama_async import SyncOllamaClient, async_available   # imports this module
+        if async_available():
+            return SyncOllamaClient(url)
+    return OllamaClient(url)
+
+
+_warmed = set()
+_warmed_lock = threading.Lock()
+
+
+def warm_up(url: str, model: str, system_prompt: str = "") -> bool:
+    """
+    Preload `model` once per process, in the background. When `system_prompt`
+    is given it is evaluated too, so the static prompt prefix is already in
+    Ollama's KV cache when the first real request arrives.
+    Returns True if a warm-up was started.
+    """
+    key = (url.rstrip("/"), model)
+    with _warmed_lock:
+        if key in _warmed:
+            return False
+        _warmed.add(key)
+
+    def run():
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        try:
+            with request_context("warm-up", BACKGROUND), trace_labels(op="warm-up"):
+                get_client(url).chat({
+                    "model": model,
+                    "messages": messages,
+                    "keep_alive": KEEP_ALIVE,
+                    "options": {"num_predict": 1, "num_ctx": NUM_CTX},
+                })
+        except Exception:
+            with _warmed_lock:
+                _warmed.discard(key)   # let a later render try again
+
+    threading.Thread(target=run, name=f"ollama-warmup[{model}]", daemon=True).start()
+    return True
+
+
+def prefill_stats(done_chunk: dict) -> dict:
+    """
+    Prefill timing from Ollama's final `done` chunk: the prompt tokens Ollama
+    actually evaluated and how long that took. When the stable prompt prefix
+    is reused from the KV cache, prompt_eval_count stays small turn after
+    turn even as the conversation grows. No "tokens saved" figure is derived:
+    the only other count available is the approx_tokens estimate, and
+    subtracting Ollama's exact count from it reports savings on cold requests
+    whenever the estimate runs high.
+    """
+    prefill_ns = done_chunk.get("prompt_eval_duration") or 0
+    return {
+        "prompt_eval_count": done_chunk.get("prompt_eval_count") or 0,
+        "prefill_ms": round(prefill_ns / 1e6, 1),
+    }
+
+
+def check_ollama(url: str):
+    """Synchronous GET /api/tags. Returns (ok, [model names])."""
+    try:
+        return True, get_client(url).tags(timeout=(CONNECT_TIMEOUT, PROBE_TIMEOUT))
+    except Exception:
+        return False, []
+
+
+# ── Background health probe ───────────────────────────────────────────────────
+class OllamaProbe:
+    """
+    TTL'd view of one Ollama server's /api/tags, refreshed by a daemon thread.
+    While the server is healthy it is re-probed every `ttl` seconds; while it
+    is offline the delay doubles from PROBE_BACKOFF_START up to `backoff_max`.
+    """
+
+    def __init__(self, url: str, ttl: float = PROBE_TTL, backoff_max: float = PROBE_BACKOFF_MAX):
+        self.url = url
+        self.ttl = ttl
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ok = None               # None until the first probe completes
+        self._models = []
+        self._checked_at = None
+        self._next_check = None
+        self._backoff = PROBE_BACKOFF_START
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"ollama-probe[{url}]", daemon=True
+        )
+        self._thread.start()
+
+    def snapshot(self) -> dict:
+        """Last known state; never touches the network."""
+        with self._lock:
+            return {
+                "ok": self._ok,
+                "models": list(self._models),
+                "checked_at": self._checked_at,
+                "next_check": self._next_check,
+                "refreshing": self._wake.is_set(),
+            }
+
+    def refresh(self):
+        """Ask the probe thread to re-check now instead of waiting for the TTL."""
+        self._wake.set()
+
+    def close(self):
+        """Stop the probe thread; the last snapshot stays readable."""
+        self._closed = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.clear()
+            ok, models = check_ollama(self.url)
+            now = time.time()
+            with self._lock:
+                self._ok = ok
+                if ok:
+                    self._models = models
+                    self._backoff = PROBE_BACKOFF_START
+                    delay = self.ttl
+                else:
+                    self._models = []
+                    delay = self._backoff
+                    self._backoff = min(self._backoff * 2, self.backoff_max)
+                self._checked_at = now
+                self._next_check = now + delay
+            self._wake.wait(delay)
+
+
+_probes = OrderedDict()
+_probes_lock = threading.Lock()
+
+
+def get_probe(url: str) -> OllamaProbe:
+    """
+    Process-wide probe for `url`, shared by every Streamlit session. At most
+    PROBE_MAX run at once; the least recently used one is stopped first.
+    """
+    url = url.rstrip("/")
+    with _probes_lock:
+        probe = _probes.get(url)
+        if probe is None:
+            probe = _probes[url] = OllamaProbe(url)
+            while len(_probes) > PROBE_MAX:
+                _probes.popitem(last=False)[1].close()
+        _probes.move_to_end(url)
+        return probe
+
+
+def stop_probe(url: str):
+    """Stop probing `url` (no pool uses it any more)."""
+    with _probes_lock:
+        probe = _probes.pop(url.rstrip("/"), None)
+    if probe is not None:
+        probe.close()
@@ -0,0 +1,300 @@
+"""
+aria_ollama_async.py
+────────────────────
+asyncio-native Ollama client (optional; needs httpx).
+AsyncOllamaClient streams /api/chat through a bounded queue between the
+network reader and the consumer: when the consumer falls behind, the reader
+stops pulling from the socket instead of buffering the whole reply. Many
+generations share one event loop and one connection pool, with no thread per
+stream. SyncOllamaClient runs the async client on a background loop thread
+behind the same interface as aria_ollama.OllamaClient, so existing call sites
+switch over with ARIA_OLLAMA_ASYNC=1.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import threading
+from contextlib import asynccontextmanager
+
+try:
+    import httpx
+except ImportError:            # aria_ollama keeps using requests
+    httpx = None
+
+import requests
+
+from aria_json import repair_json
+from aria_metrics import trace_call
+from aria_ollama import CONNECT_TIMEOUT, KEEP_ALIVE, POOL_SIZE, READ_TIMEOUT, CancelToken
+from aria_scheduler import QueueCancelled, get_scheduler
+
+STREAM_QUEUE_SIZE = 64         # chunks buffered between reader and consumer
+_END = object()
+
+
+def async_available() -> bool:
+    return httpx is not None
+
+
+def _timeout(timeout):
+    """requests-style timeout (seconds or (connect, read)) → httpx.Timeout."""
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+# ── Async client ──────────────────────────────────────────────────────────────
+class AsyncOllamaClient:
+    """
+    One httpx.AsyncClient (keep-alive pool) per Ollama server. Every request
+    holds a slot from the server's aria_scheduler queue; only the wait for a
+    slot parks a worker thread, never the stream itself.
+    """
+
+    def __init__(self, url: str, pool_size: int = POOL_SIZE,
+                 queue_size: int = STREAM_QUEUE_SIZE):
+        if httpx is None:
+            raise RuntimeError("httpx is not installed (pip install httpx)")
+        self.url = url.rstrip("/")
+        self.queue_size = queue_size
+        self.scheduler = get_scheduler(self.url)
+        self._client = httpx.AsyncClient(
+            base_url=self.url, timeout=_timeout(None),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    @asynccontextmanager
+    async def _slot(self, cancel: CancelToken = None, timeout: float = None):
+        token = CancelToken()
+        if cancel is not None:
+            cancel.on_cancel(token.cancel)
+        slot = self.scheduler.slot(timeout=timeout, cancel=token)
+        # to_thread copies the caller's context, so request_context() still applies
+        enter = asyncio.ensure_future(asyncio.to_thread(slot.__enter__))
+        try:
+            await asyncio.shield(enter)
+        except asyncio.CancelledError:
+            token.cancel()
+            # If the slot was granted just as we were cancelled, hand it back
+            enter.add_done_callback(
+                lambda f: f.cancelled() or f.exception() or slot.__exit__(None, None, None))
+            raise
+        try:
+            yield
+        finally:
+            slot.__exit__(None, None, None)
+
+    async def tags(self, timeout=None) -> list:
+        """Model names from GET /api/tags. Raises on any failure."""
+        r = await self._client.get("/api/tags", timeout=_timeout(timeout))
+        r.raise_for_status()
+        return [m["name"] for m in r.json().get("models", [])]
+
+    async def chat(self, payload: dict, timeout=None) -> dict:
+        """Non-streaming POST /api/chat; returns the single response object."""
+        with trace_call("chat", self.url, payload) as tr:
+            async with self._slot():
+                tr.slot_acquired()
+                r = await self._client.post("/api/chat", json={**payload, "stream": False},
+                                            timeout=_timeout(timeout))
+            r.raise_for_status()
+            data = r.json()
+            tr.done(data)
+        return data
+
+    async def embed(self, model: str, inputs: list, timeout=None,
+                    queue_timeout: float = None) -> list:
+        """
+        POST /api/embed for a batch of texts; returns one vector per input.
+        `queue_timeout` bounds the wait for a scheduler slot (QueueTimeout).
+        """
+        payload = {"model": model, "input": list(inputs), "keep_alive": KEEP_ALIVE}
+        with trace_call("embed", self.url, payload) as tr:
+            async with self._slot(timeout=queue_timeout):
+                tr.slot_acquired()
+                r = await self._client.post("/api/embed", json=payload, timeout=_timeout(timeout))
+            r.raise_for_status()
+            data = r.json()
+            tr.done(data)
+        return data.get("embeddings", [])
+
+    async def generate_json(self, model: str, messages: list, schema: dict,
+                            options: dict = None, timeout=None):
+        """
+        Structured-output chat constrained to `schema`. Returns (parsed JSON or
+        None if unsalvageable, raw response) — the response carries eval counts.
+        """
+        resp = await self.chat({
+            "model": model,
+            "messages": messages,
+            "format": schema,
+            "keep_alive": KEEP_ALIVE,
+            "options": options or {},
+        }, timeout=timeout)
+        return repair_json(resp.get("message", {}).get("content", "")), resp
+
+    async def chat_stream(self, payload: dict, timeout=None, cancel: CancelToken = None):
+        """
+        Streaming POST /api/chat; yields each decoded NDJSON chunk. A reader task
+        fills a bounded queue, so a slow consumer throttles the socket read.
+        Cancelling `cancel`, closing the generator or cancelling the consuming
+        task stops the reader and closes the response; a cancel ends quietly.
+        """
+        queue = asyncio.Queue(self.queue_size)
+        loop = asyncio.get_running_loop()
+
+        async def reader():
+            try:
+                with trace_call("chat_stream", self.url, payload, cancel) as tr:
+                    async with self._slot(cancel):
+                        tr.slot_acquired()
+                        async with self._client.stream(
+                            "POST", "/api/chat", json={**payload, "stream": True},
+                            timeout=_timeout(timeout),
+                        ) as resp:
+                            resp.raise_for_status()
+                            async for line in resp.aiter_lines():
+                                if not line:
+                                    continue
+                                chunk = json.loads(line)
+                                tr.first_token()
+                                if chunk.get("done"):
+                                    tr.done(chunk)
+                                await queue.put(chunk)
+                                if chunk.get("done"):
+                                    break
+                await queue.put(_END)
+            except QueueCancelled:
+                await queue.put(_END)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                await queue.put(exc)
+
+        task = asyncio.ensure_future(reader())
+        if cancel is not None:
+            cancel.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            while True:
+                if queue.empty():
+                    get = asyncio.ensure_future(queue.get())
+                    await asyncio.wait({get, task}, return_when=asyncio.FIRST_COMPLETED)
+                    if not get.done():
+                        # The reader ended without a sentinel: it was cancelled
+                        get.cancel()
+                        if not task.cancelled() and task.exception() is not None:
+                            raise task.exception()
+                        return
+                    item = get.result()
+                else:
+                    item = queue.get_nowait()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    if cancel is not None and cancel.is_set():
+                        return
+                    raise item
+                yield item
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+# ── Sync adapter ──────────────────────────────────────────────────────────────
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop, running on a daemon thread."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="ollama-async-loop",
+                             daemon=True).start()
+        return _loop
+
+
+def _translate(exc):
+    """httpx errors → the requests exceptions the sync call sites already handle."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return requests.exceptions.ConnectionError(str(exc))
+    if isinstance(exc, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(exc))
+    if isinstance(exc, httpx.HTTPStatusError):
+        return requests.exceptions.HTTPError(str(exc))
+    return exc
+
+
+class SyncOllamaClient:
+    """Blocking facade over AsyncOllamaClient with OllamaClient's interface."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.loop = get_loop()
+        # The httpx client must be created on the loop it will run on
+        self._async = self._run(self._make())
+        self.scheduler = self._async.scheduler
+
+    async def _make(self):
+        return AsyncOllamaClient(self.url)
+
+    def _submit(self, coro) -> concurrent.futures.Future:
+        """
+        Like run_coroutine_threadsafe, but the task runs in a copy of the caller's
+        context, so request_context() / trace_labels() still reach the scheduler
+        and the traces.
+        """
+        fut = concurrent.futures.Future()
+
+        def start():
+            task = self.loop.create_task(coro)
+
+            def settle(t):
+                if t.cancelled():
+                    fut.cancel()
+                elif t.exception() is not None:
+                    fut.set_exception(t.exception())
+                else:
+                    fut.set_result(t.result())
+            task.add_done_callback(settle)
+
+        self.loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+        return fut
+
+    def _run(self, coro, timeout=None):
+        fut = self._submit(coro)
+        try:
+            return fut.result(timeout)
+        except Exception as exc:
+            raise _translate(exc) from exc
+
+    def tags(self, timeout=None) -> list:
+        return self._run(self._async.tags(timeout))
+
+    def chat(self, payload: dict, timeout=None) -> dict:
+        return self._run(self._async.chat(payload, timeout))
+
+    def embed(self, model: str, inputs: list, timeout=None, queue_timeout: float = None) -> list:
+        return self._run(self._async.embed(model, inputs, timeout, queue_timeout))
+
+    def chat_stream(self, payload: dict, timeout=None, cancel: CancelToken = None):
+        """Iterate the async stream one chunk per loop round-trip."""
+        agen = self._async.chat_stream(payload, timeout, cancel)
+        try:
+            while True:
+                try:
+                    yield self._run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._submit(agen.aclose()).result()
@@ -0,0 +1,143 @@
+"""
+aria_persist.py
+───────────────
+Debounced persistence.
+DebouncedWriter coalesces bursts of saves into a single write done on a
+background thread, off the render path; what it writes to (the SQLite
+store, …) is a pluggable sink. load_json_with_recovery reads the old
+single-user JSON profile, or its newest readable backup, for the one-time
+migration into the store.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import threading
+from pathlib import Path
+
+SAVE_DEBOUNCE = 0.75     # seconds; saves inside this window become one write
+BACKUP_COUNT = 3         # backups the JSON-file era kept: <file>.1 (newest) … <file>.N
+SAVE_RETRY_MAX = 30.0    # seconds; cap on the doubling retry delay after a failed write
+
+log = logging.getLogger(__name__)
+
+
+def _backup_path(path: Path, n: int) -> Path:
+    return path.with_name(f"{path.name}.{n}")
+
+
+def load_json_with_recovery(path, backups: int = BACKUP_COUNT):
+    """
+    Load the legacy JSON file at `path`, falling back to its newest readable
+    backup. Returns (data, source_path) or (None, None) when nothing is readable.
+    """
+    path = Path(path)
+    for candidate in [path] + [_backup_path(path, n) for n in range(1, backups + 1)]:
+        if not candidate.exists():
+            continue
+        try:
+            with open(candidate) as f:
+                return json.load(f), candidate
+        except (OSError, ValueError):
+            continue
+    return None, None
+
+
+class DebouncedWriter:
+    """
+    Coalescing writer for one destination. schedule() snapshots the data and
+    arms a timer; every further schedule() within `delay` replaces the
+    snapshot, and only the last one is passed to `sink(data)`. A snapshot
+    whose write fails is kept (unless a newer one arrived) and retried with
+    a doubling delay, capped at SAVE_RETRY_MAX.
+    """
+
+    def __init__(self, sink, delay: float = SAVE_DEBOUNCE):
+        self.sink = sink
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._timer = None
+        self.writes = 0
+        self.coalesced = 0
+        self.failures = 0        # consecutive failed writes; drives the retry backoff
+
+    def _arm(self, delay: float):
+        # caller holds _lock
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def schedule(self, data: dict):
+        snapshot = copy.deepcopy(data)
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = snapshot
+            self._arm(self.delay)
+
+    def flush(self):
+        """Write any pending snapshot now (also called by the timer)."""
+        with self._write_lock:
+            with self._lock:
+                data, self._pending = self._pending, None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if data is None:
+                return
+            try:
+                self.sink(data)
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                    retry = min(self.delay * 2 ** self.failures, SAVE_RETRY_MAX)
+                    log.exception("save failed (attempt %d), retrying in %.1fs", self.failures, retry)
+                    if self._pending is None:
+                        self._pending = data
+                    self._arm(retry)
+                return
+            self.writes += 1
+            self.failures = 0
+
+    def discard(self):
+        """
+        Drop any pending snapshot without writing it. Waits for a write in
+        progress, so nothing snapshotted before the call lands after it.
+        """
+        with self._write_lock:
+            with self._lock:
+                self._pending = None
+                self.failures = 0
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(key: str, sink) -> DebouncedWriter:
+    """
+    Process-wide writer for `key` (e.g. one per user), so every session that
+    saves the same destination coalesces into one queue. `sink` is only used
+    when the writer is first created.
+    """
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = DebouncedWriter(sink)
+        return writer
+
+
+@atexit.register
+def _flush_all():
+    for writer in list(_writers.values()):
+        try:
+            writer.flush()
+        except Exception:
+            pass
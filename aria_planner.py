@@ -0,0 +1,135 @@
+"""
+aria_planner.py
+───────────────
+Deterministic weekly-task planning.
+Generated tasks are packed into days against `time_per_week` locally, so
+marking a phase done, ticking a task off or changing your hours re-plans the
+week instantly with no model call. Tasks from a finished phase are dropped,
+tasks that don't fit are deferred, and the model is asked only for enough
+new tasks to fill genuinely free time.
+"""
+
+import hashlib
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+DEFAULT_HOURS = 7.0            # weekly budget when time_per_week is unknown
+DEFAULT_TASK_HOURS = 1.0       # for tasks without a usable estimated_hours
+FILL_MIN_HOURS = 1.5           # free time worth asking the model to fill
+
+
+def task_hours(task: dict) -> float:
+    try:
+        hours = float(task.get("estimated_hours", DEFAULT_TASK_HOURS))
+    except (TypeError, ValueError):
+        return DEFAULT_TASK_HOURS
+    return hours if hours > 0 else DEFAULT_TASK_HOURS
+
+
+def task_id(task: dict) -> str:
+    """Stable id for widget keys: same phase + text → same id."""
+    raw = f"{task.get('phase')}|{task.get('task', '')}"
+    return hashlib.blake2b(raw.encode(), digest_size=6).hexdigest()
+
+
+def week_budget(profile: dict) -> float:
+    try:
+        hours = float(profile.get("time_per_week") or 0)
+    except (TypeError, ValueError):
+        hours = 0
+    return hours if hours > 0 else DEFAULT_HOURS
+
+
+def tag_tasks(tasks: list, phase: int) -> list:
+    """New model output → planner tasks (tagged with their phase, not done)."""
+    return [{**t, "phase": phase, "done": bool(t.get("done"))} for t in tasks]
+
+
+def plan_week(profile: dict) -> dict:
+    """
+    Re-plan profile["weekly_tasks"] in place and return stats.
+    Completed tasks keep their day and count against the budget. Open tasks
+    are packed largest-first onto the least-loaded day while the week's total
+    stays within budget; the rest are marked `deferred`. Tasks from an
+    earlier phase are dropped.
+    """
+    phase = profile.get("current_phase", 0)
+    budget = week_budget(profile)
+    tasks = profile.get("weekly_tasks") or []
+    kept, dropped = [], 0
+    for i, t in enumerate(tasks):
+        if "phase" not in t:
+            t = tag_tasks([t], phase)[0]      # generated before the planner existed
+        if t.get("phase") != phase:
+            dropped += 1
+            continue
+        kept.append((i, t))
+
+    load = dict.fromkeys(DAYS, 0.0)
+    used = 0.0
+    for _, t in kept:
+        if t.get("done"):
+            day = t.get("day") if t.get("day") in load else DAYS[0]
+            t["day"], t["deferred"] = day, False
+            load[day] += task_hours(t)
+            used += task_hours(t)
+
+    open_tasks = sorted((it for it in kept if not it[1].get("done")),
+                        key=lambda it: (-task_hours(it[1]), it[0]))
+    for _, t in open_tasks:
+        hours = task_hours(t)
+        if used + hours > budget + 1e-9:
+            t["deferred"] = True
+            continue
+        day = min(DAYS, key=lambda d: load[d])      # ties → earliest day
+        t["day"], t["deferred"] = day, False
+        load[day] += hours
+        used += hours
+
+    order = {d: n for n, d in enumerate(DAYS)}
+    kept.sort(key=lambda it: (bool(it[1].get("deferred")), order.get(it[1].get("day"), 7), it[0]))
+    profile["weekly_tasks"] = [t for _, t in kept]
+    return {**week_stats(profile), "dropped": dropped}
+
+
+def week_stats(profile: dict) -> dict:
+    """Budget, scheduled and free hours of the plan as it stands (read-only; no re-plan)."""
+    budget = week_budget(profile)
+    tasks = profile.get("weekly_tasks") or []
+    used = sum(task_hours(t) for t in tasks if not t.get("deferred"))
+    return {
+        "budget": budget,
+        "scheduled_hours": round(used, 1),
+        "free_hours": round(max(budget - used, 0.0), 1),
+        "deferred": sum(1 for t in tasks if t.get("deferred")),
+    }
+
+
+def fill_request(profile: dict, stats: dict):
+    """
+    Extra instruction for generating only the missing tasks, or None when the
+    week is full enough that the model doesn't need to be called at all.
+    """
+    if stats["free_hours"] < FILL_MIN_HOURS:
+        return None
+    have = [str(t.get("task") or "") for t in profile.get("weekly_tasks") or []
+            if t.get("phase") == profile.get("current_phase", 0) and not t.get("deferred")]
+    listed = "; ".join(have[:12])
+    roadmap = profile.get("roadmap") or []
+    idx = profile.get("current_phase", 0)
+    phase = (f"My current phase is Phase {roadmap[idx].get('phase', idx + 1)}: "
+             f"{roadmap[idx].get('title', '')}. " if idx < len(roadmap) else "")
+    return (
+        phase
+        + f"I still have {stats['free_hours']:g} free hours this week. "
+        + (f"I already have these tasks (don't repeat them): {listed}. " if listed else "")
+        + f"Only suggest new tasks whose estimated_hours add up to at most {stats['free_hours']:g}."
+    )
+
+
+def merge_new_tasks(profile: dict, items: list) -> dict:
+    """Add model-generated tasks for the current phase (skipping repeats) and re-plan."""
+    tasks = profile.get("weekly_tasks") or []
+    seen = {str(t.get("task") or "").strip().lower() for t in tasks}
+    fresh = [t for t in items if str(t.get("task") or "").strip().lower() not in seen]
+    profile["weekly_tasks"] = tasks + tag_tasks(fresh, profile.get("current_phase", 0))
+    return plan_week(profile)
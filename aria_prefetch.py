@@ -0,0 +1,147 @@
+"""
+aria_prefetch.py
+────────────────
+Opt-in speculative generation of roadmap, projects and weekly tasks.
+Once the diagnosis is done, the next clicks are nearly always "Generate My
+Roadmap", then projects, then this week's tasks. When enabled, those are
+generated in the background at scheduler BACKGROUND priority (chat always
+goes first) and land in the response cache as drafts, keyed exactly as the
+button's own request would be — so the click is answered from the cache
+instantly, and a profile change simply makes the stale drafts miss. Jobs
+work on a profile snapshot taken on the script thread and are tracked per
+user id.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aria_cache import get_cache
+from aria_generate import artifact_cache_key, generate_artifact
+from aria_metrics import trace_labels
+from aria_scheduler import BACKGROUND, request_context
+from aria_system import prompt_fingerprint
+
+PREFETCH_KINDS = ("roadmap", "projects", "weekly_tasks")   # order the user usually asks in
+PREFETCH_MAX_USERS = 256       # users whose last queued fingerprint is remembered
+PREFETCH_IDLE_TTL = 3600       # seconds; no rerun touching a user for this long means no live session
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aria-prefetch")
+
+
+class _UserPrefetch:
+    """One user's prefetch bookkeeping. Only touched under _lock."""
+
+    def __init__(self):
+        self.scheduled = None  # (model, fingerprint) of the last queued job
+        self.wanted = None     # (model, fingerprint) of the profile as last seen
+        self.running = False
+        self.cancelled = False
+        self.seen = time.monotonic()
+
+
+_users = OrderedDict()         # user_id → _UserPrefetch, least recently seen first
+_lock = threading.Lock()
+
+
+def _user(user_id: str, create: bool = False):
+    """This user's entry (marked as seen), expiring idle ones. Call with _lock held."""
+    now = time.monotonic()
+    while _users:
+        uid, oldest = next(iter(_users.items()))
+        stale = now - oldest.seen >= PREFETCH_IDLE_TTL or len(_users) >= PREFETCH_MAX_USERS
+        if not stale or oldest.running or uid == user_id:
+            break
+        _drop(uid)
+    state = _users.get(user_id)
+    if state is None and create:
+        state = _users[user_id] = _UserPrefetch()
+    if state is not None:
+        state.seen = now
+        _users.move_to_end(user_id)
+    return state
+
+
+def _drop(user_id: str):
+    state = _users.pop(user_id, None)
+    if state is not None:
+        state.cancelled = True             # a running job stops before its next draft
+
+
+def profile_ready(profile: dict) -> bool:
+    """Enough is known for the generations to be worth speculating on."""
+    return bool(profile.get("diagnosis_done") and profile.get("python_level"))
+
+
+def _draft_profile(profile: dict, kind: str, drafts: dict) -> dict:
+    """The profile as it will look when `kind` is requested: with the drafted roadmap applied."""
+    if kind == "roadmap" or profile.get("roadmap") or "roadmap" not in drafts:
+        return profile
+    draft = copy.deepcopy(profile)
+    draft.update(roadmap=drafts["roadmap"], current_phase=0, completed_phases=[])
+    return draft
+
+
+def draft_ready(profile: dict, model: str, kind: str) -> bool:
+    """True if clicking Generate for `kind` right now would be served from a draft."""
+    return get_cache().contains(artifact_cache_key(model, kind, profile))
+
+
+def schedule_prefetch(user_id: str, profile: dict, url: str, model: str) -> bool:
+    """
+    Queue background generation of the artifacts `profile` does not have yet.
+    Does nothing until profile_ready(), and only once per (model, profile
+    fingerprint). The fingerprint and the snapshot the job drafts from are
+    taken here, on the script thread. Returns True if a job was queued.
+    """
+    kinds = [k for k in PREFETCH_KINDS if not profile.get(k)]
+    if not kinds or not profile_ready(profile):
+        return False
+    want = (model, prompt_fingerprint(profile))
+    with _lock:
+        state = _user(user_id, create=True)
+        state.wanted = want                # a running job for an older profile stops on this
+        if state.scheduled == want or state.running:
+            return False
+        state.scheduled = want
+        state.running = True
+    snapshot = copy.deepcopy(profile)
+
+    def job():
+        drafts = {}
+        try:
+            with request_context(f"prefetch:{user_id}", BACKGROUND):
+                for kind in kinds:
+                    with _lock:
+                        # Stop if reset, or the profile moved on (a newer job will be queued)
+                        if state.cancelled or state.wanted != want:
+                            return
+                    target = _draft_profile(snapshot, kind, drafts)
+                    if kind != "roadmap" and draft_ready(target, model, kind):
+                        continue       # already drafted (e.g. re-queued after the roadmap landed)
+                    try:
+                        with trace_labels(op=f"prefetch:{kind}"):
+                            drafts[kind], _ = generate_artifact(url, model, kind, target)
+                    except Exception:
+                        if kind == "roadmap":
+                            return     # projects/tasks would be keyed on a roadmap we don't have
+        finally:
+            with _lock:
+                state.running = False
+
+    _executor.submit(job)
+    return True
+
+
+def prefetch_pending(user_id: str) -> bool:
+    with _lock:
+        state = _users.get(user_id)
+        return bool(state and state.running)
+
+
+def cancel_prefetch(user_id: str):
+    """Stop queuing further drafts for `user_id` (used on reset)."""
+    with _lock:
+        _drop(user_id)
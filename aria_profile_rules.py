@@ -0,0 +1,246 @@
+"""
+aria_profile_rules.py
+─────────────────────
+Rule-based profile extraction that runs silently after every user message.
+All rules compile at import into ONE regex of named alternatives, so a
+message is scanned once for level, AI exposure, hours, tools, name and goal.
+Every fact carries a confidence; a field is only overwritten by a fact of
+higher confidence than the one that set it (profile["field_confidence"]),
+so early guesses can be corrected but a manual edit is never clobbered.
+Level and AI-exposure facts are dropped unless the message is about coding
+or AI at all ("an experienced carpenter" says nothing about Python).
+"""
+
+import re
+
+MANUAL_CONFIDENCE = 1.0        # set by the Profile tab's manual edit
+LEGACY_CONFIDENCE = 0.5        # value present with no recorded confidence
+CONTEXT_BOOST = 0.25           # level/exposure fact in a message that names python / AI
+CORRECTION_BOOST = 0.15        # "actually…", "to be honest…" — the user is correcting us
+MAX_RULE_CONFIDENCE = 0.95     # rules never reach a manual edit
+LIST_FIELDS = ("current_tools", "strengths", "gaps")   # merged as a union, not replaced
+MAX_LIST_ITEMS = 12            # newest entries kept per list field
+
+_AI = r"(?:ai|a\.i\.|ml|machine[ -]learning|deep[ -]learning|llms?|neural (?:nets?|networks?))"
+_CODE = r"(?:python|programming|coding|code)"
+
+# (rule, field, value, confidence, pattern). `value` None = taken from the match.
+_RULES = [
+    # ── Python level ──
+    ("lvl_beg",  "python_level", "beginner", 0.55,
+     r"\b(?:beginner|novice|newbie|just (?:started|starting|began)|new to " + _CODE + r"|"
+     r"never (?:coded|programmed|written (?:any )?code)|total noob|from scratch)\b"),
+    ("lvl_int",  "python_level", "intermediate", 0.55,
+     r"\b(?:intermediate|some experience|comfortable with python|decent at python|"
+     r"know (?:python|the basics) (?:fairly |pretty |quite )?well|solid basics)\b"),
+    ("lvl_adv",  "python_level", "advanced", 0.55,
+     r"\b(?:advanced|experienced|expert|senior (?:dev|developer|engineer)|"
+     r"professional (?:python )?(?:dev|developer|engineer)|python for a living)\b"),
+    ("lvl_yrs",  "python_level", None, 0.6,
+     r"\b(?P<lvl_yrs_n>\d{1,2})\+?\s*(?:years?|yrs?) (?:of |with )?(?:python|programming|coding|"
+     r"experience|as a (?:dev|developer|engineer))\b"),
+    ("lvl_for",  "python_level", None, 0.6,
+     r"\b(?:coding|programming|writing|using) (?:in )?(?:python )?for (?:about |over |almost )?"
+     r"(?P<lvl_for_n>\d{1,2})\+? ?(?:years?|yrs?)\b"),
+    # ── AI exposure ──
+    ("ai_none",  "ai_exposure", "none", 0.6,
+     r"\b(?:(?:never|haven't|have not|didn't) (?:ever )?(?:used|touched|tried|did|done|do|worked (?:with|on)|"
+     r"studied|learned) (?:any(?:thing)? (?:with |in )?)?" + _AI + r"|"
+     r"no (?:" + _AI + r" )?(?:experience|background) (?:in|with) " + _AI + r"|"
+     r"no " + _AI + r" (?:experience|background)|new to " + _AI + r"|zero " + _AI + r")\b"),
+    ("ai_theory", "ai_exposure", "theory_only", 0.55,
+     r"\b(?:read (?:about|up on)|watched (?:some |a few )?(?:videos|tutorials|lectures)|"
+     r"(?:took|taking|did|doing|finished) (?:an? |the |a few |some |several )?(?:online |\w+ )?"
+     r"(?:course|mooc|specialization)s?|"
+     r"only (?:the )?theory|theory only|studied (?:the )?(?:math|theory))\b"),
+    ("ai_proj",  "ai_exposure", "some_projects", 0.55,
+     r"\b(?:built|deployed|shipped|trained (?:a|my|some) (?:model|classifier|network)|"
+     r"some projects|side projects?|(?:made|wrote|developed) (?:a|an|my) (?:chatbot|rag|agent|classifier|model))\b"),
+    # ── Hours per week ──
+    ("hrs_day",  "time_per_week", None, 0.75,
+     r"\b(?P<hrs_day_n>\d{1,2}(?:\.\d)?)\s*(?:h|hrs?|hours?)\s*(?:/|a|per|each|every)\s*(?:day|night|evening)\b"),
+    ("hrs_week", "time_per_week", None, 0.8,
+     r"\b(?P<hrs_week_n>\d{1,2}(?:\.\d)?)(?:\s*(?:-|–|to)\s*(?P<hrs_week_hi>\d{1,2}))?\s*(?:h|hrs?|hours?)\b"
+     r"\s*(?:(?:/|a|per|each|every|in a)\s*(?:week|wk)\b|weekly\b)"),
+    # ── Tools ──
+    ("tool",     "current_tools", None, 0.8,
+     r"\b(?P<tool_name>numpy|pandas|scikit[- ]learn|sklearn|pytorch|torch|tensorflow|keras|jax|"
+     r"langchain|langgraph|llama[- ]?index|autogen|crewai|hugging ?face|openai|"
+     r"ollama|fastapi|flask|django|streamlit|docker|kubernetes|git|sql|postgres(?:ql)?|"
+     r"jupyter|matplotlib|opencv|spark)\b"),
+    # ── Name ──
+    ("name_is",  "name", None, 0.9,
+     r"\b(?:my name is|my name's|call me) (?P<name_is_v>(?-i:[A-Z][\w'-]{1,30}))"),
+    ("name_im",  "name", None, 0.6,
+     r"(?:^|[.!?]\s+|\b(?:hi|hey|hello),?\s+)(?:i'm|i am|this is) (?P<name_im_v>(?-i:[A-Z][a-z'-]{1,30}))\b"),
+    # ── Career goal ──
+    ("goal",     "career_goal", None, 0.7,
+     r"\b(?:i (?:want|hope|plan|aim) to|i(?:'d| would) (?:like|love) to|my goal is to|i'm aiming to|dream is to) "
+     r"(?:become|be|work as|get (?:a )?(?:job|hired|role) as|land (?:a )?(?:job|role) as|transition (?:in)?to) "
+     r"(?P<goal_v>[^.!?\n]{3,80})"),
+    # ── Context flags (no field of their own) ──
+    ("ctx_py",   None, None, 0, r"\b(?:python|pythonic)\b"),
+    ("ctx_ai",   None, None, 0, r"\b" + _AI + r"\b"),
+    ("ctx_fix",  None, None, 0, r"\b(?:actually|to be honest|tbh|correction|i meant|not really)\b"),
+    ("ctx_neg",  None, None, 0,                  # swallows "never built…" before ai_proj sees it
+     r"\b(?:never|haven't|have not|didn't|not yet) (?:really |actually )?(?:built|deployed|shipped|made)\b"),
+]
+
+_RULE_INFO = {rule: (field, value, conf) for rule, field, value, conf, _ in _RULES}
+_PROFILE_RE = re.compile(
+    "|".join(f"(?P<{rule}>{pattern})" for rule, _, _, _, pattern in _RULES), re.IGNORECASE
+)
+
+_TOOL_NAMES = {
+    "scikit-learn": "scikit-learn", "scikit learn": "scikit-learn", "sklearn": "scikit-learn",
+    "torch": "pytorch", "huggingface": "huggingface", "hugging face": "huggingface",
+    "llamaindex": "llamaindex", "llama-index": "llamaindex", "llama index": "llamaindex",
+    "postgres": "postgresql",
+}
+_NOT_NAMES = {"Not", "New", "Just", "Still", "Really", "Learning", "Trying", "Working", "Looking",
+              "Currently", "Interested", "Python", "Very", "Pretty", "Quite", "So", "Also", "Here",
+              "Good", "Fine", "Sure", "Ready", "Back", "Done", "Stuck", "Confused", "Sorry",
+              # "I'm Tired" — states and moods a capitalized "I'm …" usually is
+              "Tired", "Exhausted", "Sleepy", "Busy", "Bored", "Lost", "Curious", "Glad", "Happy",
+              "Sad", "Excited", "Nervous", "Anxious", "Worried", "Scared", "Afraid", "Frustrated",
+              "Overwhelmed", "Motivated", "Sick", "Ill", "Okay", "Ok", "Great", "Well", "Alright",
+              "Late", "Free", "Available", "Home", "Unsure", "Certain", "Stressed", "Hungry",
+              "Grateful", "Thankful", "Serious", "Excellent", "Awesome", "Cool", "Keen",
+              "Eager", "Able", "Unable", "Beginner", "Intermediate", "Advanced", "Self",
+              "Going", "Getting", "Doing", "Feeling", "Thinking", "Planning", "Hoping", "Wondering"}
+_LEVEL_FIELDS = ("python_level", "ai_exposure")
+# Context a level/exposure rule's own match may already contain ("new to python")
+_CONTEXT = {
+    "python_level": ("ctx_py", re.compile(_CODE, re.IGNORECASE)),
+    "ai_exposure": ("ctx_ai", re.compile(r"\b" + _AI + r"\b", re.IGNORECASE)),
+}
+# Without one of these anywhere in the message a level/exposure fact is about something else
+_TOPIC = {
+    "python_level": re.compile(r"\b" + _CODE + r"\b", re.IGNORECASE),
+    "ai_exposure": re.compile(
+        r"\b(?:" + _AI + r"|rag|chat ?bots?|agents?|agentic|transformers?|classifiers?|models?|"
+        r"embeddings?|nlp|gpt\w*|openai|langchain|langgraph|llama\w*|crewai|autogen|ollama|"
+        r"hugging ?face|pytorch|torch|tensorflow|keras|scikit[- ]learn|sklearn|data science|"
+        r"math(?:s|ematics)?|statistics)\b", re.IGNORECASE),
+}
+_ARTICLE_RE = re.compile(r"^(?:an?|the)\s+", re.IGNORECASE)
+
+
+def _years_to_level(years: int) -> str:
+    return "beginner" if years < 1 else "intermediate" if years < 4 else "advanced"
+
+
+def extract_profile_facts(text: str) -> dict:
+    """
+    One pass over `text`. Returns {field: (value, confidence)}; current_tools
+    maps to a (list, confidence) of every tool mentioned. Level/exposure
+    facts are only kept when the message is about coding / AI at all.
+    """
+    facts = {}
+    tools = []
+    flags = set()
+    for m in _PROFILE_RE.finditer(text):
+        rule = m.lastgroup
+        field, value, conf = _RULE_INFO[rule]
+        if field is None:
+            flags.add(rule)
+            continue
+        if field in _CONTEXT:
+            flag, context_re = _CONTEXT[field]
+            if context_re.search(m.group(0)):
+                flags.add(flag)
+        if rule in ("lvl_yrs", "lvl_for"):
+            value = _years_to_level(int(m.group(f"{rule}_n")))
+        elif rule == "hrs_week":
+            lo, hi = float(m.group("hrs_week_n")), m.group("hrs_week_hi")
+            value = int(round((lo + float(hi)) / 2 if hi else lo))
+        elif rule == "hrs_day":
+            value = int(round(float(m.group("hrs_day_n")) * 7))
+        elif rule == "tool":
+            name = m.group("tool_name").lower()
+            name = _TOOL_NAMES.get(name, name)
+            if name not in tools:
+                tools.append(name)
+            continue
+        elif rule in ("name_is", "name_im"):
+            value = m.group(f"{rule}_v")
+            if value in _NOT_NAMES:
+                continue
+        elif rule == "goal":
+            value = _ARTICLE_RE.sub("", m.group("goal_v").strip(" ,;:"))
+        if not value or (field == "time_per_week" and not 0 < value <= 80):
+            continue
+        if field not in facts or conf >= facts[field][1]:
+            facts[field] = (value, conf)
+
+    for field, (flag, _) in _CONTEXT.items():
+        if field not in facts:
+            continue
+        if flag in flags:
+            value, conf = facts[field]
+            facts[field] = (value, conf + CONTEXT_BOOST)
+        elif not _TOPIC[field].search(text):
+            del facts[field]   # "an experienced carpenter", "built a treehouse"
+    if "ctx_fix" in flags:
+        facts = {f: (v, c + CORRECTION_BOOST) for f, (v, c) in facts.items()}
+    facts = {f: (v, min(round(c, 3), MAX_RULE_CONFIDENCE)) for f, (v, c) in facts.items()}
+    if tools:
+        facts["current_tools"] = (tools, _RULE_INFO["tool"][2])
+    return facts
+
+
+def field_confidence(profile: dict, field: str) -> float:
+    """Confidence of the field's current value (0 if empty)."""
+    if profile.get(field) in (None, "", []):
+        return 0.0
+    return (profile.get("field_confidence") or {}).get(field, LEGACY_CONFIDENCE)
+
+
+def apply_profile_facts(profile: dict, facts: dict) -> bool:
+    """
+    Merge extracted facts into `profile`: a field changes only when the new
+    fact is more confident than its current value (list fields are unioned).
+    Returns True if anything changed.
+    """
+    changed = False
+    confidence = profile.setdefault("field_confidence", {})
+    for field, (value, conf) in facts.items():
+        if field in LIST_FIELDS:
+            current = list(profile.get(field) or [])
+            merged = list(current)
+            seen = {str(v).lower() for v in current}
+            for v in value:
+                if str(v).lower() not in seen:
+                    seen.add(str(v).lower())
+                    merged.append(v)
+            merged = merged[-MAX_LIST_ITEMS:]
+            if merged != current:
+                profile[field] = merged
+                confidence[field] = max(conf, confidence.get(field, 0.0))
+                changed = True
+            continue
+        if conf > field_confidence(profile, field) and profile.get(field) != value:
+            profile[field] = value
+            confidence[field] = conf
+            changed = True
+        elif profile.get(field) == value and conf > confidence.get(field, 0.0):
+            confidence[field] = conf      # same answer, now better supported
+            changed = True
+
+    if (not profile.get("diagnosis_done")
+            and all(profile.get(f) for f in _LEVEL_FIELDS)):
+        profile["diagnosis_done"] = True
+        changed = True
+    return changed
+
+
+def update_profile_from_text(text: str, profile: dict) -> bool:
+    """Extract facts from one user message and merge them. Returns True if the profile changed."""
+    return apply_profile_facts(profile, extract_profile_facts(text))
+
+
+def mark_manual(profile: dict, fields) -> None:
+    """Record that `fields` were set by hand, so no rule overrides them."""
+    confidence = profile.setdefault("field_confidence", {})
+    for field in fields:
+        confidence[field] = MANUAL_CONFIDENCE
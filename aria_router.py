@@ -0,0 +1,228 @@
+"""
+aria_router.py
+──────────────
+Optional embedding-based persona routing.
+Each persona gets a centroid vector (the mean embedding of its name, `desc`
+and triggers), built in one batched /api/embed call on a background thread
+and cached on disk per (embedding model, PERSONAS). A message is routed to
+the persona with the highest cosine similarity; whenever embeddings are
+unavailable (not pulled on the server), still building, slower than
+ROUTER_TIMEOUT or stuck behind a busy Ollama queue, the keyword matcher
+(aria_system.detect_persona) decides instead.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:            # routing simply stays on keywords
+    np = None
+
+from aria_backends import has_model
+from aria_metrics import trace_labels
+from aria_ollama import CONNECT_TIMEOUT, get_client, get_probe
+from aria_scheduler import BACKGROUND, QueueTimeout, request_context
+from aria_system import PERSONAS, detect_persona
+
+EMBED_MODEL = os.environ.get("ARIA_EMBED_MODEL", "nomic-embed-text")
+VECTOR_DIR = Path(os.environ.get("ARIA_VECTOR_DIR", "aria_vectors"))
+ROUTER_TIMEOUT = 1.5           # seconds to wait for a message embedding
+ROUTER_RETRY_AFTER = 60.0      # after a failure, stay on keywords this long
+ROUTER_STICKY_MARGIN = 0.02    # keep the current persona if it is this close to the best
+MEMO_SIZE = 512                # message embeddings kept per router
+MAX_ROUTERS = 8                # (server, model) routers kept; the least recently used is dropped
+
+
+def personas_digest(personas: dict, model: str) -> str:
+    """Changes whenever the embedding model or any persona's desc/triggers change."""
+    raw = json.dumps(
+        [model, {n: [d["desc"], d["triggers"]] for n, d in personas.items()}],
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.blake2b(raw.encode(), digest_size=10).hexdigest()
+
+
+def _normalize(m):
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+class PersonaRouter:
+    """Embedding router for one (Ollama server, embedding model) pair."""
+
+    def __init__(self, url: str, model: str = EMBED_MODEL, personas: dict = PERSONAS,
+                 vector_dir: Path = VECTOR_DIR):
+        self.url = url
+        self.model = model
+        self.personas = personas
+        self.path = Path(vector_dir) / f"centroids-{personas_digest(personas, model)}.npz"
+        self._lock = threading.Lock()
+        self._names = None
+        self._centroids = None         # (personas × dim), rows unit-length
+        self._building = False
+        self._retry_at = 0.0
+        self._memo = OrderedDict()     # message hash → unit vector
+        self.last_error = None
+
+    # ── Centroids ─────────────────────────────────────────────────────────────
+    @property
+    def status(self) -> str:
+        if np is None:
+            return "disabled"
+        with self._lock:
+            if self._centroids is not None:
+                return "ready"
+            if self._building:
+                return "building"
+            return "unavailable" if self.last_error else "idle"
+
+    def start(self):
+        """
+        Load centroids from disk, or build them in the background. Never
+        blocks on the network; does nothing until the server's probe lists
+        the model.
+        """
+        if np is None:
+            return
+        probe = get_probe(self.url).snapshot()
+        with self._lock:
+            if self._centroids is not None or self._building or time.time() < self._retry_at:
+                return
+            if not has_model(probe["models"], self.model):
+                if probe["ok"]:
+                    self.last_error = f"{self.model} is not pulled on {self.url}"
+                return
+            self._building = True
+        if self._load():
+            return
+        threading.Thread(target=self._build, name=f"persona-router[{self.model}]",
+                         daemon=True).start()
+
+    def _load(self) -> bool:
+        try:
+            with np.load(self.path) as data:
+                names, centroids = list(data["names"]), data["centroids"]
+        except (OSError, KeyError, ValueError):
+            return False
+        if names != list(self.personas):
+            return False
+        with self._lock:
+            self._names, self._centroids, self._building = names, centroids, False
+        return True
+
+    def _build(self):
+        names = list(self.personas)
+        texts, owner = [], []
+        for i, name in enumerate(names):
+            data = self.personas[name]
+            label = name.split(" ", 1)[-1]
+            for t in [f"{label}: {data['desc']}"] + data["triggers"]:
+                texts.append(t.strip())
+                owner.append(i)
+        try:
+            with request_context(f"router:{self.model}", BACKGROUND), trace_labels(op="embed:centroids"):
+                vecs = get_client(self.url).embed(self.model, texts)
+            vecs = _normalize(np.asarray(vecs, dtype=np.float32))
+            if vecs.shape[0] != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {vecs.shape[0]}")
+            owner = np.asarray(owner)
+            centroids = _normalize(np.stack([vecs[owner == i].mean(axis=0) for i in range(len(names))]))
+            self._save(names, centroids)
+        except Exception as exc:
+            with self._lock:
+                self.last_error = str(exc)
+                self._building = False
+                self._retry_at = time.time() + ROUTER_RETRY_AFTER
+            return
+        with self._lock:
+            self._names, self._centroids, self._building = names, centroids, False
+            self.last_error = None
+
+    def _save(self, names, centroids):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp, names=np.asarray(names), centroids=centroids)
+        os.replace(tmp, self.path)
+
+    # ── Messages ──────────────────────────────────────────────────────────────
+    def embed(self, texts: list, timeout: float = ROUTER_TIMEOUT):
+        """
+        Unit vectors for `texts` (rows in input order). Memoized per message
+        hash; all misses go out in one batched request. `timeout` bounds both
+        the wait for a scheduler slot and the request. Raises on failure.
+        """
+        keys = [hashlib.blake2b(t.encode(), digest_size=16).digest() for t in texts]
+        with self._lock:
+            missing = list(dict.fromkeys(k for k in keys if k not in self._memo))
+        if missing:
+            first = {k: t for k, t in zip(keys, texts)}
+            with trace_labels(op="embed:route"):
+                vecs = get_client(self.url).embed(self.model, [first[k] for k in missing],
+                                                  timeout=(CONNECT_TIMEOUT, timeout),
+                                                  queue_timeout=timeout)
+            vecs = _normalize(np.asarray(vecs, dtype=np.float32))
+            with self._lock:
+                for k, v in zip(missing, vecs):
+                    self._memo[k] = v
+                while len(self._memo) > MEMO_SIZE:
+                    self._memo.popitem(last=False)
+        with self._lock:
+            for k in keys:
+                self._memo.move_to_end(k)
+            return np.stack([self._memo[k] for k in keys])
+
+    def scores(self, texts: list):
+        """(names, similarity matrix texts × personas), or None if embeddings can't be used now."""
+        self.start()
+        with self._lock:
+            names, centroids = self._names, self._centroids
+            cooling = time.time() < self._retry_at
+        if centroids is None or cooling:
+            return None
+        try:
+            return names, self.embed(texts) @ centroids.T
+        except QueueTimeout:
+            return None            # Ollama is just busy; no cool-down
+        except Exception as exc:
+            with self._lock:
+                self.last_error = str(exc)
+                self._retry_at = time.time() + ROUTER_RETRY_AFTER
+            return None
+
+    def route(self, text: str, current: str):
+        """(persona, source) where source is 'embedding' or 'keywords'."""
+        result = self.scores([text]) if text.strip() else None
+        if result is None:
+            return detect_persona(text, current), "keywords"
+        names, sims = result
+        sims = sims[0]
+        best = int(np.argmax(sims))
+        if current in names and sims[best] - sims[names.index(current)] <= ROUTER_STICKY_MARGIN:
+            return current, "embedding"
+        return names[best], "embedding"
+
+
+_routers = OrderedDict()
+_routers_lock = threading.Lock()
+
+
+def get_router(url: str, model: str = EMBED_MODEL) -> PersonaRouter:
+    """
+    Process-wide router for (`url`, `model`). At most MAX_ROUTERS are kept,
+    least recently used first out.
+    """
+    key = (url.rstrip("/"), model.strip())
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = _routers[key] = PersonaRouter(*key)
+            while len(_routers) > MAX_ROUTERS:
+                _routers.popitem(last=False)
+        _routers.move_to_end(key)
+        return router
@@ -0,0 +1,223 @@
+"""
+aria_scheduler.py
+─────────────────
+Process-wide request scheduler in front of each Ollama backend.
+At most MAX_INFLIGHT model requests run at once per backend; the rest wait
+in per-user FIFO queues served round-robin, with interactive requests (chat,
+button generations) always ahead of background ones (summaries, profile
+extraction, warm-up). Callers tag their thread with request_context(); the
+pooled client in aria_ollama takes a slot around every model call.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+MAX_INFLIGHT = int(os.environ.get("ARIA_OLLAMA_MAX_INFLIGHT", "2"))
+WAIT_SAMPLES = 500             # recent queue waits kept for the percentiles
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_context = contextvars.ContextVar("aria_request_context", default=("anonymous", INTERACTIVE))
+
+
+class QueueTimeout(RuntimeError):
+    """No slot became free within the caller's timeout."""
+
+
+class QueueCancelled(RuntimeError):
+    """The caller cancelled while still waiting for a slot."""
+
+
+@contextmanager
+def request_context(user: str, priority: int = INTERACTIVE):
+    """Tag model requests made by this thread (inside the block) with a user and priority."""
+    token = _context.set((str(user), priority))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    """(user, priority) for requests made from this thread right now."""
+    return _context.get()
+
+
+class _Ticket:
+    __slots__ = ("user", "priority", "enqueued", "granted")
+
+    def __init__(self, user, priority):
+        self.user = user
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.granted = False
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(int(q * len(sorted_vals)), len(sorted_vals) - 1)]
+
+
+class Scheduler:
+    """Bounded, fair admission for one backend."""
+
+    def __init__(self, max_inflight: int = MAX_INFLIGHT):
+        self.max_inflight = max(1, max_inflight)
+        self._cond = threading.Condition()
+        self._inflight = 0
+        # priority → OrderedDict(user → deque of tickets); dict order is the round-robin order
+        self._queues = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITY_NAMES}
+        self._granted = {p: 0 for p in PRIORITY_NAMES}
+        self._timeouts = 0
+
+    # ── Admission ─────────────────────────────────────────────────────────────
+    def _dispatch(self):
+        """Grant queued tickets while slots are free (caller holds the lock)."""
+        while self._inflight < self.max_inflight:
+            for p in sorted(self._queues):
+                users = self._queues[p]
+                if users:
+                    break
+            else:
+                return
+            user, q = next(iter(users.items()))
+            ticket = q.popleft()
+            if q:
+                users.move_to_end(user)        # round-robin: this user goes to the back
+            else:
+                del users[user]
+            ticket.granted = True
+            self._inflight += 1
+            self._granted[p] += 1
+            self._waits[p].append(time.perf_counter() - ticket.enqueued)
+        self._cond.notify_all()
+
+    def _withdraw(self, ticket):
+        q = self._queues[ticket.priority].get(ticket.user)
+        if q and ticket in q:
+            q.remove(ticket)
+            if not q:
+                del self._queues[ticket.priority][ticket.user]
+
+    @contextmanager
+    def slot(self, user: str = None, priority: int = None, timeout: float = None, cancel=None):
+        """
+        Hold one in-flight slot for the duration of the block. Defaults come
+        from request_context(). Raises QueueTimeout / QueueCancelled if no
+        slot was granted in time or `cancel` (an aria_ollama.CancelToken) fired.
+        """
+        ctx_user, ctx_priority = current_context()
+        ticket = _Ticket(user or ctx_user, ctx_priority if priority is None else priority)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if cancel is not None:
+            cancel.on_cancel(self._wake)
+        with self._cond:
+            self._queues[ticket.priority].setdefault(ticket.user, deque()).append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                if cancel is not None and cancel.is_set():
+                    self._withdraw(ticket)
+                    raise QueueCancelled("cancelled while queued")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._withdraw(ticket)
+                    self._timeouts += 1
+                    raise QueueTimeout(f"no Ollama slot within {timeout:g} s")
+                self._cond.wait(remaining)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._inflight -= 1
+                self._dispatch()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    # ── Introspection ─────────────────────────────────────────────────────────
+    def position(self, user: str, priority: int = INTERACTIVE):
+        """
+        1-based estimate of when `user`'s oldest waiting request gets a slot
+        (0 = none waiting). Counts everything ahead of it: higher-priority
+        work, and one round-robin turn per other user in its own class.
+        """
+        with self._cond:
+            users = self._queues[priority]
+            if user not in users:
+                return 0
+            ahead = sum(len(q) for p, us in self._queues.items() if p < priority for q in us.values())
+            for other in users:
+                if other == user:
+                    break
+                ahead += 1
+            return ahead + 1
+
+    def load(self) -> int:
+        """Requests running plus waiting — the load balancer's cost for this backend."""
+        with self._cond:
+            return self._inflight + sum(len(q) for us in self._queues.values() for q in us.values())
+
+    def metrics(self) -> dict:
+        with self._cond:
+            out = {
+                "max_inflight": self.max_inflight,
+                "inflight": self._inflight,
+                "timeouts": self._timeouts,
+            }
+            for p, name in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[p])
+                out[f"{name}_queued"] = sum(len(q) for q in self._queues[p].values())
+                out[f"{name}_granted"] = self._granted[p]
+                out[f"{name}_wait_p50_ms"] = round(_percentile(waits, 0.50) * 1000, 1)
+                out[f"{name}_wait_p95_ms"] = round(_percentile(waits, 0.95) * 1000, 1)
+                out[f"{name}_wait_max_ms"] = round((waits[-1] if waits else 0.0) * 1000, 1)
+            return out
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(url: str) -> Scheduler:
+    """Process-wide scheduler for the backend at `url`."""
+    url = url.rstrip("/")
+    with _schedulers_lock:
+        sched = _schedulers.get(url)
+        if sched is None:
+            sched = _schedulers[url] = Scheduler()
+        return sched
+
+
+def all_metrics() -> dict:
+    """{backend url: metrics()} for every backend seen so far."""
+    with _schedulers_lock:
+        items = list(_schedulers.items())
+    return {url: s.metrics() for url, s in items}
+
+
+def prometheus_text() -> str:
+    """Queue depth / in-flight / wait-time gauges in Prometheus text format, one family at a time."""
+    metrics = all_metrics()
+    per_priority = [(url, name, m, f'backend="{url}",priority="{name}"')
+                    for url, m in metrics.items() for name in PRIORITY_NAMES.values()]
+    lines = ["# TYPE aria_ollama_inflight gauge"]
+    lines += [f'aria_ollama_inflight{{backend="{url}"}} {m["inflight"]}' for url, m in metrics.items()]
+    lines.append("# TYPE aria_ollama_queue_depth gauge")
+    lines += [f"aria_ollama_queue_depth{{{label}}} {m[f'{name}_queued']}" for _, name, m, label in per_priority]
+    lines.append("# TYPE aria_ollama_requests_granted_total counter")
+    lines += [f"aria_ollama_requests_granted_total{{{label}}} {m[f'{name}_granted']}"
+              for _, name, m, label in per_priority]
+    # p50 / p95 / max of recent waits: a stat label, since max is not a quantile
+    lines.append("# TYPE aria_ollama_queue_wait_ms gauge")
+    lines += [f'aria_ollama_queue_wait_ms{{{label},stat="{q}"}} {m[f"{name}_wait_{q}_ms"]}'
+              for _, name, m, label in per_priority for q in ("p50", "p95", "max")]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,222 @@
+"""
+aria_store.py
+─────────────
+Per-user profile and chat-history store backed by SQLite (WAL mode).
+Each profile field is its own row keyed by (user_id, field), so a save only
+touches the fields that actually changed and lookups are a primary-key scan.
+Chat history is append-only, keyed by (user_id, seq), and read back a page
+at a time. The legacy single-user aria_profile.json is imported on first use.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from aria_persist import load_json_with_recovery
+
+DB_PATH = Path(os.environ.get("ARIA_DB_PATH", "aria.db"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile_fields (
+    user_id    TEXT NOT NULL,
+    field      TEXT NOT NULL,
+    value      TEXT NOT NULL,          -- JSON-encoded
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chat_messages (
+    user_id    TEXT    NOT NULL,
+    seq        INTEGER NOT NULL,       -- 0-based position in the conversation
+    role       TEXT    NOT NULL,
+    content    TEXT    NOT NULL,
+    hidden     INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT    NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class ProfileStore:
+    """Thread-safe: every thread gets its own connection to the same WAL database."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._saved = {}          # user_id -> {field: json} as last written/read
+        self.conn.executescript(_SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def load(self, user_id: str):
+        """The stored profile for `user_id`, or None if the user is unknown."""
+        rows = self.conn.execute(
+            "SELECT field, value FROM profile_fields WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        with self._lock:
+            self._saved[user_id] = dict(rows)
+        if not rows:
+            return None
+        return {field: json.loads(value) for field, value in rows}
+
+    def save(self, user_id: str, profile: dict) -> int:
+        """Upsert only the fields that differ from what is stored. Returns rows written."""
+        encoded = {k: json.dumps(v, sort_keys=True) for k, v in profile.items()}
+        with self._lock:
+            known = self._saved.get(user_id)
+        if known is None:
+            self.load(user_id)
+            with self._lock:
+                known = self._saved[user_id]
+        changed = [(k, v) for k, v in encoded.items() if known.get(k) != v]
+        removed = [k for k in known if k not in encoded]
+        if not changed and not removed:
+            return 0
+
+        now = datetime.now().isoformat()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO profile_fields (user_id, field, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, field) DO UPDATE SET value = excluded.value, "
+                "updated_at = excluded.updated_at",
+                [(user_id, k, v, now) for k, v in changed],
+            )
+            conn.executemany(
+                "DELETE FROM profile_fields WHERE user_id = ? AND field = ?",
+                [(user_id, k) for k in removed],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            saved = self._saved.setdefault(user_id, {})
+            saved.update(changed)
+            for k in removed:
+                saved.pop(k, None)
+        return len(changed) + len(removed)
+
+    def delete(self, user_id: str):
+        """Remove the user's profile and chat history."""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM profile_fields WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._saved[user_id] = {}
+
+    # ── Chat history ──────────────────────────────────────────────────────────
+    def append_message(self, user_id: str, role: str, content: str, hidden: bool = False) -> dict:
+        """Append one message and return it as stored (with its `seq`)."""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (seq,) = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM chat_messages WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO chat_messages (user_id, seq, role, content, hidden, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, seq, role, content, int(hidden), datetime.now().isoformat()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        msg = {"seq": seq, "role": role, "content": content}
+        if hidden:
+            msg["hidden"] = True
+        return msg
+
+    def load_messages(self, user_id: str, limit: int, before_seq: int = None) -> list:
+        """Up to `limit` messages older than `before_seq` (default: newest), oldest first."""
+        if before_seq is None:
+            before_seq = 2 ** 62
+        rows = self.conn.execute(
+            "SELECT seq, role, content, hidden FROM chat_messages "
+            "WHERE user_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (user_id, before_seq, limit),
+        ).fetchall()
+        msgs = []
+        for seq, role, content, hidden in reversed(rows):
+            msg = {"seq": seq, "role": role, "content": content}
+            if hidden:
+                msg["hidden"] = True
+            msgs.append(msg)
+        return msgs
+
+    def count_messages(self, user_id: str) -> int:
+        (n,) = self.conn.execute(
+            "SELECT COUNT(*) FROM chat_messages WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return n
+
+    def claim_legacy_json(self, json_path, user_id: str):
+        """
+        One-time migration: import the old single-user JSON profile for
+        `user_id` (the first session to start after upgrading) and rename the
+        file to *.migrated. Returns the imported profile or None.
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return None
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT value FROM meta WHERE key = 'legacy_json_migrated'"
+            ).fetchone()
+            if done:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', ?)", (user_id,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        data, _ = load_json_with_recovery(json_path)
+        if not isinstance(data, dict):
+            return None
+        self.save(user_id, data)
+        os.replace(json_path, json_path.with_name(json_path.name + ".migrated"))
+        return data
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=DB_PATH) -> ProfileStore:
+    """Process-wide store for `path`."""
+    key = str(Path(path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ProfileStore(path)
+        return store
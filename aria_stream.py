@@ -0,0 +1,175 @@
+"""
+aria_stream.py
+──────────────
+Streaming helpers for the chat UI.
+ThrottledRenderer buffers incoming tokens and repaints the Streamlit
+placeholder at a bounded frame rate, instead of re-sending the whole growing
+Markdown string over the websocket for every token.
+GenerationJob runs the token stream on a worker thread, so the script thread
+only drains a queue and can stop the generation at any moment.
+"""
+
+import queue
+import threading
+import time
+
+from aria_ollama import CancelToken
+
+RENDER_FPS = 12          # max repaints per second while streaming
+RENDER_EVERY_N = 48      # …or flush early once this many tokens are buffered (0 = off)
+CURSOR = "▌"
+
+
+class ThrottledRenderer:
+    """Accumulate tokens and flush them to `box.markdown()` at most `fps` times a second."""
+
+    def __init__(self, box, fps: float = RENDER_FPS, every_n: int = RENDER_EVERY_N,
+                 cursor: str = CURSOR):
+        self.box = box
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.every_n = every_n
+        self.cursor = cursor
+        self._text = ""
+        self._pending = []
+        self._tokens = 0
+        self._frames = 0
+        self._started = time.perf_counter()
+        self._last_flush = self._started
+        self._ended = None
+
+    @property
+    def text(self) -> str:
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+        return self._text
+
+    def resume(self, text: str):
+        """Repaint text already streamed before a rerun; it is not counted as tokens."""
+        self._text, self._pending = text, []
+        self._paint(text + self.cursor, time.perf_counter())
+
+    def feed(self, tok: str):
+        self._pending.append(tok)
+        self._tokens += 1
+        now = time.perf_counter()
+        if (now - self._last_flush >= self.interval
+                or (self.every_n and len(self._pending) >= self.every_n)):
+            self._paint(self.text + self.cursor, now)
+
+    def finish(self, text: str = None) -> str:
+        """
+        Final flush without the cursor; returns the full text. `text`, when
+        given, replaces what was streamed (e.g. with a stop or error note).
+        """
+        self._ended = time.perf_counter()
+        if text is not None:
+            self._text, self._pending = text, []
+        self._paint(self.text, self._ended)
+        return self._text
+
+    def _paint(self, content: str, now: float):
+        self.box.markdown(content)
+        self._frames += 1
+        self._last_flush = now
+
+    def stats(self, tokens: int = None, seconds: float = None) -> dict:
+        """
+        Render rates. `tokens`/`seconds` default to this renderer's own feed()
+        count and lifetime; pass a GenerationJob's to rate a reply that
+        spanned reruns (frames are always this renderer's).
+        """
+        end = self._ended or time.perf_counter()
+        painted = max(end - self._started, 1e-6)
+        tokens = self._tokens if tokens is None else tokens
+        elapsed = painted if seconds is None else max(seconds, 1e-6)
+        return {
+            "tokens": tokens,
+            "frames": self._frames,
+            "seconds": round(elapsed, 2),
+            "tokens_per_sec": round(tokens / elapsed, 1),
+            "frames_per_sec": round(self._frames / painted, 1),
+        }
+
+
+# ── Background generation ─────────────────────────────────────────────────────
+_DONE = object()
+
+
+class GenerationJob:
+    """
+    Runs `make_stream(cancel_token)` — any token iterator — on a worker
+    thread, feeding a queue the UI drains. Keep the job in session state: it
+    survives Streamlit reruns, and `shown` holds every token drained so far,
+    so a rerun re-renders the partial reply and carries on; `tokens` counts
+    them. `meta` is free for the caller's bookkeeping.
+    """
+
+    def __init__(self, make_stream, meta: dict = None):
+        self.cancel_token = CancelToken()
+        self.meta = meta or {}
+        self.shown = ""
+        self.tokens = 0
+        self.error = None
+        self.started = time.time()
+        self.ended = None
+        self._queue = queue.Queue()
+        self._finished = False
+        self._thread = threading.Thread(
+            target=self._run, args=(make_stream,), name="aria-generation", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, make_stream):
+        try:
+            for tok in make_stream(self.cancel_token):
+                if self.cancel_token.is_set():
+                    break
+                self._queue.put(tok)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self._queue.put(_DONE)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.is_set()
+
+    @property
+    def finished(self) -> bool:
+        """True once every token has been drained, or the job was cancelled."""
+        return self._finished or self.cancelled
+
+    @property
+    def seconds(self) -> float:
+        """Wall time from start until finished (or now, while running)."""
+        return (self.ended or time.time()) - self.started
+
+    def cancel(self):
+        """Stop now: closes the HTTP stream; tokens still queued are dropped."""
+        if self.ended is None:
+            self.ended = time.time()
+        self.cancel_token.cancel()
+
+    def drain(self, timeout: float = 0.1) -> list:
+        """
+        Tokens that arrived since the last call, waiting up to `timeout` for
+        the first one. They are appended to `shown`.
+        """
+        toks = []
+        if self.finished:
+            return toks
+        try:
+            item = self._queue.get(timeout=timeout)
+            while True:
+                if item is _DONE:
+                    self._finished = True
+                    self.ended = time.time()
+                    break
+                toks.append(item)
+                item = self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.shown += "".join(toks)
+        self.tokens += len(toks)
+        return toks
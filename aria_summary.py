@@ -0,0 +1,198 @@
+"""
+aria_summary.py
+───────────────
+Rolling conversation summary.
+When the not-yet-summarized part of the chat outgrows its share of the
+context budget, the oldest turns are folded into a running summary stored on
+the profile (`conversation_summary`, `summary_upto`). Folding runs on a
+background thread, never on the user's critical path; the result is handed
+back and written to the profile by apply_pending_summary() on the script
+thread, so the worker never touches the live profile. Folds are tracked
+per user id and forgotten on reset or once no rerun has asked for them
+within SUMMARY_IDLE_TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aria_context import MESSAGE_OVERHEAD, count_tokens
+from aria_metrics import trace_labels
+from aria_ollama import NUM_CTX, get_client
+from aria_scheduler import BACKGROUND, request_context
+
+SUMMARY_TRIGGER_RATIO = 0.6    # fold once unsummarized history > 60% of budget
+SUMMARY_KEEP_RATIO = 0.3       # …leaving the newest ~30% of budget verbatim
+SUMMARY_MIN_FOLD = 4           # never fold fewer turns than this at once
+SUMMARY_MAX_TOKENS = 320       # num_predict for the summary itself
+SUMMARY_MAX_USERS = 256        # users with a fold in flight or waiting (least recently seen idle go first)
+SUMMARY_IDLE_TTL = 3600        # seconds; no rerun touching a user for this long means no live session
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a mentoring conversation between a learner "
+    "and ARIA, their AI career guide. Merge the previous summary with the new turns "
+    "into ONE updated summary of at most 200 words. Keep facts about the learner "
+    "(skills, goals, constraints), decisions made, code or projects discussed, and "
+    "open questions. Drop greetings and filler. Output only the summary text."
+)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="aria-summary")
+
+
+class _UserFold:
+    """One user's fold. Only touched under _lock."""
+
+    def __init__(self):
+        self.inflight = False
+        self.cancelled = False
+        self.result = None     # (summary_upto it was based on, summary, new summary_upto)
+        self.seen = time.monotonic()
+
+
+_users = OrderedDict()         # user_id → _UserFold, least recently seen first
+_lock = threading.Lock()
+
+
+def _user(user_id: str, create: bool = False):
+    """This user's fold (marked as seen), expiring idle ones. Call with _lock held."""
+    now = time.monotonic()
+    while _users:
+        uid, oldest = next(iter(_users.items()))
+        stale = now - oldest.seen >= SUMMARY_IDLE_TTL or len(_users) >= SUMMARY_MAX_USERS
+        if not stale or oldest.inflight or uid == user_id:
+            break
+        _drop(uid)
+    state = _users.get(user_id)
+    if state is None and create:
+        state = _users[user_id] = _UserFold()
+    if state is not None:
+        state.seen = now
+        _users.move_to_end(user_id)
+    return state
+
+
+def _drop(user_id: str):
+    state = _users.pop(user_id, None)
+    if state is not None:
+        state.cancelled = True             # an in-flight fold keeps its result to itself
+
+
+def unsummarized_start(history: list, summary_upto: int) -> int:
+    """
+    Index into `history` of the first message not yet in the summary.
+    `history` is the in-memory tail of the conversation; each message carries
+    its absolute `seq`, and `summary_upto` is an absolute position. Messages
+    older than the loaded tail are treated as already covered.
+    """
+    if not history:
+        return 0
+    offset = history[0].get("seq", 0)
+    return min(max(summary_upto - offset, 0), len(history))
+
+
+def plan_fold(history: list, summary_upto: int, budget: int):
+    """
+    Decide whether to fold. Everything in `history` before index
+    `summary_upto` is already in the summary. Returns the new index or None
+    if the unsummarized tail still fits.
+    """
+    tail = history[summary_upto:]
+    costs = [count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in tail]
+    if sum(costs) <= budget * SUMMARY_TRIGGER_RATIO:
+        return None
+
+    keep_budget = budget * SUMMARY_KEEP_RATIO
+    kept = 0
+    cut = len(tail)
+    for cost in reversed(costs):
+        if kept + cost > keep_budget:
+            break
+        kept += cost
+        cut -= 1
+    if cut < SUMMARY_MIN_FOLD:
+        return None
+    return summary_upto + cut
+
+
+def summarize_turns(url: str, model: str, previous: str, turns: list) -> str:
+    """Blocking call: fold `turns` into `previous` and return the new summary."""
+    transcript = "\n\n".join(
+        f"{'Learner' if m['role'] == 'user' else 'ARIA'}: {m['content']}" for m in turns
+    )
+    user = (
+        f"PREVIOUS SUMMARY:\n{previous or '(none yet)'}\n\n"
+        f"NEW TURNS:\n{transcript}"
+    )
+    resp = get_client(url).chat({
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": user},
+        ],
+        "options": {"temperature": 0.2, "num_predict": SUMMARY_MAX_TOKENS, "num_ctx": NUM_CTX},
+    })
+    return resp.get("message", {}).get("content", "").strip()
+
+
+def maybe_schedule_summary(user_id: str, history: list, profile: dict, url: str, model: str,
+                           budget: int) -> bool:
+    """
+    Queue a background fold if the history needs one and none is running or
+    waiting for this user; apply_pending_summary() stores the result.
+    Returns True if a job was queued.
+    """
+    upto_seq = profile.get("summary_upto", 0)
+    upto = unsummarized_start(history, upto_seq)
+    new_upto = plan_fold(history, upto, budget)
+    if new_upto is None:
+        return False
+    offset = history[0].get("seq", 0)
+
+    with _lock:
+        state = _user(user_id, create=True)
+        if state.inflight or state.result is not None:
+            return False
+        state.inflight = True
+
+    turns = [dict(m) for m in history[upto:new_upto]]
+    previous = profile.get("conversation_summary", "")
+
+    def job():
+        try:
+            with request_context(user_id, BACKGROUND), trace_labels(op="summary"):
+                summary = summarize_turns(url, model, previous, turns)
+            with _lock:
+                if not state.cancelled and summary:
+                    state.result = (upto_seq, summary, offset + new_upto)
+        except Exception:
+            pass
+        finally:
+            with _lock:
+                state.inflight = False
+
+    _executor.submit(job)
+    return True
+
+
+def apply_pending_summary(user_id: str, profile: dict) -> bool:
+    """Store `user_id`'s finished fold on `profile`. Call on the script thread; True if it changed."""
+    with _lock:
+        state = _user(user_id)
+        result = None
+        if state is not None:
+            result, state.result = state.result, None
+    if result is None:
+        return False
+    upto_seq, summary, new_upto = result
+    if profile.get("summary_upto", 0) != upto_seq:
+        return False           # another writer (e.g. a reset) moved the window
+    profile["conversation_summary"] = summary
+    profile["summary_upto"] = new_upto
+    return True
+
+
+def cancel_summary(user_id: str):
+    """Forget any in-flight or waiting fold for `user_id` (used on reset)."""
+    with _lock:
+        _drop(user_id)
@@ -6,6 +6,11 @@ No pre-loaded roadmap. No pre-loaded projects.
 Everything user-facing is generated by the model from real conversation.
 """
 
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
 # ── Persona definitions ───────────────────────────────────────────────────────
 PERSONAS = {
     "🧑‍🏫 Instructor": {
@@ -64,6 +69,117 @@ PERSONAS = {
     },
 }
 
+# ── Persona detection ─────────────────────────────────────────────────────────
+# Triggers are compiled once at import into a word index: a message is
+# normalized and split in one pass, most words are rejected by one set lookup
+# on their first letters, the rest resolve through a cached prefix search, and
+# phrases are only checked when their first word occurs.
+# Generic phrases count for less; unambiguous ones (code fences) for more.
+TRIGGER_WEIGHTS = {
+    "what is": 0.5, "what are": 0.5, "how does": 0.5, "learn": 0.5, "explain": 0.75,
+    "plan": 0.75, "week": 0.5, "track": 0.5, "feature": 0.5,
+    "tool": 0.5, "system": 0.5, "build": 0.5, "structure": 0.5, "flow": 0.5, "design": 0.75,
+    "look at this": 0.75, "error": 0.75, "function": 0.75,
+    "skill": 0.75, "position": 0.5, "market": 0.75,
+    "question": 0.5, "problem": 0.5,
+    "def ": 1.5, "class ": 1.5, "import ": 1.5, "check my code": 2.0,
+    "```python": 3.0, "```py": 3.0,
+    "challenge me": 2.0, "test me": 2.0, "give me a task": 2.0,
+    "land a job": 2.0, "portfolio strategy": 2.0, "prompt engineer": 1.5,
+}
+MAX_HITS_PER_TRIGGER = 3       # a pasted blob repeating one word can't swamp the score
+COUNT_WORDS_FROM = 64          # longer messages are deduplicated with a Counter first
+
+# Everything but letters, digits and backticks (for ```python) separates words
+_WORD_SPLIT = str.maketrans({c: " " for c in "!\"#$%&'()*+,-./:;<=>?@[\\]^_{|}~"})
+_SHORT_SUFFIXES = {"", "s", "es", "ed", "ing"}
+
+
+def _suffix_ok(trigger_word: str, suffix: str) -> bool:
+    """Inflections a word trigger accepts: "rag" ≠ "ragged", "plan" → "planning", "tokeniz" → "tokenizer"."""
+    if len(trigger_word) >= 5:
+        return True
+    if len(trigger_word) == 4:
+        return len(suffix) <= 4
+    return suffix in _SHORT_SUFFIXES
+
+
+def _compile_personas(personas: dict):
+    words = {}                             # word trigger → [(trigger, persona, weight)]
+    phrases = {}                           # first word → [(needle, trigger, persona, weight)]
+    for name, data in personas.items():
+        for trigger in data["triggers"]:
+            parts = trigger.translate(_WORD_SPLIT).split()
+            owner = (trigger, name, TRIGGER_WEIGHTS.get(trigger, 1.0))
+            if len(parts) == 1:
+                words.setdefault(parts[0], []).append(owner)
+            else:
+                # Matched against " w1 w2 … " so both ends sit on word boundaries;
+                # a phrase ending in a long word also takes inflections ("land a jobs").
+                needle = " " + " ".join(parts) + (" " if len(parts[-1]) <= 2 else "")
+                phrases.setdefault(parts[0], []).append((needle,) + owner)
+    lengths = sorted({len(w) for w in words}, reverse=True)
+    return words, phrases, lengths
+
+
+_PERSONA_WORDS, _PERSONA_PHRASES, _PERSONA_WORD_LENGTHS = _compile_personas(PERSONAS)
+_PREFIX_LEN = _PERSONA_WORD_LENGTHS[-1]          # shortest word trigger
+_PERSONA_PREFIXES = frozenset(w[:_PREFIX_LEN] for w in (*_PERSONA_WORDS, *_PERSONA_PHRASES))
+
+
+@lru_cache(maxsize=4096)
+def _word_owners(tok: str) -> list:
+    """Owners of the longest word trigger `tok` starts with (and whose inflection it allows)."""
+    for length in _PERSONA_WORD_LENGTHS:
+        if length <= len(tok):
+            owners = _PERSONA_WORDS.get(tok[:length])
+            if owners and _suffix_ok(tok[:length], tok[length:]):
+                return owners
+    return []
+
+
+def persona_scores(text: str) -> dict:
+    """Weighted trigger score per persona for `text` (personas with no hits are omitted)."""
+    tokens = text.lower().translate(_WORD_SPLIT).split()
+    # A chat turn is cheaper to walk word by word than to count; pasted blobs
+    # repeat words often enough that counting first pays off.
+    if len(tokens) >= COUNT_WORDS_FROM:
+        counted = Counter(tokens).items()
+    else:
+        counted = ((tok, 1) for tok in tokens)
+    hits = {}                              # owner → occurrences
+    heads = set()                          # words that start a phrase trigger
+    for tok, n in counted:
+        if tok[:_PREFIX_LEN] not in _PERSONA_PREFIXES:
+            continue
+        for owner in _word_owners(tok):
+            hits[owner] = hits.get(owner, 0) + n
+        if tok in _PERSONA_PHRASES:
+            heads.add(tok)
+    if heads:
+        joined = " " + " ".join(tokens) + " "
+        for tok in heads:
+            for needle, *owner in _PERSONA_PHRASES[tok]:
+                count = joined.count(needle)
+                if count:
+                    hits[tuple(owner)] = hits.get(tuple(owner), 0) + count
+    scores = {}
+    for (_, name, weight), n in hits.items():
+        scores[name] = scores.get(name, 0.0) + weight * min(n, MAX_HITS_PER_TRIGGER)
+    return scores
+
+
+def detect_persona(text: str, current: str) -> str:
+    """Highest-scoring persona for `text`; ties (and no hits) keep `current`."""
+    scores = persona_scores(text)
+    if not scores:
+        return current
+    best = max(scores.values())
+    if scores.get(current) == best:
+        return current
+    return next(name for name, s in scores.items() if s == best)
+
+
 # ── Empty user profile template ───────────────────────────────────────────────
 EMPTY_PROFILE = {
     "name": None,
@@ -80,10 +196,52 @@ EMPTY_PROFILE = {
     "current_phase": 0,
     "completed_phases": [],
     "weekly_tasks": [],            # generated for the current phase
+    "conversation_summary": "",    # rolling summary of older chat turns
+    "summary_upto": 0,             # seq of the first chat message not folded into it
+    "field_confidence": {},        # field → confidence of its value (aria_profile_rules)
     "last_updated": None,
 }
 
-# ── Base system prompt (profile injected at runtime) ─────────────────────────
+# ── Generated artifact schemas ────────────────────────────────────────────────
+# JSON Schema for ONE item of each list ARIA generates; keys match the profile
+# field the list is stored under and the schemas in ARIA_BASE_PROMPT.
+ARTIFACT_SCHEMAS = {
+    "roadmap": {
+        "type": "object",
+        "properties": {
+            "phase": {"type": "integer"},
+            "weeks": {"type": "string"},
+            "title": {"type": "string"},
+            "topics": {"type": "array", "items": {"type": "string"}},
+            "milestone": {"type": "string"},
+        },
+        "required": ["phase", "weeks", "title", "topics", "milestone"],
+    },
+    "projects": {
+        "type": "object",
+        "properties": {
+            "rank": {"type": "integer"},
+            "name": {"type": "string"},
+            "complexity": {"type": "string", "enum": ["Beginner", "Intermediate", "Advanced"]},
+            "description": {"type": "string"},
+            "tech": {"type": "array", "items": {"type": "string"}},
+            "why": {"type": "string"},
+        },
+        "required": ["rank", "name", "complexity", "description", "tech", "why"],
+    },
+    "weekly_tasks": {
+        "type": "object",
+        "properties": {
+            "day": {"type": "string"},
+            "task": {"type": "string"},
+            "resource": {"type": "string"},
+            "estimated_hours": {"type": "number"},
+        },
+        "required": ["day", "task", "resource", "estimated_hours"],
+    },
+}
+
+# ── Base system prompt (static; profile appended at runtime) ─────────────────
 ARIA_BASE_PROMPT = """You are ARIA (Adaptive Role Intelligence Assistant) — an expert AI companion whose mission is to guide this specific user to become a professional Agentic AI Developer.
 
 You operate across six fluid expert personas, switching seamlessly based on context. Always prefix responses with the active role label:
@@ -106,9 +264,6 @@ You operate across six fluid expert personas, switching seamlessly based on cont
 • Structure responses with headers, code blocks, and bullets
 • End every response with a clear, immediate next action
 
-━━━ PROFILE AWARENESS ━━━
-{profile_section}
-
 ━━━ DYNAMIC GENERATION RULES ━━━
 When the user asks you to generate their roadmap:
 - Output a JSON block ONLY, wrapped in ```json ... ``` fences
@@ -129,9 +284,81 @@ When the user asks for weekly tasks:
 
 For ALL other responses, respond normally in markdown — never output raw JSON outside these specific requests."""
 
+# Volatile, per-user part. Appended AFTER the static base prompt so the base
+# stays a byte-identical prefix across turns and Ollama can reuse its KV cache.
+PROFILE_SECTION_TEMPLATE = """
+
+━━━ PROFILE AWARENESS ━━━
+{profile_section}"""
+
+
+# ── System prompt memoization ────────────────────────────────────────────────
+PROMPT_CACHE_SIZE = 256            # bounded LRU: one entry per distinct profile state
+
+_prompt_cache = OrderedDict()
+_prompt_cache_lock = threading.Lock()
+_prompt_cache_counters = {"hits": 0, "misses": 0}
+
+
+def _prompt_key(profile: dict) -> tuple:
+    """Hashable snapshot of only the profile fields build_system_prompt() reads."""
+    if not profile.get("diagnosis_done"):
+        return ("new",)
+    current = None
+    roadmap = profile.get("roadmap") or []
+    phase_idx = profile.get("current_phase", 0)
+    if phase_idx < len(roadmap):
+        current = (roadmap[phase_idx].get("phase", "?"), roadmap[phase_idx].get("title", ""))
+    return (
+        profile.get("name"),
+        profile.get("python_level"),
+        profile.get("ai_exposure"),
+        tuple(profile.get("current_tools") or ()),
+        profile.get("career_goal"),
+        profile.get("time_per_week"),
+        tuple(profile.get("strengths") or ()),
+        tuple(profile.get("gaps") or ()),
+        current,
+        tuple(profile.get("completed_phases") or ()),
+    )
+
+
+def prompt_fingerprint(profile: dict) -> str:
+    """Stable hex digest of the prompt-relevant profile fields (usable as a cache key)."""
+    return hashlib.blake2b(repr(_prompt_key(profile)).encode(), digest_size=12).hexdigest()
+
+
+def prompt_cache_stats() -> dict:
+    with _prompt_cache_lock:
+        hits, misses = _prompt_cache_counters["hits"], _prompt_cache_counters["misses"]
+        size = len(_prompt_cache)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "size": size,
+            "hit_rate": round(hits / total, 3) if total else 0.0}
+
 
 def build_system_prompt(profile: dict) -> str:
-    """Inject the user's current profile into the system prompt."""
+    """Static system prompt + the user's profile, memoized per profile fingerprint."""
+    fp = _prompt_key(profile)
+    with _prompt_cache_lock:
+        prompt = _prompt_cache.get(fp)
+        if prompt is not None:
+            _prompt_cache.move_to_end(fp)
+            _prompt_cache_counters["hits"] += 1
+            return prompt
+        _prompt_cache_counters["misses"] += 1
+
+    prompt = _render_system_prompt(profile)
+    with _prompt_cache_lock:
+        _prompt_cache[fp] = prompt
+        _prompt_cache.move_to_end(fp)
+        while len(_prompt_cache) > PROMPT_CACHE_SIZE:
+            _prompt_cache.popitem(last=False)
+    return prompt
+
+
+def _render_system_prompt(profile: dict) -> str:
+    """Append the user's current profile to the static system prompt."""
     if not profile.get("diagnosis_done"):
         profile_section = (
             "This user is NEW — you have not yet learned their background.\n"
@@ -176,4 +403,4 @@ def build_system_prompt(profile: dict) -> str:
         )
         profile_section = "\n".join(lines)
 
-    return ARIA_BASE_PROMPT.format(profile_section=profile_section)
+    return ARIA_BASE_PROMPT + PROFILE_SECTION_TEMPLATE.format(profile_section=profile_section)
@@ -0,0 +1,112 @@
+"""
+bench/bench_generation.py
+─────────────────────────
+Free-text chat generation vs. structured (`format`) generation, against a
+live Ollama server. For every artifact kind, runs N trials of each path and
+reports parse-success rate, latency and generated tokens.
+
+    python bench/bench_generation.py --model llama3.2 --trials 5
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aria_generate import GenerationError, generate_artifact          # noqa: E402
+from aria_json import coerce_items, extract_json_block                 # noqa: E402
+from aria_ollama import get_client                                     # noqa: E402
+from aria_system import EMPTY_PROFILE, build_system_prompt             # noqa: E402
+
+# The prompts the chat path used for these artifacts
+FREE_TEXT_PROMPTS = {
+    "roadmap": "Based on everything you know about me so far, generate my personalized roadmap now. "
+               "Output it as a JSON block following the schema you've been given.",
+    "projects": "Based on my current level, suggest 3 portfolio projects for me. "
+                "Output them as a JSON block following the schema you've been given.",
+    "weekly_tasks": "Generate my weekly tasks for my current phase. "
+                    "Output them as a JSON block following the schema you've been given.",
+}
+
+SAMPLE_PROFILE = {
+    **EMPTY_PROFILE,
+    "name": "Sam",
+    "python_level": "intermediate",
+    "ai_exposure": "theory_only",
+    "current_tools": ["numpy", "pandas"],
+    "career_goal": "Agentic AI developer",
+    "time_per_week": 10,
+    "diagnosis_done": True,
+}
+
+
+def strict_parse(text: str):
+    """The original extractor: non-greedy regex + all-or-nothing json.loads."""
+    m = re.search(r"```json\s*([\s\S]+?)\s*```", text)
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(1))
+    except json.JSONDecodeError:
+        return None
+
+
+def run_free_text(url, model, kind):
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": build_system_prompt(SAMPLE_PROFILE)},
+            {"role": "user", "content": FREE_TEXT_PROMPTS[kind]},
+        ],
+        "options": {"temperature": 0.72, "top_p": 0.9, "num_predict": 2048},
+    }
+    t0 = time.perf_counter()
+    resp = get_client(url).chat(payload)
+    elapsed = time.perf_counter() - t0
+    text = resp.get("message", {}).get("content", "")
+    strict_ok = isinstance(strict_parse(text), list)
+    tolerant_ok = coerce_items(extract_json_block(text))[0] == kind
+    return elapsed, resp.get("eval_count") or 0, strict_ok, tolerant_ok
+
+
+def run_structured(url, model, kind):
+    t0 = time.perf_counter()
+    try:
+        _, stats = generate_artifact(url, model, kind, SAMPLE_PROFILE, bypass_cache=True)
+        return stats["seconds"], stats["eval_count"] or 0, True
+    except GenerationError:
+        return time.perf_counter() - t0, 0, False
+
+
+def summarize(label, latencies, tokens, successes, trials):
+    return (f"  {label:<22} success {successes:>2}/{trials}  "
+            f"latency p50 {statistics.median(latencies):6.2f}s  max {max(latencies):6.2f}s  "
+            f"tokens avg {statistics.mean(tokens):6.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://localhost:11434")
+    ap.add_argument("--model", default="llama3.2")
+    ap.add_argument("--trials", type=int, default=5)
+    ap.add_argument("--kinds", default="roadmap,projects,weekly_tasks")
+    args = ap.parse_args()
+
+    for kind in args.kinds.split(","):
+        print(f"\n{kind}")
+        free = [run_free_text(args.url, args.model, kind) for _ in range(args.trials)]
+        lat, tok = [r[0] for r in free], [r[1] for r in free]
+        print(summarize("free text (strict)", lat, tok, sum(r[2] for r in free), args.trials))
+        print(summarize("free text (tolerant)", lat, tok, sum(r[3] for r in free), args.trials))
+        structured = [run_structured(args.url, args.model, kind) for _ in range(args.trials)]
+        print(summarize("structured format", [r[0] for r in structured],
+                        [r[1] for r in structured], sum(r[2] for r in structured), args.trials))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+bench/bench_persona.py
+──────────────────────
+Persona detection: the original nested substring scan vs. the compiled
+single-pass matcher in aria_system. Offline — no Ollama needed.
+Reports per-call latency on short messages and on large pasted inputs, and
+where the two pick different personas on the sample messages. (The legacy scan
+stops at its first hit, so it is cheapest on inputs that mention "teach"/"what
+is" early and most expensive on inputs with no trigger at all.)
+
+    python bench/bench_persona.py --repeat 200
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aria_system import PERSONAS, detect_persona  # noqa: E402
+
+SAMPLES = [
+    "What is the best docker architecture for my RAG pipeline?",
+    "what is a transformer and how does attention work?",
+    "Can you review my code? I think there's a bug in the retry loop.",
+    "How do I land a job as an agentic AI developer? My GitHub is empty.",
+    "Challenge me on embeddings",
+    "Plan my next week, I have 6 hours",
+    "I'm storing paragraphs in a rapid prototype",
+    "hello!",
+]
+
+CODE_BLOB = (
+    "```python\nimport os\nimport json\n\n"
+    + "class Loader:\n    def load(self, path):\n        with open(path) as f:\n"
+      "            return json.load(f)\n\n" * 400
+    + "```\nCan you check my code?"
+)
+PROSE_BLOB = " ".join(SAMPLES) * 300
+# No trigger anywhere: the legacy scan's worst case (every trigger searched in full)
+LOG_BLOB = "2025-01-01 12:00:00 INFO worker-3 heartbeat ok latency=12ms queue=0\n" * 1500
+
+
+def legacy_detect(text: str, current: str) -> str:
+    """The original first-match-wins scan: one substring search per trigger."""
+    lower = text.lower()
+    for name, data in PERSONAS.items():
+        if any(t in lower for t in data["triggers"]):
+            return name
+    return current
+
+
+def per_call_us(fn, text: str, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(text, "🧑‍🏫 Instructor")
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    inputs = {
+        "short messages": SAMPLES,
+        f"code blob ({len(CODE_BLOB) // 1024} KiB)": [CODE_BLOB],
+        f"prose blob ({len(PROSE_BLOB) // 1024} KiB)": [PROSE_BLOB],
+        f"log blob ({len(LOG_BLOB) // 1024} KiB)": [LOG_BLOB],
+    }
+    for label, texts in inputs.items():
+        old = sum(per_call_us(legacy_detect, t, args.repeat) for t in texts) / len(texts)
+        new = sum(per_call_us(detect_persona, t, args.repeat) for t in texts) / len(texts)
+        print(f"{label:<22} legacy {old:9.1f} µs   compiled {new:9.1f} µs")
+
+    print("\nsample picks (legacy → compiled):")
+    for t in SAMPLES + [CODE_BLOB]:
+        old, new = legacy_detect(t, "🧑‍🏫 Instructor"), detect_persona(t, "🧑‍🏫 Instructor")
+        mark = " " if old == new else "*"
+        print(f" {mark} {t[:48]!r:<52} {old} → {new}")
+
+
+if __name__ == "__main__":
+    main()
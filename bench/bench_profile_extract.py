@@ -0,0 +1,107 @@
+"""
+bench/bench_profile_extract.py
+──────────────────────────────
+Profile extraction: the original keyword heuristic vs. aria_profile_rules,
+on the labelled messages in bench/profile_corpus.jsonl. Offline — no Ollama
+needed. Reports per-field accuracy, spurious fields and throughput.
+
+    python bench/bench_profile_extract.py --repeat 200
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aria_profile_rules import extract_profile_facts  # noqa: E402
+
+CORPUS = Path(__file__).with_name("profile_corpus.jsonl")
+FIELDS = ["python_level", "ai_exposure", "time_per_week", "current_tools", "name", "career_goal"]
+
+# The original heuristic from app.py (fills level / exposure / hours only)
+_LEVEL_KEYWORDS = {
+    "beginner": "beginner", "just started": "beginner", "new to": "beginner",
+    "intermediate": "intermediate", "some experience": "intermediate",
+    "advanced": "advanced", "experienced": "advanced",
+}
+_EXPOSURE_KEYWORDS = {
+    "never": "none", "no experience": "none", "read about": "theory_only",
+    "watched": "theory_only", "some projects": "some_projects",
+    "built": "some_projects", "deployed": "some_projects",
+}
+
+
+def legacy_extract(text: str) -> dict:
+    lower = text.lower()
+    out = {}
+    for kw, val in _LEVEL_KEYWORDS.items():
+        if kw in lower and "python" in lower:
+            out["python_level"] = val
+            break
+    for kw, val in _EXPOSURE_KEYWORDS.items():
+        if kw in lower and any(w in lower for w in ["ai", "ml", "machine learning", "deep learning"]):
+            out["ai_exposure"] = val
+            break
+    m = re.search(r"(\d{1,2})\s*(hours?|hrs?)\s*(a|per)?\s*week", lower)
+    if m:
+        out["time_per_week"] = int(m.group(1))
+    return out
+
+
+def rules_extract(text: str) -> dict:
+    return {f: v for f, (v, _) in extract_profile_facts(text).items()}
+
+
+def score(extract, corpus):
+    right = {f: 0 for f in FIELDS}
+    total = {f: 0 for f in FIELDS}
+    spurious = 0
+    for case in corpus:
+        got = extract(case["text"])
+        for field, want in case["expect"].items():
+            total[field] += 1
+            right[field] += got.get(field) == want
+        spurious += sum(1 for f in got if f not in case["expect"])
+    return right, total, spurious
+
+
+def throughput(extract, corpus, repeat: int) -> float:
+    texts = [c["text"] for c in corpus]
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            extract(t)
+    return repeat * len(texts) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--show-misses", action="store_true")
+    args = ap.parse_args()
+
+    corpus = [json.loads(line) for line in CORPUS.read_text().splitlines() if line.strip()]
+    print(f"{len(corpus)} labelled messages\n")
+    print(f"{'field':<16}{'legacy':>10}{'rules':>10}")
+    results = {name: score(fn, corpus) for name, fn in (("legacy", legacy_extract), ("rules", rules_extract))}
+    for field in FIELDS:
+        n = results["rules"][1][field]
+        cells = [f"{results[k][0][field]}/{n}" for k in ("legacy", "rules")]
+        print(f"{field:<16}{cells[0]:>10}{cells[1]:>10}")
+    print(f"{'spurious':<16}{results['legacy'][2]:>10}{results['rules'][2]:>10}")
+    print(f"\nthroughput: legacy {throughput(legacy_extract, corpus, args.repeat):,.0f} msg/s   "
+          f"rules {throughput(rules_extract, corpus, args.repeat):,.0f} msg/s")
+
+    if args.show_misses:
+        for case in corpus:
+            got = rules_extract(case["text"])
+            if any(got.get(f) != v for f, v in case["expect"].items()) or set(got) - set(case["expect"]):
+                print(f"\n  {case['text']}\n    want {case['expect']}\n    got  {got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+bench/harness.py
+────────────────
+Offline load test: N simulated users chat with ARIA at once against a mock
+Ollama server (bench/mock_ollama.py, started in-process unless --url is
+given), with no Streamlit and no model. Each turn runs what send_message()
+and finish_reply() do in the app: persona detection, rule-based profile
+extraction, history append, the streamed reply through the scheduler and
+the pooled client, JSON extraction and a debounced profile save. Reports
+p50/p95/p99 per step, throughput and memory, and exits 1 when a figure is
+worse than the stored baseline by more than --tolerance.
+
+    python bench/harness.py --users 8 --turns 4
+    python bench/harness.py --update-baseline     # after an intended change
+    python bench/harness.py --baseline ""         # report only
+
+Timings depend on the machine: record the baseline on the one that checks it.
+Everything is written to a temporary database. ARIA_OLLAMA_MAX_INFLIGHT and
+ARIA_OLLAMA_ASYNC still apply; both are part of the baseline's config.
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:            # Windows: peak RSS is not reported
+    resource = None
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+# The store and the response cache pick their database path at import time
+_tmp = tempfile.TemporaryDirectory(prefix="aria-bench-")
+os.environ["ARIA_DB_PATH"] = str(Path(_tmp.name) / "bench.db")
+
+from aria_chat import maybe_absorb_generated_data, profile_writer, save_profile, stream_ollama  # noqa: E402
+from aria_json import StreamingJSONExtractor, extract_json_block      # noqa: E402
+from aria_metrics import recent_traces, trace_labels                  # noqa: E402
+from aria_ollama import USE_ASYNC                                     # noqa: E402
+from aria_profile_rules import update_profile_from_text               # noqa: E402
+from aria_scheduler import INTERACTIVE, MAX_INFLIGHT, request_context  # noqa: E402
+from aria_store import get_store                                      # noqa: E402
+from aria_system import EMPTY_PROFILE, detect_persona                 # noqa: E402
+from mock_ollama import MockConfig, add_mock_args, start_mock         # noqa: E402
+
+DEFAULT_BASELINE = HERE / "baseline.json"
+STEPS = ("persona", "profile_rules", "history", "ttft", "reply", "extract", "save", "turn", "flush")
+QUANTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+MEDIAN_SLACK_MS = 5.0          # p50 changes under one GIL switch interval are never a regression
+TAIL_SLACK_MS = 25.0           # p95/p99 of short steps jitter with thread scheduling
+IO_STEPS = ("history", "save", "flush")    # SQLite writes: their tails follow fsync, not our code
+IO_SLACK_MS = 10.0             # …and their medians get this much extra room
+
+# A conversation that touches every persona, the profile rules and JSON extraction
+SCRIPT = [
+    "Hi! I'm Sam, a beginner in Python and I have about 5h/week to learn.",
+    "I've used numpy and pandas a bit. My goal is to become an agentic AI developer.",
+    "Can you check my code?\n```python\ndef mean(xs):\n    return sum(xs) / len(xs)\n```",
+    "What is a decorator, and when would I write one?",
+    "Generate my weekly tasks for my current phase. Output them as a JSON block.",
+    "I feel stuck and a bit unmotivated this week, any advice?",
+    "How do I deploy a FastAPI app with Docker?",
+    "Quiz me on list comprehensions.",
+]
+
+
+def _pct(vals: list, q: float):
+    return vals[min(int(q * len(vals)), len(vals) - 1)] if vals else None
+
+
+class Recorder:
+    """Thread-safe millisecond samples per step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {step: [] for step in STEPS}
+        self.counts = {"turns": 0, "tokens": 0, "errors": 0, "absorbed": 0}
+
+    def add(self, step: str, seconds: float):
+        with self._lock:
+            self.samples[step].append(seconds * 1000)
+
+    def count(self, **deltas):
+        with self._lock:
+            for name, n in deltas.items():
+                self.counts[name] += n
+
+    def time(self, step: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.add(step, time.perf_counter() - t0)
+
+
+def simulate_user(n: int, turns: int, url: str, model: str, rec: Recorder, start: threading.Barrier):
+    """One user's conversation, turn by turn, the way app.py runs it."""
+    uid = f"bench-{n:03d}"
+    store = get_store()
+    profile = copy.deepcopy(EMPTY_PROFILE)
+    history, persona = [], "instructor"
+    start.wait()
+    for turn in range(turns):
+        text = SCRIPT[(n + turn) % len(SCRIPT)]
+        t_turn = time.perf_counter()
+        persona = rec.time("persona", detect_persona, text, persona)
+        if rec.time("profile_rules", update_profile_from_text, text, profile):
+            rec.time("save", save_profile, profile, uid)
+        history.append(rec.time("history", store.append_message, uid, "user", text))
+
+        extractor = StreamingJSONExtractor()
+        parts = []
+        t_reply = time.perf_counter()
+        stats = {}
+        with request_context(uid, INTERACTIVE), trace_labels(op="chat", persona=persona):
+            for tok in stream_ollama(text, history[:-1], profile, url, model, stats=stats):
+                if not parts:
+                    rec.add("ttft", time.perf_counter() - t_reply)
+                parts.append(tok)
+                extractor.feed(tok)
+        rec.add("reply", time.perf_counter() - t_reply)
+        full = "".join(parts)
+
+        t0 = time.perf_counter()
+        extract_json_block(full)                    # the non-streaming path, as on a cache hit
+        absorbed = maybe_absorb_generated_data(full, profile, extractor)
+        rec.add("extract", time.perf_counter() - t0)
+        if absorbed:
+            rec.time("save", save_profile, profile, uid)
+        history.append(store.append_message(uid, "assistant", full))
+        rec.add("turn", time.perf_counter() - t_turn)
+        rec.count(turns=1, tokens=len(parts), errors=int(bool(stats.get("error"))), absorbed=int(absorbed))
+    rec.time("flush", profile_writer(uid).flush)
+
+
+def run(users: int, turns: int, url: str, model: str) -> dict:
+    rec = Recorder()
+    start = threading.Barrier(users + 1)
+    threads = [threading.Thread(target=simulate_user, args=(n, turns, url, model, rec, start),
+                                name=f"bench-user-{n}") for n in range(users)]
+    for t in threads:
+        t.start()
+    tracemalloc.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    counts = rec.counts
+
+    metrics = {}
+    for step, vals in rec.samples.items():
+        vals.sort()
+        for name, q in QUANTILES:
+            if vals:
+                metrics[f"{step}_{name}_ms"] = round(_pct(vals, q), 2)
+    queued = sorted(t.get("queue_ms", 0) for t in recent_traces() if t["op"] == "chat")
+    for name, q in QUANTILES:
+        if queued:
+            metrics[f"queue_{name}_ms"] = round(_pct(queued, q), 2)
+    metrics["turns_per_sec"] = round(counts["turns"] / wall, 2)
+    metrics["tokens_per_sec"] = round(counts["tokens"] / wall, 1)
+    metrics["heap_peak_mb"] = round(heap_peak / 2**20, 2)
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        metrics["rss_peak_mb"] = round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    return {"wall_seconds": round(wall, 2), **counts, "metrics": metrics}
+
+
+# ── Baseline ──────────────────────────────────────────────────────────────────
+def _higher_is_better(name: str) -> bool:
+    return name.endswith("_per_sec")
+
+
+def _slack(name: str) -> float:
+    """Absolute room on top of the relative tolerance, or None if `name` is not gated."""
+    if not name.endswith("_ms"):
+        return 0.0
+    median = "_p50_" in name
+    if name.startswith(IO_STEPS):
+        return MEDIAN_SLACK_MS + IO_SLACK_MS if median else None
+    return MEDIAN_SLACK_MS if median else TAIL_SLACK_MS
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Lines describing every gated metric worse than `baseline` by more than
+    `tolerance`. Tail percentiles of the I/O steps are reported, not gated.
+    """
+    bad = []
+    for name, base in baseline.items():
+        cur = metrics.get(name)
+        if cur is None or not base:
+            continue
+        if _higher_is_better(name):
+            worse = cur < base * (1 - tolerance)
+        else:
+            slack = _slack(name)
+            worse = slack is not None and cur > base * (1 + tolerance) + slack
+        if worse:
+            bad.append(f"  {name:<22} {cur:>10} vs baseline {base} ({(cur - base) / base:+.0%})")
+    return bad
+
+
+def print_report(result: dict, config: dict):
+    m = result["metrics"]
+    print(f"\n{config['users']} users × {config['turns']} turns on {config['url']} "
+          f"(max in-flight {config['max_inflight']}, {config['tokens_per_sec']} tok/s, "
+          f"{config['latency']} s latency)")
+    print(f"  {result['turns']} turns, {result['tokens']} tokens, {result['errors']} errors, "
+          f"{result['absorbed']} JSON blocks absorbed in {result['wall_seconds']} s")
+    print(f"\n  {'step':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step in (*STEPS, "queue"):
+        if f"{step}_p50_ms" in m:
+            print(f"  {step:<14}" + "".join(f"{m[f'{step}_{q}_ms']:>10.2f}" for q, _ in QUANTILES))
+    print(f"\n  throughput   {m['turns_per_sec']} turns/s · {m['tokens_per_sec']} tokens/s")
+    print(f"  memory       heap peak {m['heap_peak_mb']} MB"
+          + (f" · RSS peak {m['rss_peak_mb']} MB" if "rss_peak_mb" in m else ""))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=8)
+    ap.add_argument("--turns", type=int, default=4)
+    ap.add_argument("--url", default="", help="use a running server instead of starting the mock")
+    ap.add_argument("--model", default="llama3.2")
+    add_mock_args(ap)
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE), help='"" to skip the check')
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    ap.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args()
+
+    url = args.url
+    if not url:
+        _, url = start_mock(config=MockConfig(args.tokens_per_sec, args.latency, args.tokens))
+    config = {
+        "users": args.users, "turns": args.turns, "url": "mock" if not args.url else url,
+        "max_inflight": MAX_INFLIGHT, "async_client": USE_ASYNC, "tokens_per_sec": args.tokens_per_sec,
+        "latency": args.latency, "tokens": args.tokens,
+    }
+    result = run(args.users, args.turns, url, args.model)
+    if args.json:
+        print(json.dumps({"config": config, **result}, indent=2))
+    else:
+        print_report(result, config)
+
+    if result["errors"]:
+        print(f"\nFAIL: {result['errors']} turns got an error reply")
+        sys.exit(1)
+    if args.update_baseline:
+        Path(args.baseline or DEFAULT_BASELINE).write_text(
+            json.dumps({"config": config, "metrics": result["metrics"]}, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline or DEFAULT_BASELINE}")
+        return
+    if not args.baseline or not Path(args.baseline).exists():
+        return
+    stored = json.loads(Path(args.baseline).read_text())
+    if stored.get("config") != config:
+        print(f"\nBaseline not checked: it was recorded with {stored.get('config')}")
+        return
+    regressions = compare(result["metrics"], stored["metrics"], args.tolerance)
+    if regressions:
+        print(f"\nFAIL: worse than the baseline by more than {args.tolerance:.0%}:")
+        print("\n".join(regressions))
+        sys.exit(1)
+    print(f"\nOK: within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+bench/mock_ollama.py
+────────────────────
+A stand-in Ollama server for load tests, no model or GPU needed. Serves
+/api/tags, /api/chat (streamed NDJSON or a single object; `format` requests
+get a reply shaped like their schema) and /api/embed, with a configurable
+delay before the first token and token rate. Replies to a message asking
+ARIA to "generate" something carry a ```json weekly-tasks block, so the
+extraction path gets exercised too.
+
+    python bench/mock_ollama.py --port 11500 --tokens-per-sec 100 --latency 0.2
+
+bench/harness.py starts one in-process with start_mock() unless given --url.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODELS = ("llama3.2", "nomic-embed-text")
+
+_WORDS = ("Great question — let's break it down step by step. Start with the core idea, "
+          "then write a small example, run it, and change one thing at a time so you can "
+          "see what each part does. Once that feels natural, build a tiny project around it. ").split()
+
+_TASKS = [
+    {"day": "Monday", "task": "Read the async/await chapter", "resource": "Python docs", "estimated_hours": 1.5},
+    {"day": "Tuesday", "task": "Rewrite the scraper with asyncio", "resource": "aiohttp docs", "estimated_hours": 2},
+    {"day": "Wednesday", "task": "Add retries and timeouts", "resource": "tenacity", "estimated_hours": 1},
+    {"day": "Thursday", "task": "Write tests for the scraper", "resource": "pytest docs", "estimated_hours": 1.5},
+    {"day": "Friday", "task": "Review: what made it faster?", "resource": "your notes", "estimated_hours": 0.5},
+]
+
+
+class MockConfig:
+    """Reply shape and pacing; shared by every request the server handles."""
+
+    def __init__(self, tokens_per_sec: float = 100.0, latency: float = 0.2, tokens: int = 60,
+                 models=MODELS):
+        self.tokens_per_sec = tokens_per_sec   # 0 → no pacing
+        self.latency = latency                 # seconds before the first token
+        self.tokens = tokens                   # prose tokens per reply
+        self.models = list(models)
+
+
+def _reply_tokens(cfg: MockConfig, messages: list) -> list:
+    """Word-sized tokens of the reply to the last user message."""
+    toks = [w + " " for w in (_WORDS * (cfg.tokens // len(_WORDS) + 1))[:cfg.tokens]]
+    last = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    if "generate" in last.lower():
+        block = "```json\n" + json.dumps(_TASKS, indent=2) + "\n```\n"
+        toks += [block[i:i + 12] for i in range(0, len(block), 12)]
+    return toks
+
+
+def _sample(spec: dict):
+    """A minimal value that satisfies a JSON schema (for `format` requests)."""
+    kind = spec.get("type")
+    if kind == "object":
+        return {k: _sample(v) for k, v in spec.get("properties", {}).items()}
+    if kind == "array":
+        return [_sample(spec.get("items", {})) for _ in range(max(spec.get("minItems", 0), 3))]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.5
+    if "enum" in spec:
+        return spec["enum"][0]
+    return "text"
+
+
+def _vector(text: str) -> list:
+    digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    return [b / 255 for b in digest]
+
+
+def _prompt_tokens(messages: list) -> int:
+    return sum(len(m.get("content", "")) for m in messages) // 4
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, data: dict, status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data: dict):
+        line = (json.dumps(data) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path != "/api/tags":
+            return self._json({"error": "not found"}, 404)
+        self._json({"models": [{"name": m} for m in self.config.models]})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._json({"error": "invalid JSON"}, 400)
+        if self.path == "/api/embed":
+            inputs = body.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            return self._json({"embeddings": [_vector(t) for t in inputs]})
+        if self.path != "/api/chat":
+            return self._json({"error": "not found"}, 404)
+        if body.get("model") not in self.config.models:
+            return self._json({"error": f"model '{body.get('model')}' not found"}, 404)
+        if body.get("stream", True):
+            self._stream(body)
+        else:
+            self._single(body)
+
+    def _final(self, messages: list, eval_count: int, started: float) -> dict:
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        eval_ns = int(eval_count / self.config.tokens_per_sec * 1e9) if self.config.tokens_per_sec else 0
+        return {
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "prompt_eval_count": _prompt_tokens(messages),
+            "prompt_eval_duration": int(self.config.latency * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": eval_ns or elapsed_ns,
+            "total_duration": elapsed_ns,
+        }
+
+    def _single(self, body: dict):
+        started = time.perf_counter()
+        messages = body.get("messages", [])
+        if isinstance(body.get("format"), dict):
+            content = json.dumps(_sample(body["format"]))
+        else:
+            content = "".join(_reply_tokens(self.config, messages))
+        eval_count = max(len(content) // 4, 1)
+        pace = self.config.tokens_per_sec
+        time.sleep(self.config.latency + (eval_count / pace if pace else 0))
+        final = self._final(messages, eval_count, started)
+        final["message"]["content"] = content
+        self._json(final)
+
+    def _stream(self, body: dict):
+        started = time.perf_counter()
+        messages = body.get("messages", [])
+        toks = _reply_tokens(self.config, messages)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.config.latency)
+        interval = 1 / self.config.tokens_per_sec if self.config.tokens_per_sec else 0
+        next_at = time.perf_counter()
+        try:
+            for tok in toks:
+                if interval:
+                    next_at += interval
+                    time.sleep(max(next_at - time.perf_counter(), 0))
+                self._chunk({"message": {"role": "assistant", "content": tok}, "done": False})
+            self._chunk(self._final(messages, len(toks), started))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass               # the client stopped reading (e.g. ⏹ Stop)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)   # a client dropping its keep-alive is fine
+
+
+def start_mock(port: int = 0, host: str = "127.0.0.1", config: MockConfig = None):
+    """Serve on a daemon thread; returns (server, base URL). port=0 picks a free port."""
+    handler = type("MockHandler", (_Handler,), {"config": config or MockConfig()})
+    server = _Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_mock_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--tokens-per-sec", type=float, default=100.0,
+                    help="streaming rate per reply (0 = as fast as possible)")
+    ap.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    ap.add_argument("--tokens", type=int, default=60, help="prose tokens per reply")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11500)
+    add_mock_args(ap)
+    args = ap.parse_args()
+    config = MockConfig(args.tokens_per_sec, args.latency, args.tokens)
+    server, url = start_mock(args.port, args.host, config)
+    print(f"mock Ollama on {url} ({config.tokens_per_sec:g} tok/s, {config.latency:g} s latency) — Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Per-user queues of the background fact extraction in aria_facts."""
+
+import copy
+import time
+
+import aria_facts
+from aria_facts import apply_pending_facts, cancel_facts, facts_pending, schedule_fact_extraction
+from aria_system import EMPTY_PROFILE
+
+
+def _profile():
+    return copy.deepcopy(EMPTY_PROFILE)
+
+
+def _exchange(seq, text):
+    return [{"seq": seq, "role": "user", "content": text}, {"seq": seq + 1, "role": "assistant", "content": "ok"}]
+
+
+def _wait(user_id, deadline=5.0):
+    end = time.time() + deadline
+    while facts_pending(user_id) and time.time() < end:
+        time.sleep(0.01)
+
+
+def _fake_extract(monkeypatch, calls=None):
+    def extract(url, model, known, batch):
+        if calls is not None:
+            calls.append([m["content"] for m in batch])
+        return {"name": (batch[0]["content"], aria_facts.FACTS_CONFIDENCE)}
+    monkeypatch.setattr(aria_facts, "extract_facts", extract)
+
+
+def test_results_only_reach_the_user_they_were_extracted_for(monkeypatch):
+    _fake_extract(monkeypatch)
+    schedule_fact_extraction("alice-1", _profile(), _exchange(40, "Alice"), "http://x", "m")
+    _wait("alice-1")
+
+    stranger = _profile()
+    assert not apply_pending_facts("bob-1", stranger) and stranger["name"] is None
+    alice = _profile()
+    assert apply_pending_facts("alice-1", alice) and alice["name"] == "Alice"
+    cancel_facts("alice-1")
+
+
+def test_a_new_user_starts_without_another_users_seq_watermark(monkeypatch):
+    calls = []
+    _fake_extract(monkeypatch, calls)
+    schedule_fact_extraction("alice-2", _profile(), _exchange(40, "Alice"), "http://x", "m")
+    _wait("alice-2")
+    assert schedule_fact_extraction("bob-2", _profile(), _exchange(0, "Bob"), "http://x", "m")
+    _wait("bob-2")
+    assert calls == [["Alice", "ok"], ["Bob", "ok"]]
+    cancel_facts("alice-2"), cancel_facts("bob-2")
+
+
+def test_cancel_drops_results_and_the_watermark(monkeypatch):
+    _fake_extract(monkeypatch)
+    schedule_fact_extraction("carol-3", _profile(), _exchange(4, "Carol"), "http://x", "m")
+    _wait("carol-3")
+    cancel_facts("carol-3")
+
+    profile = _profile()
+    assert not apply_pending_facts("carol-3", profile)
+    assert schedule_fact_extraction("carol-3", _profile(), _exchange(0, "Again"), "http://x", "m")
+    _wait("carol-3")
+    cancel_facts("carol-3")
+
+
+def test_idle_users_expire_and_the_table_is_bounded(monkeypatch):
+    _fake_extract(monkeypatch)
+    monkeypatch.setattr(aria_facts, "FACTS_MAX_USERS", 3)
+    for n in range(6):
+        schedule_fact_extraction(f"many-{n}", _profile(), _exchange(0, f"U{n}"), "http://x", "m")
+        _wait(f"many-{n}")
+    assert len(aria_facts._users) <= 3 and "many-0" not in aria_facts._users
+
+    monkeypatch.setattr(aria_facts, "FACTS_IDLE_TTL", 0)
+    apply_pending_facts("someone-else", _profile())
+    assert not any(u.startswith("many-") for u in aria_facts._users)
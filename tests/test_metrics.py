@@ -0,0 +1,23 @@
+"""Prometheus export of aria_metrics."""
+
+from aria_metrics import prometheus_text, record_extraction, trace_call, trace_labels
+
+
+def test_each_family_is_contiguous_after_its_type_line():
+    for op in ("chat", "summary", "chat"):
+        with trace_labels(op=op), trace_call("chat", "http://prom-test", {"model": "m"}) as tr:
+            tr.done({"eval_count": 4, "eval_duration": 10**8})
+    record_extraction("facts", True)
+
+    families, current = [], None
+    for line in prometheus_text().splitlines():
+        if line.startswith("# TYPE "):
+            current = line.split()[2]
+            assert current not in families, f"{current} declared twice"
+            families.append(current)
+            continue
+        name = line.split("{")[0]
+        assert current and name in (current, f"{current}_sum", f"{current}_count"), line
+        if 'quantile="' in line:
+            q = line.split('quantile="')[1].split('"')[0]
+            assert 0 <= float(q) <= 1
@@ -0,0 +1,108 @@
+"""AsyncOllamaClient streaming: backpressure, cancellation, context propagation."""
+
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from aria_metrics import recent_traces                                  # noqa: E402
+from aria_ollama import CancelToken                                     # noqa: E402
+from aria_ollama_async import AsyncOllamaClient, SyncOllamaClient       # noqa: E402
+from aria_scheduler import BACKGROUND, request_context                  # noqa: E402
+
+CHUNKS = 500
+
+
+class FakeOllama:
+    """httpx transport streaming CHUNKS NDJSON lines; records how far it got."""
+
+    def __init__(self):
+        self.sent = 0
+        self.closed = False
+
+    async def _body(self):
+        try:
+            for i in range(CHUNKS):
+                self.sent += 1
+                yield (json.dumps({"message": {"content": f"t{i} "}, "done": False}) + "\n").encode()
+                await asyncio.sleep(0)
+            yield (json.dumps({"message": {"content": ""}, "done": True, "eval_count": CHUNKS}) + "\n").encode()
+        finally:
+            self.closed = True
+
+    def handler(self, request):
+        if request.url.path == "/api/chat" and json.loads(request.content).get("stream"):
+            return httpx.Response(200, content=self._body())
+        return httpx.Response(200, json={"message": {"content": "ok"}, "done": True})
+
+    def install(self, client: AsyncOllamaClient):
+        client._client = httpx.AsyncClient(base_url=client.url,
+                                           transport=httpx.MockTransport(self.handler))
+
+
+def _client(url: str, queue_size: int = 8):
+    fake = FakeOllama()
+    client = AsyncOllamaClient(url, queue_size=queue_size)
+    fake.install(client)
+    return client, fake
+
+
+def test_slow_consumer_bounds_the_reader():
+    async def main():
+        client, fake = _client("http://fake-bounded", queue_size=8)
+        stream = client.chat_stream({"model": "m", "messages": []})
+        await stream.__anext__()
+        await asyncio.sleep(0.2)             # consumer stalls; the reader must stop pulling
+        stalled_at = fake.sent
+        rest = [c async for c in stream]
+        return stalled_at, rest, fake
+
+    stalled_at, rest, fake = asyncio.run(main())
+    assert stalled_at <= 8 + 4               # queue size plus what is in flight
+    assert len(rest) == CHUNKS               # … and nothing was lost
+    assert rest[-1]["done"]
+
+
+def test_cancel_token_ends_stream_quietly_and_frees_slot():
+    async def main():
+        client, fake = _client("http://fake-cancel")
+        cancel = CancelToken()
+        got = []
+        async for chunk in client.chat_stream({"model": "m", "messages": []}, cancel=cancel):
+            got.append(chunk)
+            if len(got) == 3:
+                cancel.cancel()
+        await asyncio.sleep(0.05)
+        return got, fake, client.scheduler.load()
+
+    got, fake, load = asyncio.run(main())
+    assert 3 <= len(got) < CHUNKS
+    assert fake.closed and fake.sent < CHUNKS
+    assert load == 0
+
+
+def test_closing_the_generator_closes_the_response():
+    async def main():
+        client, fake = _client("http://fake-aclose")
+        stream = client.chat_stream({"model": "m", "messages": []})
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        return fake, client.scheduler.load()
+
+    fake, load = asyncio.run(main())
+    assert fake.closed and fake.sent < CHUNKS
+    assert load == 0
+    trace = [t for t in recent_traces() if t["backend"] == "http://fake-aclose"][-1]
+    assert trace["status"] == "cancelled"          # not an error, same as the requests client
+
+
+def test_sync_adapter_keeps_request_context():
+    client = SyncOllamaClient("http://fake-context")
+    FakeOllama().install(client._async)
+    with request_context("alice", BACKGROUND):
+        client.chat({"model": "m", "messages": []})
+    trace = [t for t in recent_traces() if t["backend"] == "http://fake-context"][-1]
+    assert (trace["user"], trace["priority"]) == ("alice", BACKGROUND)
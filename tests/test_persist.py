@@ -0,0 +1,79 @@
+"""DebouncedWriter: coalescing, retry on a failing sink, and discard."""
+
+import threading
+import time
+
+from aria_persist import DebouncedWriter
+
+
+def _wait(cond, deadline=3.0):
+    end = time.time() + deadline
+    while not cond() and time.time() < end:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_a_burst_of_saves_becomes_one_write_of_the_last_snapshot():
+    written = []
+    writer = DebouncedWriter(written.append, delay=0.05)
+    for n in range(5):
+        writer.schedule({"n": n})
+    assert _wait(lambda: written)
+    assert written == [{"n": 4}] and writer.coalesced == 4
+
+
+def test_a_failed_write_is_kept_and_retried():
+    written, calls = [], []
+
+    def sink(data):
+        calls.append(data)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        written.append(data)
+
+    writer = DebouncedWriter(sink, delay=0.02)
+    writer.schedule({"n": 1})
+    assert _wait(lambda: written)
+    assert written == [{"n": 1}] and writer.failures == 0 and writer.writes == 1
+
+
+def test_a_newer_snapshot_wins_over_the_failed_one():
+    written = []
+    arrived = threading.Event()
+
+    def sink(data):
+        if data["n"] == 1:
+            writer.schedule({"n": 2})        # a save lands while the first write is failing
+            raise OSError("locked")
+        written.append(data)
+        arrived.set()
+
+    writer = DebouncedWriter(sink, delay=0.02)
+    writer.schedule({"n": 1})
+    assert arrived.wait(3.0)
+    assert written == [{"n": 2}]
+
+
+def test_discard_waits_for_a_write_in_progress():
+    entered, release, written = threading.Event(), threading.Event(), []
+
+    def sink(data):
+        entered.set()
+        release.wait(3.0)
+        written.append(data)
+
+    writer = DebouncedWriter(sink, delay=0.01)
+    writer.schedule({"n": 1})
+    assert entered.wait(3.0)
+
+    done = threading.Event()
+    threading.Thread(target=lambda: (writer.discard(), done.set()), daemon=True).start()
+    time.sleep(0.05)
+    assert not done.is_set()                 # blocked behind the in-flight write
+    release.set()
+    assert done.wait(3.0) and written == [{"n": 1}]
+
+    writer.schedule({"n": 2})
+    writer.discard()
+    time.sleep(0.05)
+    assert written == [{"n": 1}]
@@ -0,0 +1,83 @@
+"""Weekly-task packing in aria_planner."""
+
+from aria_planner import DAYS, merge_new_tasks, plan_week, week_stats
+
+
+def _task(text, hours, phase=0, **extra):
+    return {"task": text, "estimated_hours": hours, "phase": phase, "done": False, **extra}
+
+
+def test_open_tasks_pack_largest_first_onto_the_least_loaded_day():
+    profile = {"time_per_week": 10, "current_phase": 0,
+               "weekly_tasks": [_task("a", 1), _task("b", 3), _task("c", 2)]}
+    stats = plan_week(profile)
+
+    days = {t["task"]: t["day"] for t in profile["weekly_tasks"]}
+    assert days == {"b": DAYS[0], "c": DAYS[1], "a": DAYS[2]}
+    assert [t["task"] for t in profile["weekly_tasks"]] == ["b", "c", "a"]
+    assert stats["scheduled_hours"] == 6 and stats["free_hours"] == 4
+    assert not any(t["deferred"] for t in profile["weekly_tasks"])
+
+
+def test_tasks_over_the_budget_are_deferred_and_come_back_when_hours_grow():
+    profile = {"time_per_week": 4, "current_phase": 0,
+               "weekly_tasks": [_task("small", 1), _task("big", 3), _task("huge", 5)]}
+    stats = plan_week(profile)
+
+    deferred = [t["task"] for t in profile["weekly_tasks"] if t["deferred"]]
+    assert deferred == ["huge"] and profile["weekly_tasks"][-1]["task"] == "huge"
+    assert stats["deferred"] == 1 and stats["scheduled_hours"] == 4 and stats["free_hours"] == 0
+
+    profile["time_per_week"] = 9
+    assert plan_week(profile)["deferred"] == 0
+
+
+def test_done_tasks_keep_their_day_and_count_against_the_budget():
+    profile = {"time_per_week": 3, "current_phase": 0,
+               "weekly_tasks": [_task("done", 2, done=True, day="Friday"), _task("open", 2)]}
+    plan_week(profile)
+
+    by_task = {t["task"]: t for t in profile["weekly_tasks"]}
+    assert by_task["done"]["day"] == "Friday" and not by_task["done"]["deferred"]
+    assert by_task["open"]["deferred"]
+
+
+def test_tasks_from_another_phase_are_dropped():
+    profile = {"time_per_week": 10, "current_phase": 1,
+               "weekly_tasks": [_task("old", 1, phase=0), _task("new", 1, phase=1)]}
+    stats = plan_week(profile)
+
+    assert [t["task"] for t in profile["weekly_tasks"]] == ["new"]
+    assert stats["dropped"] == 1
+
+
+def test_untagged_tasks_join_the_current_phase():
+    profile = {"time_per_week": 10, "current_phase": 2,
+               "weekly_tasks": [{"task": "legacy", "estimated_hours": "n/a"}]}
+    plan_week(profile)
+
+    (task,) = profile["weekly_tasks"]
+    assert task["phase"] == 2 and task["day"] == DAYS[0]
+    assert week_stats(profile)["scheduled_hours"] == 1.0      # unusable estimate → DEFAULT_TASK_HOURS
+
+
+def test_week_stats_reads_the_plan_without_changing_it():
+    profile = {"time_per_week": 5, "current_phase": 0,
+               "weekly_tasks": [_task("x", 2, day="Monday", deferred=False),
+                                _task("y", 4, deferred=True)]}
+    before = [dict(t) for t in profile["weekly_tasks"]]
+
+    assert week_stats(profile) == {"budget": 5.0, "scheduled_hours": 2.0, "free_hours": 3.0, "deferred": 1}
+    assert profile["weekly_tasks"] == before
+
+
+def test_merge_skips_repeats_and_tolerates_missing_task_text():
+    profile = {"time_per_week": 10, "current_phase": 0, "weekly_tasks": [_task("Read docs", 1)]}
+    merge_new_tasks(profile, [{"task": " read DOCS ", "estimated_hours": 1},
+                              {"task": None, "estimated_hours": 1},
+                              {"task": 42, "estimated_hours": 1},
+                              {"estimated_hours": 1}])
+
+    texts = [t.get("task") for t in profile["weekly_tasks"]]
+    assert texts.count("Read docs") == 1 and " read DOCS " not in texts
+    assert 42 in texts and None in texts
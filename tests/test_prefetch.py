@@ -0,0 +1,81 @@
+"""Per-user speculative drafts in aria_prefetch."""
+
+import copy
+import threading
+import time
+
+import aria_prefetch
+from aria_prefetch import cancel_prefetch, prefetch_pending, schedule_prefetch
+from aria_system import EMPTY_PROFILE
+
+
+def _profile(**fields):
+    return {**copy.deepcopy(EMPTY_PROFILE), "diagnosis_done": True, "python_level": "beginner", **fields}
+
+
+def _fake_generate(monkeypatch, gate=None):
+    calls = []
+
+    def generate(url, model, kind, profile, extra="", bypass_cache=False):
+        calls.append((kind, profile.get("career_goal")))
+        if gate is not None:
+            gate.wait(5)
+        return [{"title": kind}], {}
+    monkeypatch.setattr(aria_prefetch, "generate_artifact", generate)
+    monkeypatch.setattr(aria_prefetch, "draft_ready", lambda profile, model, kind: False)
+    return calls
+
+
+def _wait(user_id, deadline=5.0):
+    end = time.time() + deadline
+    while prefetch_pending(user_id) and time.time() < end:
+        time.sleep(0.01)
+
+
+def test_the_job_drafts_from_the_snapshot_taken_when_scheduled(monkeypatch):
+    gate = threading.Event()
+    calls = _fake_generate(monkeypatch, gate)
+    profile = _profile(career_goal="ML engineer")
+    assert schedule_prefetch("alice-p1", profile, "http://x", "m")
+    profile["career_goal"] = "changed on the script thread"
+    gate.set()
+    _wait("alice-p1")
+    assert calls and all(goal == "ML engineer" for _, goal in calls)
+    cancel_prefetch("alice-p1")
+
+
+def test_another_users_entry_never_blocks_a_new_user(monkeypatch):
+    _fake_generate(monkeypatch)
+    assert schedule_prefetch("alice-p2", _profile(), "http://x", "m")
+    _wait("alice-p2")
+    assert schedule_prefetch("bob-p2", _profile(), "http://x", "m")
+    _wait("bob-p2")
+    assert not schedule_prefetch("bob-p2", _profile(), "http://x", "m")      # same fingerprint: once
+    cancel_prefetch("alice-p2"), cancel_prefetch("bob-p2")
+
+
+def test_a_profile_change_stops_the_running_job_and_requeues(monkeypatch):
+    gate = threading.Event()
+    calls = _fake_generate(monkeypatch, gate)
+    assert schedule_prefetch("carol-p3", _profile(career_goal="a"), "http://x", "m")
+    time.sleep(0.05)
+    assert not schedule_prefetch("carol-p3", _profile(career_goal="b"), "http://x", "m")   # still running
+    gate.set()
+    _wait("carol-p3")
+    assert [kind for kind, _ in calls] == ["roadmap"]
+
+    assert schedule_prefetch("carol-p3", _profile(career_goal="b"), "http://x", "m")
+    _wait("carol-p3")
+    cancel_prefetch("carol-p3")
+
+
+def test_cancel_stops_the_job_before_its_next_draft(monkeypatch):
+    gate = threading.Event()
+    calls = _fake_generate(monkeypatch, gate)
+    schedule_prefetch("dave-p4", _profile(), "http://x", "m")
+    time.sleep(0.05)
+    cancel_prefetch("dave-p4")
+    gate.set()
+    time.sleep(0.1)
+    assert [kind for kind, _ in calls] == ["roadmap"]
+    assert "dave-p4" not in aria_prefetch._users
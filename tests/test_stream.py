@@ -0,0 +1,57 @@
+"""GenerationJob: the worker thread behind a streamed reply."""
+
+import time
+
+from aria_stream import GenerationJob, ThrottledRenderer
+
+
+def _drain_all(job, deadline=5.0):
+    end = time.time() + deadline
+    while not job.finished and time.time() < end:
+        job.drain(timeout=0.05)
+
+
+def test_tokens_arrive_in_order_and_the_job_finishes():
+    job = GenerationJob(lambda cancel: iter(["Hel", "lo", "!"]))
+    _drain_all(job)
+    assert job.finished and job.shown == "Hello!" and job.error is None
+
+
+def test_an_error_in_the_stream_keeps_the_partial_reply_and_is_kept_on_the_job():
+    def make_stream(cancel):
+        yield "partial "
+        raise RuntimeError("context build failed")
+
+    job = GenerationJob(make_stream)
+    _drain_all(job)
+    assert job.finished and not job.cancelled
+    assert job.shown == "partial "
+    assert isinstance(job.error, RuntimeError) and str(job.error) == "context build failed"
+
+
+def test_the_job_counts_drained_tokens_and_stops_its_clock_when_done():
+    job = GenerationJob(lambda cancel: iter(["a", "b", "c"]))
+    _drain_all(job)
+    assert job.tokens == 3 and job.ended is not None
+    assert job.seconds == job.ended - job.started
+
+
+class _Box:
+    def __init__(self):
+        self.frames = []
+
+    def markdown(self, content):
+        self.frames.append(content)
+
+
+def test_a_resumed_reply_is_repainted_without_counting_as_tokens():
+    box = _Box()
+    renderer = ThrottledRenderer(box, fps=0, every_n=0)
+    renderer.resume("partial reply so far")
+    renderer.feed(" more")
+    full = renderer.finish(renderer.text + "\n\n*Stopped.*")
+
+    assert full == "partial reply so far more\n\n*Stopped.*" and box.frames[-1] == full
+    stats = renderer.stats()
+    assert stats["tokens"] == 1 and stats["frames"] == len(box.frames)
+    assert renderer.stats(tokens=40, seconds=2.0)["tokens_per_sec"] == 20.0
@@ -0,0 +1,60 @@
+"""Per-user background folds in aria_summary."""
+
+import time
+
+import aria_summary
+from aria_summary import apply_pending_summary, cancel_summary, maybe_schedule_summary
+
+HISTORY = [{"seq": n, "role": "user" if n % 2 == 0 else "assistant", "content": "word " * 60}
+           for n in range(12)]
+
+
+def _fake_summarize(monkeypatch):
+    monkeypatch.setattr(aria_summary, "summarize_turns",
+                        lambda url, model, previous, turns: f"{len(turns)} turns folded")
+
+
+def _wait_for_fold(user_id, deadline=5.0):
+    end = time.time() + deadline
+    while time.time() < end:
+        with aria_summary._lock:
+            state = aria_summary._users.get(user_id)
+            if state is None or not state.inflight:
+                return
+        time.sleep(0.01)
+
+
+def test_a_fold_is_only_applied_to_the_user_it_was_made_for(monkeypatch):
+    _fake_summarize(monkeypatch)
+    assert maybe_schedule_summary("alice-s1", HISTORY, {"summary_upto": 0}, "http://x", "m", 200)
+    _wait_for_fold("alice-s1")
+
+    fresh = {"summary_upto": 0, "conversation_summary": ""}
+    assert not apply_pending_summary("bob-s1", fresh) and fresh["conversation_summary"] == ""
+    alice = {"summary_upto": 0, "conversation_summary": ""}
+    assert apply_pending_summary("alice-s1", alice)
+    assert alice["conversation_summary"].endswith("turns folded") and alice["summary_upto"] > 0
+    cancel_summary("alice-s1")
+
+
+def test_cancel_discards_a_waiting_fold(monkeypatch):
+    _fake_summarize(monkeypatch)
+    maybe_schedule_summary("carol-s2", HISTORY, {"summary_upto": 0}, "http://x", "m", 200)
+    _wait_for_fold("carol-s2")
+    cancel_summary("carol-s2")
+
+    profile = {"summary_upto": 0, "conversation_summary": ""}
+    assert not apply_pending_summary("carol-s2", profile) and profile["conversation_summary"] == ""
+
+
+def test_waiting_folds_expire_and_the_table_is_bounded(monkeypatch):
+    _fake_summarize(monkeypatch)
+    monkeypatch.setattr(aria_summary, "SUMMARY_MAX_USERS", 3)
+    for n in range(6):
+        maybe_schedule_summary(f"fold-{n}", HISTORY, {"summary_upto": 0}, "http://x", "m", 200)
+        _wait_for_fold(f"fold-{n}")
+    assert len(aria_summary._users) <= 3 and "fold-0" not in aria_summary._users
+
+    monkeypatch.setattr(aria_summary, "SUMMARY_IDLE_TTL", 0)
+    apply_pending_summary("someone-else", {"summary_upto": 0})
+    assert not any(u.startswith("fold-") for u in aria_summary._users)